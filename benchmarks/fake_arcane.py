@@ -0,0 +1,241 @@
+"""Local stand-in for the Arcane REST API and task event websocket.
+
+The server implements just enough of the API for the CLI to create, follow and list tasks:
+
+- ``POST /api/tasks/`` creates a task
+- ``GET /api/tasks/`` lists all tasks, newest first
+- ``GET /api/tasks/{id}/`` retrieves a task
+- ``GET /ws/tasks/{id}/events/`` streams the events of a task over a websocket
+
+REST and websocket share one port, like on the real service, so the CLI only needs
+``PR_PILOT_HOST`` to point at it.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from websockets.server import ServerProtocol
+
+TASK_LIST_PATH = "/api/tasks/"
+TASK_PATH_PREFIX = "/api/tasks/"
+EVENTS_PATH_PREFIX = "/ws/tasks/"
+GITHUB_USER = "benchmark"
+
+# Don't log every websocket handshake
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+
+
+class FakeArcane:
+    """Fake Arcane server running on its own event loop in a background thread.
+
+    :param latency: Seconds every REST response is delayed by.
+    :param events_per_task: Number of `event` messages sent before a task completes.
+    :param event_rate: Events per second, or None to send them as fast as possible.
+    :param result_size: Number of characters of every task result.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        events_per_task: int = 10,
+        event_rate: Optional[float] = None,
+        result_size: int = 2000,
+    ):
+        self.latency = latency
+        self.events_per_task = events_per_task
+        self.event_rate = event_rate
+        self.result_size = result_size
+        self.tasks: Dict[str, dict] = {}
+        self.counters = {"requests": 0, "connections": 0, "websockets": 0}
+        self.url = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def settings(self) -> dict:
+        return {
+            "latency": self.latency,
+            "events_per_task": self.events_per_task,
+            "event_rate": self.event_rate,
+            "result_size": self.result_size,
+        }
+
+    def start(self) -> str:
+        """Start serving on a free local port and return the base URL."""
+        ready = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_connection, "127.0.0.1", 0)
+            )
+            port = self._server.sockets[0].getsockname()[1]
+            self.url = f"http://127.0.0.1:{port}"
+            ready.set()
+            self._loop.run_forever()
+            self._server.close()
+            # Drop connections that are still open, e.g. idle keep-alive connections
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.url
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def reset_counters(self) -> dict:
+        """Return the counters and start counting from zero."""
+        counters = dict(self.counters)
+        for name in self.counters:
+            self.counters[name] = 0
+        return counters
+
+    def new_task(self, prompt: dict) -> dict:
+        task_id = str(uuid.uuid4())
+        task = {
+            "id": task_id,
+            "title": "Benchmark task",
+            "user_request": prompt.get("prompt", ""),
+            "status": "running",
+            "created": datetime.now(timezone.utc).isoformat(),
+            "github_project": prompt.get("github_repo") or "benchmark/repo",
+            "github_user": GITHUB_USER,
+            "branch": prompt.get("branch") or "main",
+            "pr_number": prompt.get("pr_number"),
+            "gpt_model": prompt.get("gpt_model"),
+            "result": "",
+        }
+        self.tasks[task_id] = task
+        return task
+
+    def result_text(self, task_id: str) -> str:
+        line = f"Result of task {task_id}. "
+        repeat = self.result_size // len(line) + 1
+        return (line * repeat)[: self.result_size]
+
+    async def _handle_connection(self, reader, writer):
+        self.counters["connections"] += 1
+        try:
+            # Keep-alive: serve requests until the client closes the connection
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = request_line.split(" ", 2)
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                if headers.get("upgrade", "").lower() == "websocket":
+                    await self._stream_events(head, path, reader, writer)
+                    return
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.counters["requests"] += 1
+                await asyncio.sleep(self.latency)
+                status, payload = self._route(method, path, body)
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+        except asyncio.CancelledError:
+            # The server is shutting down
+            pass
+        finally:
+            writer.close()
+
+    def _route(self, method: str, path: str, body: bytes):
+        path = path.split("?", 1)[0]
+        if path == TASK_LIST_PATH and method == "POST":
+            return "201 Created", self.new_task(json.loads(body or b"{}"))
+        if path == TASK_LIST_PATH and method == "GET":
+            return "200 OK", sorted(self.tasks.values(), key=lambda t: t["created"], reverse=True)
+        if path.startswith(TASK_PATH_PREFIX) and method == "GET":
+            task = self.tasks.get(path.removeprefix(TASK_PATH_PREFIX).strip("/"))
+            if task:
+                return "200 OK", task
+        return "404 Not Found", {"detail": "Not found."}
+
+    async def _stream_events(self, head: bytes, path: str, reader, writer):
+        """Accept a websocket connection and send the events of a task, then close it."""
+        self.counters["websockets"] += 1
+        protocol = ServerProtocol(logger=logger)
+        protocol.receive_data(head)
+        request = protocol.events_received()[0]
+        task_id = path.removeprefix(EVENTS_PATH_PREFIX).split("/")[0]
+        task = self.tasks.get(task_id)
+        if task is None:
+            protocol.send_response(protocol.reject(404, "Unknown task"))
+            writer.write(b"".join(protocol.data_to_send()))
+            await writer.drain()
+            return
+        protocol.send_response(protocol.accept(request))
+
+        def send(message: dict):
+            protocol.send_text(json.dumps(message).encode("utf-8"))
+
+        interval = 1 / self.event_rate if self.event_rate else 0
+        for number in range(self.events_per_task):
+            send(
+                {
+                    "type": "event",
+                    "data": {
+                        "action": "search_code",
+                        "target": "",
+                        "message": f"Event {number + 1} of task {task_id}",
+                    },
+                }
+            )
+            writer.write(b"".join(protocol.data_to_send()))
+            await writer.drain()
+            if interval:
+                await asyncio.sleep(interval)
+
+        task["status"] = "completed"
+        task["result"] = self.result_text(task_id)
+        task["title"] = f"Benchmark task {task_id[:8]}"
+        send({"type": "title_update", "data": task["title"]})
+        send({"type": "status_update", "data": {"status": "completed", "message": task["result"]}})
+        protocol.send_close(1000)
+        writer.write(b"".join(protocol.data_to_send()))
+        await writer.drain()
+        # Wait for the client's close frame, the connection is closed right after it
+        deadline = time.monotonic() + 1
+        while protocol.close_rcvd is None and time.monotonic() < deadline:
+            try:
+                data = await asyncio.wait_for(reader.read(4096), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            if not data:
+                break
+            protocol.receive_data(data)
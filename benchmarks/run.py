@@ -0,0 +1,267 @@
+"""Run the CLI end to end against a local fake Arcane server and record timings.
+
+Every scenario runs `pilot` in a fresh subprocess, so timings include interpreter startup
+and imports, like for a user. Each run writes a Chrome trace (see PR_PILOT_TRACE), the span
+summaries are averaged into the results.
+
+Usage:
+
+    python -m benchmarks.run --iterations 5 --output results.json
+    python -m benchmarks.run --baseline results.json --tolerance 0.2
+
+With --baseline, the command exits with status 1 if the median time of a scenario got
+slower than the baseline by more than the tolerance.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.fake_arcane import FakeArcane
+
+REPO = "benchmark/repo"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = "benchmark-results.json"
+
+PLAN = """name: Benchmark plan
+prompt: Measure how long a plan takes.
+steps:
+  - name: First step
+    prompt: Do the first thing.
+  - name: Second step
+    prompt: Do the second thing.
+  - name: Third step
+    depends_on:
+      - First step
+      - Second step
+    prompt: Combine both.
+"""
+
+
+class Scenario:
+    """A `pilot` invocation to benchmark.
+
+    :param name: Name of the scenario in the results.
+    :param args: Command line arguments of `pilot`.
+    :param stdin: Input piped into the command.
+    :param units: Number of tasks a run processes, used to compute throughput.
+    """
+
+    def __init__(self, name: str, args: List[str], stdin: str = None, units: int = 1):
+        self.name = name
+        self.args = args
+        self.stdin = stdin
+        self.units = units
+
+
+def create_scenarios(work_dir: str, subtasks: int, batch_size: int) -> List[Scenario]:
+    """Write the input files of all scenarios into the working directory."""
+    plan_file = os.path.join(work_dir, "plan.yaml")
+    with open(plan_file, "w") as f:
+        f.write(PLAN)
+
+    template_file = os.path.join(work_dir, "fan-out.md.jinja2")
+    with open(template_file, "w") as f:
+        for number in range(subtasks):
+            f.write(f"## Part {number}\n\n{{{{ subtask('Write part {number}') }}}}\n\n")
+
+    batch_file = os.path.join(work_dir, "batch.jsonl")
+    with open(batch_file, "w") as f:
+        for number in range(batch_size):
+            f.write(json.dumps({"prompt": f"Batch task {number}"}) + "\n")
+
+    chat_file = os.path.join(work_dir, "chat.jsonl")
+    open(chat_file, "w").close()
+    options = ["--no-spinner", "--repo", REPO]
+    return [
+        Scenario("task", options + ["task", "Benchmark prompt"]),
+        Scenario("plan", options + ["plan", plan_file], units=3),
+        Scenario(
+            "subtask_fan_out",
+            options + ["task", "--direct", "-f", os.path.basename(template_file)],
+            units=subtasks,
+        ),
+        Scenario(
+            "batch",
+            options + ["batch", batch_file, "-o", os.path.join(work_dir, "batch.out")],
+            units=batch_size,
+        ),
+        Scenario("history", ["history", "--format", "json"], units=0),
+        Scenario("history_last_result", ["history", "last", "1", "result", "--markdown"], units=0),
+        Scenario(
+            "chat",
+            options + ["chat", "--history", chat_file],
+            stdin="Hello\nTell me more\n\n",
+            units=2,
+        ),
+    ]
+
+
+def isolated_environment(home: str, server_url: str) -> Dict[str, str]:
+    """Environment for `pilot` that only talks to the fake server and uses a temporary home."""
+    with open(os.path.join(home, ".pr-pilot.yaml"), "w") as f:
+        f.write("api_key: benchmark\nauto_sync: false\nverbose: false\n")
+    env = dict(os.environ)
+    env.update(
+        HOME=home,
+        PR_PILOT_HOST=server_url,
+        PR_PILOT_API_KEY="benchmark",
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")])),
+    )
+    return env
+
+
+def run_scenario(scenario: Scenario, iterations: int, env: dict, work_dir: str, server) -> dict:
+    """Run a scenario several times and return its statistics."""
+    durations = []
+    spans: Dict[str, List[float]] = {}
+    server.reset_counters()
+    for iteration in range(iterations):
+        trace_file = os.path.join(work_dir, f"{scenario.name}-{iteration}.trace.json")
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-m", "cli.cli", *scenario.args],
+            input=scenario.stdin or "",
+            capture_output=True,
+            text=True,
+            cwd=work_dir,
+            env={**env, "PR_PILOT_TRACE": trace_file},
+        )
+        durations.append(time.perf_counter() - start)
+        if process.returncode != 0:
+            raise click.ClickException(
+                f"Scenario {scenario.name} failed:\n{process.stdout}\n{process.stderr}"
+            )
+        with open(trace_file) as f:
+            for row in json.load(f)["otherData"]["summary"]:
+                spans.setdefault(row["name"], []).append(row["total"])
+
+    counters = server.reset_counters()
+    median = statistics.median(durations)
+    return {
+        "iterations": iterations,
+        "min": min(durations),
+        "median": median,
+        "mean": statistics.mean(durations),
+        "p95": sorted(durations)[max(round(0.95 * len(durations)) - 1, 0)],
+        "max": max(durations),
+        "throughput": scenario.units / median if scenario.units else None,
+        "requests_per_run": counters["requests"] / iterations,
+        "websockets_per_run": counters["websockets"] / iterations,
+        "spans": {name: statistics.mean(totals) for name, totals in spans.items()},
+    }
+
+
+def git_revision() -> Optional[str]:
+    result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Compare median times with a previous run."""
+    regressions = []
+    for name, scenario in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous and scenario["median"] > previous["median"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: {scenario['median'] * 1000:.0f} ms "
+                f"(baseline {previous['median'] * 1000:.0f} ms)"
+            )
+    return regressions
+
+
+def print_results(console: Console, results: dict):
+    table = Table(title="Benchmark results", box=None)
+    table.add_column("Scenario", style="bold")
+    table.add_column("Median ms", justify="right", style="cyan")
+    table.add_column("p95 ms", justify="right")
+    table.add_column("Tasks/s", justify="right")
+    table.add_column("Requests", justify="right", style="dim")
+    for name, scenario in results["scenarios"].items():
+        throughput = scenario["throughput"]
+        table.add_row(
+            name,
+            f"{scenario['median'] * 1000:.0f}",
+            f"{scenario['p95'] * 1000:.0f}",
+            f"{throughput:.1f}" if throughput else "",
+            f"{scenario['requests_per_run']:.1f}",
+        )
+    console.print(table)
+
+
+@click.command()
+@click.option("--iterations", "-n", type=click.IntRange(min=1), default=5, show_default=True)
+@click.option("--scenario", "-s", "selected", multiple=True, help="Only run these scenarios.")
+@click.option("--latency", type=float, default=0.0, show_default=True, help="REST latency (s).")
+@click.option("--events", type=int, default=10, show_default=True, help="Events per task.")
+@click.option("--event-rate", type=float, default=None, help="Events per second per task.")
+@click.option("--result-size", type=int, default=2000, show_default=True, help="Result chars.")
+@click.option("--subtasks", type=int, default=8, show_default=True, help="Template fan-out.")
+@click.option("--batch-size", type=int, default=20, show_default=True, help="Tasks per batch.")
+@click.option("--output", "-o", default=DEFAULT_OUTPUT, show_default=True)
+@click.option("--baseline", type=click.Path(exists=True), help="Results to compare with.")
+@click.option("--tolerance", type=float, default=0.2, show_default=True)
+def main(
+    iterations,
+    selected,
+    latency,
+    events,
+    event_rate,
+    result_size,
+    subtasks,
+    batch_size,
+    output,
+    baseline,
+    tolerance,
+):
+    """Benchmark `pilot` commands against a local fake Arcane server."""
+    console = Console()
+    server = FakeArcane(
+        latency=latency, events_per_task=events, event_rate=event_rate, result_size=result_size
+    )
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "server": server.settings,
+        "scenarios": {},
+    }
+    with server, tempfile.TemporaryDirectory() as work_dir:
+        home = os.path.join(work_dir, "home")
+        os.makedirs(home)
+        env = isolated_environment(home, server.url)
+        for scenario in create_scenarios(work_dir, subtasks, batch_size):
+            if selected and scenario.name not in selected:
+                continue
+            console.print(f"[dim]Running {scenario.name} ...[/dim]")
+            results["scenarios"][scenario.name] = run_scenario(
+                scenario, iterations, env, work_dir, server
+            )
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print_results(console, results)
+    console.print(f"Results written to [code]{output}[/code]")
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = find_regressions(results, json.load(f), tolerance)
+        if regressions:
+            console.print("[bold red]Regressions:[/bold red]\n" + "\n".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import base64
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import arcane
+import urllib3
+from arcane import Prompt, Task
+from arcane.engine import ArcaneEngine
+from arcane.util import _get_config_from_env, set_github_action_output
+from urllib3.connection import HTTPConnection, HTTPSConnection
+
+logger = logging.getLogger(__name__)
+
+# Number of connections kept alive, so concurrent requests don't have to reconnect
+MAX_POOL_SIZE = 32
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class ConnectionStats:
+    """Counters of the requests made with the shared API client."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.handshake_time = 0.0
+
+    @property
+    def reused_connections(self) -> int:
+        return max(self.requests - self.connections, 0)
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self, seconds: float):
+        with self._lock:
+            self.connections += 1
+            self.handshake_time += seconds
+
+    def summary(self) -> str:
+        return (
+            f"API: {self.requests} requests, {self.reused_connections} on reused connections, "
+            f"{self.connections} new connections ({self.handshake_time * 1000:.0f} ms connecting)"
+        )
+
+
+stats = ConnectionStats()
+
+
+def _timed_connection(connection_class):
+    class TimedConnection(connection_class):
+        def connect(self):
+            # Covers TCP connect and, for HTTPS, the TLS handshake
+            start = time.perf_counter()
+            try:
+                super().connect()
+            finally:
+                stats.record_connection(time.perf_counter() - start)
+
+    return TimedConnection
+
+
+class CountingHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _timed_connection(HTTPConnection)
+
+    def urlopen(self, *args, **kwargs):
+        stats.record_request()
+        return super().urlopen(*args, **kwargs)
+
+
+class CountingHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = _timed_connection(HTTPSConnection)
+
+    def urlopen(self, *args, **kwargs):
+        stats.record_request()
+        return super().urlopen(*args, **kwargs)
+
+
+def get_api_client() -> arcane.ApiClient:
+    """Return the process-wide API client, creating it on first use.
+
+    All commands share its connection pool, so connections to the PR Pilot API are kept
+    alive and reused instead of paying a new TLS handshake for every call.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            configuration = _get_config_from_env()
+            configuration.connection_pool_maxsize = max(
+                configuration.connection_pool_maxsize, MAX_POOL_SIZE
+            )
+            client = arcane.ApiClient(configuration)
+            pool_manager = client.rest_client.pool_manager
+            if type(pool_manager) is urllib3.PoolManager:
+                # Proxy managers use their own pools, only count direct connections
+                pool_manager.pool_classes_by_scheme = {
+                    "http": CountingHTTPConnectionPool,
+                    "https": CountingHTTPSConnectionPool,
+                }
+            _client = client
+        return _client
+
+
+class PilotEngine(ArcaneEngine):
+    """ArcaneEngine that sends all requests through the shared API client."""
+
+    def __init__(self):
+        # ArcaneEngine builds a configuration for clients of its own, the shared client has one
+        self.api_client = get_api_client()
+        self.config = self.api_client.configuration
+
+    def create_task(
+        self,
+        repo: str,
+        prompt: str,
+        log=True,
+        pr_number=None,
+        branch=None,
+        issue_number=None,
+        gpt_model=None,
+        image: Optional[Path] = None,
+    ) -> Task:
+        """Create a task for the specified repository with the given prompt."""
+        image_base64 = base64.b64encode(image.read_bytes()).decode("utf-8") if image else None
+        task = arcane.TaskCreationApi(self.api_client).tasks_create(
+            Prompt(
+                prompt=prompt,
+                github_repo=repo,
+                issue_number=int(issue_number) if issue_number is not None else None,
+                branch=branch,
+                pr_number=int(pr_number) if pr_number is not None else None,
+                gpt_model=gpt_model,
+                image=image_base64,
+            )
+        )
+        dashboard_url = f"https://arcane.engineer/dashboard/tasks/{str(task.id)}/"
+        set_github_action_output("task-id", str(task.id))
+        set_github_action_output("task-url", dashboard_url)
+        if log:
+            logger.info(f"PR Pilot task created: {dashboard_url}")
+        return task
+
+    def get_task(self, task_id: str) -> Task:
+        """Get the task with the specified ID."""
+        return arcane.TaskRetrievalApi(self.api_client).tasks_retrieve(task_id)
+
+    def list_tasks(self) -> List[Task]:
+        """List the last 10 tasks."""
+        return arcane.TaskRetrievalApi(self.api_client).tasks_list()
@@ -0,0 +1,210 @@
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+# Text filters that are applied to a pending result once it's available, instead of waiting
+LAZY_FILTERS = {
+    "capitalize",
+    "center",
+    "indent",
+    "lower",
+    "replace",
+    "title",
+    "trim",
+    "truncate",
+    "upper",
+    "wordwrap",
+}
+PLACEHOLDER = "\x00pending:{}\x00"
+
+# Background calls of the render in progress
+_current_calls: ContextVar[Optional["BackgroundCalls"]] = ContextVar(
+    "background_calls", default=None
+)
+_placeholder_numbers = itertools.count()
+
+
+class PendingResult:
+    """Result of a template function call that runs in the background.
+
+    Printed with `{{ }}`, it is replaced by a placeholder that is filled in after rendering,
+    so the template doesn't wait for it. Any other use, e.g. in a condition, a comparison or
+    as part of another prompt, waits for the result. The result is never guessed.
+    """
+
+    def __init__(self, compute: Callable[[], Any]):
+        self._compute = compute
+        self._lock = threading.Lock()
+        self._done = False
+        self._value = None
+
+    def result(self):
+        """Wait for the call and return its result."""
+        with self._lock:
+            if not self._done:
+                self._value = self._compute()
+                self._done = True
+        return self._value
+
+    def __str__(self):
+        return str(self.result())
+
+    def __repr__(self):
+        return repr(self.result())
+
+    def __eq__(self, other):
+        return self.result() == resolve_value(other)
+
+    def __hash__(self):
+        return hash(self.result())
+
+    def __lt__(self, other):
+        return self.result() < resolve_value(other)
+
+    def __gt__(self, other):
+        return self.result() > resolve_value(other)
+
+    def __bool__(self):
+        return bool(self.result())
+
+    def __len__(self):
+        return len(self.result())
+
+    def __iter__(self):
+        return iter(self.result())
+
+    def __contains__(self, item):
+        return resolve_value(item) in self.result()
+
+    def __getitem__(self, key):
+        return self.result()[key]
+
+    def __add__(self, other):
+        return self.result() + resolve_value(other)
+
+    def __radd__(self, other):
+        return resolve_value(other) + self.result()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.result(), name)
+
+
+def resolve_value(value):
+    """Wait for a pending result, return any other value as is."""
+    return value.result() if isinstance(value, PendingResult) else value
+
+
+class BackgroundCalls:
+    """Template function calls of one render that run on a thread pool.
+
+    `start()` returns a `PendingResult`. Placeholders printed for pending results are filled
+    in by `resolve()`. Leaving the context cancels calls that haven't started yet.
+    """
+
+    def __init__(self, status, max_parallel: int, description: str):
+        """
+        :param status: Status indicator of the render.
+        :param max_parallel: Maximum number of calls running at the same time.
+        :param description: What the calls are, for the status message, e.g. "sub-tasks".
+        """
+        self.status = status
+        self.max_parallel = max(max_parallel, 1)
+        self.description = description
+        self.placeholders: Dict[str, PendingResult] = {}
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        if self.executor:
+            self.executor.shutdown(cancel_futures=True)
+
+    def start(self, function, *args, then: Callable = None) -> PendingResult:
+        """Start a call in the background.
+
+        :param then: Called with the result of the call when it's used, on the using thread.
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_parallel)
+        future = self.executor.submit(function, *args)
+        if then:
+            return PendingResult(lambda: then(future.result()))
+        return PendingResult(future.result)
+
+    def placeholder(self, pending: PendingResult) -> str:
+        placeholder = PLACEHOLDER.format(next(_placeholder_numbers))
+        self.placeholders[placeholder] = pending
+        return placeholder
+
+    def resolve(self, text: str) -> str:
+        """Wait for the calls whose placeholders are in a text and fill in their results."""
+        placeholders = [p for p in self.placeholders if p in text]
+        if not placeholders:
+            return text
+        self.status.update_spinner_message(
+            f"Waiting for {len(placeholders)} {self.description} ..."
+        )
+        for placeholder in placeholders:
+            text = text.replace(placeholder, str(self.placeholders.pop(placeholder)))
+        return text
+
+    def activate(self):
+        """Make these calls the ones of the render in progress, see `finalize_output`."""
+        return _current_calls.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_calls.reset(token)
+
+
+def finalize_output(value):
+    """Print pending results as placeholders instead of waiting for them."""
+    calls = _current_calls.get()
+    if calls is not None and isinstance(value, PendingResult):
+        return calls.placeholder(value)
+    return value
+
+
+def resolving(function):
+    """Wrap a Jinja filter or test to wait for pending results among its arguments."""
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        args = [resolve_value(arg) for arg in args]
+        kwargs = {name: resolve_value(value) for name, value in kwargs.items()}
+        return function(*args, **kwargs)
+
+    return wrapper
+
+
+def lazy(function):
+    """Wrap a Jinja text filter to apply it to a pending result once it's available."""
+    # Filters with @pass_context and the like get the context first, the value second
+    value_index = 1 if hasattr(function, "jinja_pass_arg") else 0
+    resolving_function = resolving(function)
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if len(args) > value_index and isinstance(args[value_index], PendingResult):
+            return PendingResult(lambda: resolving_function(*args, **kwargs))
+        return resolving_function(*args, **kwargs)
+
+    return wrapper
+
+
+def support_pending_results(env):
+    """Set up a Jinja environment for templates that call functions in the background."""
+    env.finalize = finalize_output
+    env.filters.update(
+        {
+            name: lazy(function) if name in LAZY_FILTERS else resolving(function)
+            for name, function in env.filters.items()
+        }
+    )
+    env.tests.update({name: resolving(function) for name, function in env.tests.items()})
@@ -0,0 +1,234 @@
+import asyncio
+import json
+from typing import List, Optional, Tuple, Union
+
+import arcane
+import urllib3
+from arcane import ApiException, Prompt, Task
+from pydantic import ValidationError
+
+from cli.api_client import get_api_client
+from cli.detect_repository import detect_repository
+from cli.models import TaskParameters
+from cli.prompt_template import PromptTemplate
+from cli.status_indicator import StatusIndicator
+from cli.task_event_hub import TaskEventHub
+from cli.task_handler import TaskHandler, STATUS_COMPLETED
+from cli.task_runner import TaskRunner
+from cli.user_config import UserConfig
+
+MAX_PARALLEL_TASKS = 8
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 2  # Seconds, doubled after every failed attempt
+
+STATUS_CREATED = "created"
+STATUS_RENDERED = "rendered"
+STATUS_FAILED = "failed"
+
+BatchItem = Tuple[int, Union[TaskParameters, Exception]]
+
+
+def load_batch(file_path: str, defaults: dict = None) -> List[BatchItem]:
+    """Read the tasks of a batch file.
+
+    Every non-empty line is a JSON object with the fields of `TaskParameters`. Invalid lines
+    don't abort loading, they are returned as exceptions, so they can be reported per line.
+
+    :param file_path: Path to the JSONL file
+    :param defaults: Parameters for fields a line does not set
+    :return: List of (line number, task parameters or exception)
+    """
+    defaults = {key: value for key, value in (defaults or {}).items() if value is not None}
+    items = []
+    with open(file_path, "r") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                fields = json.loads(line)
+                if not isinstance(fields, dict):
+                    raise ValueError("Expected a JSON object")
+                items.append((line_number, TaskParameters(**{**defaults, **fields})))
+            except (ValueError, ValidationError) as e:
+                items.append((line_number, ValueError(f"Invalid task parameters: {e}")))
+    return items
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Check if creating a task might succeed when trying again."""
+    if isinstance(error, ApiException):
+        return error.status is None or error.status == 429 or error.status >= 500
+    return isinstance(error, urllib3.exceptions.HTTPError)
+
+
+class BatchRunner:
+    """Run the tasks of a batch file from a single process.
+
+    All tasks share the process-wide API client and one event loop. At most `max_parallel`
+    tasks are created or followed at the same time. A failing task is recorded in its
+    result, it doesn't stop the other tasks of the batch.
+    """
+
+    def __init__(
+        self,
+        status_indicator: StatusIndicator,
+        max_parallel: int = MAX_PARALLEL_TASKS,
+        max_attempts: int = MAX_ATTEMPTS,
+        wait: bool = True,
+        api_client: arcane.ApiClient = None,
+    ):
+        self.status_indicator = status_indicator
+        self.max_parallel = max_parallel
+        self.max_attempts = max_attempts
+        self.wait = wait
+        if api_client is None:
+            api_client = get_api_client()
+        self.creation_api = arcane.TaskCreationApi(api_client)
+        self.retrieval_api = arcane.TaskRetrievalApi(api_client)
+        self.hub = TaskEventHub(max_connections=max_parallel)
+        # Progress is reported for the whole batch, the handlers of single tasks stay quiet
+        self.task_status = StatusIndicator(spinner=False, display_log_messages=False)
+        self.default_repo = None
+        self.total = 0
+        self.finished = 0
+        self.failed = 0
+
+    def prepare(self, params: TaskParameters) -> TaskParameters:
+        """Resolve repository, template and options of a task before it is submitted."""
+        if params.snap:
+            raise ValueError("Screenshots are not supported in batches")
+        if not params.repo:
+            if self.default_repo is None:
+                self.default_repo = detect_repository() or UserConfig.shared().get("default_repo")
+            params.repo = self.default_repo
+        if not params.repo:
+            raise ValueError("No Github repository provided")
+        if params.file:
+            renderer = PromptTemplate(params.file, params.repo, params.model, self.status_indicator)
+            params.prompt = renderer.render()
+        if not params.prompt:
+            raise ValueError("No prompt provided")
+        if not params.direct:
+            TaskRunner.apply_task_options(params)
+        return params
+
+    async def create_task(self, params: TaskParameters) -> Task:
+        """Create a task, retrying with exponential backoff on transient errors."""
+        prompt = Prompt(
+            prompt=params.prompt,
+            github_repo=params.repo,
+            branch=params.branch,
+            pr_number=params.pr_number,
+            gpt_model=params.model,
+        )
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await asyncio.to_thread(self.creation_api.tasks_create, prompt)
+            except Exception as e:
+                if attempt == self.max_attempts or not is_transient_error(e):
+                    raise
+                await asyncio.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+
+    async def run_task(self, params: TaskParameters) -> dict:
+        """Run a single task of the batch and return its result record."""
+        if params.direct:
+            return {"status": STATUS_RENDERED, "result": params.prompt}
+        task = await self.create_task(params)
+        record = {"task_id": str(task.id), "title": task.title}
+        if not self.wait:
+            return {**record, "status": STATUS_CREATED}
+
+        handler = TaskHandler(task, self.task_status)
+        result = await handler.stream_task_events(
+            task.id,
+            output_file=params.output,
+            log_messages=False,
+            code=params.code,
+            print_result=False,
+            hub=self.hub,
+        )
+        if result is None:
+            # The event stream ended early, the task may have finished anyway
+            task = await asyncio.to_thread(self.retrieval_api.tasks_retrieve, str(task.id))
+            if task.status != STATUS_COMPLETED:
+                raise ValueError(f"Lost connection to task (status: {task.status})")
+            if params.output:
+                handler.write_result_to_file(params.code, task.result, params.output)
+            result = task.result
+        return {**record, "title": handler.task.title, "status": STATUS_COMPLETED, "result": result}
+
+    def report(self, line_number: int, record: dict) -> None:
+        """Update the progress of the batch after a task finished."""
+        self.finished += 1
+        if record["status"] == STATUS_FAILED:
+            self.failed += 1
+            self.status_indicator.log_message(
+                f"Line {line_number} failed: {record['error']}", "✘", "red"
+            )
+        else:
+            self.status_indicator.log_message(f"Line {line_number}: {record.get('title') or ''}")
+        self.status_indicator.update_spinner_message(
+            f"{self.finished} / {self.total} tasks finished, {self.failed} failed"
+        )
+
+    async def run_batch(self, items: List[BatchItem], output_file: str) -> List[dict]:
+        """Run all tasks and write their results to a JSONL file, in the order of the batch.
+
+        Results are written as soon as all tasks before them are finished.
+        """
+        self.total = len(items)
+        self.finished = 0
+        self.failed = 0
+        records: List[Optional[dict]] = [None] * len(items)
+        written = 0
+        slots = asyncio.Semaphore(self.max_parallel)
+        self.status_indicator.update_spinner_message(f"0 / {self.total} tasks finished")
+        self.status_indicator.start()
+
+        with open(output_file, "w") as out:
+
+            def write_finished_records():
+                nonlocal written
+                while written < len(records) and records[written] is not None:
+                    out.write(json.dumps(records[written]) + "\n")
+                    written += 1
+                out.flush()
+
+            async def run_item(position: int, line_number: int, params: TaskParameters):
+                try:
+                    async with slots:
+                        record = await self.run_task(params)
+                except Exception as e:
+                    record = {"status": STATUS_FAILED, "error": str(e)}
+                records[position] = {"line": line_number, **record}
+                self.report(line_number, records[position])
+                write_finished_records()
+
+            jobs = []
+            for position, (line_number, item) in enumerate(items):
+                if isinstance(item, Exception):
+                    records[position] = {
+                        "line": line_number,
+                        "status": STATUS_FAILED,
+                        "error": str(item),
+                    }
+                    self.report(line_number, records[position])
+                else:
+                    jobs.append(run_item(position, line_number, item))
+            write_finished_records()
+            await asyncio.gather(*jobs)
+
+        self.status_indicator.stop()
+        return records
+
+    def run(self, items: List[BatchItem], output_file: str) -> List[dict]:
+        """Prepare all tasks of a batch, then run them and write their results."""
+        prepared = []
+        for line_number, item in items:
+            if not isinstance(item, Exception):
+                try:
+                    item = self.prepare(item)
+                except Exception as e:
+                    item = e
+            prepared.append((line_number, item))
+        return asyncio.run(self.run_batch(prepared, output_file))
@@ -0,0 +1,151 @@
+import json
+import os
+from typing import Callable, List, Optional
+
+from pydantic import BaseModel, Field
+from rich import print
+from rich.panel import Panel
+
+from cli.constants import CHARS_PER_TOKEN
+from cli.util import markdown_panel
+
+SUMMARY_ROLE = "summary"
+# Maximum number of messages passed into the prompt word for word
+DEFAULT_WINDOW = 20
+# Default size limit of a chat prompt, in tokens
+DEFAULT_PROMPT_BUDGET = 8000
+SUMMARY_MAX_CHARS = 2000
+PROMPT_HEADER = "We're having a conversation. Here's the chat history:\n\n"
+PROMPT_FOOTER = "\n\n---\nRespond to the last message above."
+MESSAGE_SEPARATOR = "\n\n---\n\n"
+SUMMARY_LABEL = "SUMMARY OF THE EARLIER CONVERSATION: "
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: str
+    covers: Optional[int] = Field(
+        default=None, description="Number of messages a summary covers, from the start"
+    )
+
+    def print(self):
+        """Print the chat message"""
+        if self.role == "user":
+            print(Panel(f"[blue]{self.content}[/blue]", expand=False, title="You"))
+        elif self.role == "assistant":
+            print(markdown_panel(None, self.content, hide_frame=True))
+
+    def to_prompt(self) -> str:
+        return f"{self.role.upper()}: {self.content}"
+
+
+class ChatHistory(BaseModel):
+    """Messages of a conversation and the prompt that continues it.
+
+    Prompts contain a summary of older messages and the most recent messages word for word,
+    limited to `window` messages and `max_chars` characters. Once more than `window`
+    messages are not covered by the summary, the older half of them is summarized into
+    a new summary, which is kept in the history file and reused when the chat is resumed.
+
+    The history file is a JSON lines log. Messages and summaries are appended to it, it is
+    only rewritten when converting a file of the old JSON list format.
+    """
+
+    messages: List[ChatMessage] = Field(default=[])
+    file: Optional[str] = Field(default=None)
+    summary: Optional[ChatMessage] = Field(default=None)
+    window: int = Field(default=DEFAULT_WINDOW)
+    max_chars: Optional[int] = Field(default=DEFAULT_PROMPT_BUDGET * CHARS_PER_TOKEN)
+    summarizer: Optional[Callable[[str, int], str]] = Field(default=None, exclude=True)
+
+    def print(self):
+        """Print the chat history"""
+        for msg in self.messages:
+            msg.print()
+
+    def _entries(self) -> List[ChatMessage]:
+        return self.messages + ([self.summary] if self.summary else [])
+
+    def _append_to_file(self, entry: ChatMessage):
+        if self.file:
+            with open(self.file, "a") as f:
+                f.write(entry.model_dump_json(exclude_none=True) + "\n")
+
+    def dump(self):
+        """Write the whole chat history to its JSON lines file"""
+        tmp_path = f"{self.file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            for entry in self._entries():
+                f.write(entry.model_dump_json(exclude_none=True) + "\n")
+        os.replace(tmp_path, self.file)
+
+    def append(self, message: ChatMessage):
+        """Append a message to the chat history and its file"""
+        self.messages.append(message)
+        self._append_to_file(message)
+
+    def load(self):
+        """Load chat history from its file. Create it if it doesn't exist."""
+        if not self.file:
+            raise ValueError("No file path provided.")
+        if not os.path.exists(self.file):
+            open(self.file, "w").close()
+            return
+        with open(self.file, "r") as f:
+            content = f.read()
+        if content.lstrip().startswith("["):
+            # History saved as a JSON list by older versions, convert it once
+            self.messages = [ChatMessage(**msg) for msg in json.loads(content)]
+            self.dump()
+            return
+        self.messages = []
+        for line in content.splitlines():
+            try:
+                entry = ChatMessage.model_validate_json(line)
+            except ValueError:
+                # Skip empty lines and a line cut off by an interrupted write
+                continue
+            if entry.role == SUMMARY_ROLE:
+                self.summary = entry
+            else:
+                self.messages.append(entry)
+
+    @property
+    def covered(self) -> int:
+        """Number of messages, from the start, that are covered by the summary."""
+        return self.summary.covers if self.summary else 0
+
+    def compact(self) -> bool:
+        """Summarize older messages if too many of them are not covered by the summary.
+
+        :return: True if a new summary was created.
+        """
+        if not self.summarizer or len(self.messages) - self.covered <= self.window:
+            return False
+        covered = self.covered
+        covers = len(self.messages) - self.window // 2
+        parts = [self.summary.content] if self.summary else []
+        parts += [msg.to_prompt() for msg in self.messages[covered:covers]]
+        content = self.summarizer(MESSAGE_SEPARATOR.join(parts), SUMMARY_MAX_CHARS)
+        self.summary = ChatMessage(role=SUMMARY_ROLE, content=content, covers=covers)
+        self._append_to_file(self.summary)
+        return True
+
+    def to_prompt(self):
+        """Convert chat history to a prompt"""
+        first = max(self.covered, len(self.messages) - self.window)
+        recent = [msg.to_prompt() for msg in self.messages[first:]]
+        summary = ""
+        if self.max_chars is not None:
+            budget = self.max_chars - len(PROMPT_HEADER) - len(PROMPT_FOOTER)
+            size = sum(len(part) + len(MESSAGE_SEPARATOR) for part in recent)
+            # Drop the oldest messages first, but always keep the last one
+            while size > budget and len(recent) > 1:
+                size -= len(recent.pop(0)) + len(MESSAGE_SEPARATOR)
+            if self.summary:
+                summary = self.summary.content[: max(budget - size - len(SUMMARY_LABEL), 0)]
+        elif self.summary:
+            summary = self.summary.content
+        if summary:
+            recent.insert(0, SUMMARY_LABEL + summary)
+        return PROMPT_HEADER + MESSAGE_SEPARATOR.join(recent) + PROMPT_FOOTER
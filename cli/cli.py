@@ -1,21 +1,39 @@
+import os
+import sys
+
+# Imported first, so the time spent importing the CLI is part of the profile
+from cli.profiling import PROCESS_START, TRACE_ENV_VAR, profiler, span
+
 import click
 from rich import print
 
-from cli.commands.chat import chat
-from cli.commands.config import config
-from cli.commands.edit import edit
-from cli.commands.grab import grab
-from cli.commands.history import history
-from cli.commands.plan import plan
-from cli.commands.run import RunCommand
-from cli.commands.task import task
-from cli.commands.upgrade import upgrade
-from cli.commands.pr import pr
 from cli.constants import DEFAULT_MODEL
+from cli.lazy_group import LazyGroup
 from cli.user_config import UserConfig
 
-
-@click.group()
+# Sub-commands are only imported when invoked, keeping `pilot` startup fast.
+# The help text is shown in `pilot --help` without importing the command module.
+SUBCOMMANDS = {
+    "task": ("cli.commands.task:task", "➕ Create a new task for PR Pilot."),
+    "edit": ("cli.commands.edit:edit", "✍️ Let PR Pilot edit a file for you."),
+    "plan": ("cli.commands.plan:plan", "📋 Let PR Pilot execute a plan for you."),
+    "grab": (
+        "cli.commands.grab:grab",
+        "🤲 Grab commands, prompts, plans, and skills from other repositories.",
+    ),
+    "history": ("cli.commands.history:history", "📜 Access recent tasks."),
+    "config": ("cli.commands.config:config", "🔧 Customize PR Pilots behavior."),
+    "upgrade": ("cli.commands.upgrade:upgrade", "⬆️ Upgrade pr-pilot-cli to the latest version."),
+    "chat": ("cli.commands.chat:chat", "💬 Chat with PR Pilot."),
+    "pr": ("cli.commands.pr:pr", "🌐 Find and open the pull request for the current branch."),
+    "run": ("cli.commands.run:run", "🚀 Run a saved command."),
+    "watch": ("cli.commands.watch:watch", "👀 Follow one or more running tasks."),
+    "batch": ("cli.commands.batch:batch", "📦 Run many tasks from a JSONL file."),
+    "cache": ("cli.commands.cache:cache", "🗄️ Inspect or clear the local task result cache."),
+}
+
+
+@click.group(cls=LazyGroup, lazy_subcommands=SUBCOMMANDS)
 @click.option(
     "--wait/--no-wait",
     is_flag=True,
@@ -44,17 +62,41 @@ from cli.user_config import UserConfig
     default=None,
     help="Run task on your current branch and pull PR Pilots changes when done.",
 )
+@click.option(
+    "--cache/--no-cache",
+    is_flag=True,
+    default=None,
+    help="Reuse results of identical tasks on the same commit from the local cache.",
+)
+@click.option(
+    "--markdown",
+    is_flag=True,
+    default=False,
+    help="Print results as plain markdown. Default if the output is piped.",
+)
 @click.option("--debug", is_flag=True, default=False, help="Display debug information.")
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help=f"Print where the command spends its time. Set {TRACE_ENV_VAR} to a file path "
+    "to also write a Chrome trace.",
+)
 @click.pass_context
-
-def main(ctx, wait, repo, spinner, verbose, model, branch, sync, debug):
+def main(ctx, wait, repo, spinner, verbose, model, branch, sync, cache, markdown, debug, profile):
     """PR Pilot CLI - https://docs.pr-pilot.ai
 
     Delegate routine work to AI with confidence and predictability.
     """
 
-    user_config = UserConfig()
-    user_config.set_api_key_env_var()
+    if profile or os.getenv(TRACE_ENV_VAR):
+        profiler.enable()
+        profiler.record("import", PROCESS_START)
+        ctx.call_on_close(lambda: report_profile(profile))
+
+    with span("load config"):
+        user_config = UserConfig.shared()
+        user_config.set_api_key_env_var()
 
     # If repo is set manually, don't auto sync
     if repo:
@@ -64,6 +106,10 @@ def main(ctx, wait, repo, spinner, verbose, model, branch, sync, debug):
             # Sync is not set, so let's see if it's set in user config
             sync = user_config.auto_sync_enabled
 
+    if cache is None:
+        # Cache is not set, so let's see if it's enabled in user config
+        cache = user_config.result_cache_enabled
+
     ctx.ensure_object(dict)
     ctx.obj["wait"] = wait
     ctx.obj["repo"] = repo
@@ -71,6 +117,8 @@ def main(ctx, wait, repo, spinner, verbose, model, branch, sync, debug):
     ctx.obj["model"] = model
     ctx.obj["branch"] = branch
     ctx.obj["sync"] = sync
+    ctx.obj["cache"] = cache
+    ctx.obj["markdown"] = markdown
     ctx.obj["debug"] = debug
 
     if verbose is None:
@@ -81,25 +129,26 @@ def main(ctx, wait, repo, spinner, verbose, model, branch, sync, debug):
 
     if debug:
         print(ctx.obj)
+        ctx.call_on_close(print_api_stats)
 
 
-main.add_command(task)
-main.add_command(edit)
-main.add_command(plan)
-main.add_command(grab)
-main.add_command(history)
-main.add_command(config)
-main.add_command(upgrade)
-main.add_command(chat)
-main.add_command(pr)
+def print_api_stats():
+    """Print how many API requests were made and how many connections they needed."""
+    # Don't import the API client just for this, it is only loaded by commands using the API
+    api_client = sys.modules.get("cli.api_client")
+    if api_client and api_client.stats.requests:
+        print(api_client.stats.summary())
 
-run_command_help = """
-🚀 Run a saved command.
 
-Create new commands by using the --save-command flag when running a task.
-"""
+def report_profile(print_summary):
+    """Print the span timings of this invocation and write them to the trace file, if any."""
+    if print_summary:
+        from rich.console import Console
 
-main.add_command(RunCommand(name="run", help=run_command_help))
+        profiler.print_summary(Console(stderr=True))
+    trace_file = os.getenv(TRACE_ENV_VAR)
+    if trace_file:
+        profiler.write_trace(trace_file, {"argv": sys.argv[1:]})
 
 
 if __name__ == "__main__":
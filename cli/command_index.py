@@ -1,5 +1,6 @@
 import os
-from typing import List, Optional
+from contextlib import contextmanager
+from typing import Dict, List, Optional
 
 import click
 import yaml
@@ -7,12 +8,26 @@ from click import Command
 from pydantic import BaseModel, Field
 from rich.console import Console
 
+from cli.constants import CACHE_DIR
 from cli.models import TaskParameters
 from cli.status_indicator import StatusIndicator
 from cli.task_runner import TaskRunner
-from cli.util import is_git_repo, get_git_root
+from cli.user_config import YamlLoader
+from cli.util import (
+    is_git_repo,
+    get_git_root,
+    get_current_branch,
+    file_signature,
+    json_cache_path,
+    read_json_cache,
+    write_json_cache,
+)
 
 COMMAND_FILE_PATH = ".pilot-commands.yaml"
+COMMAND_CACHE_DIR = os.path.join(CACHE_DIR, "commands")
+
+# Parsed command files of this process, by path: (file signature, commands by name)
+_parsed_indexes = {}
 
 
 class PilotCommand(BaseModel):
@@ -25,27 +40,28 @@ class PilotCommand(BaseModel):
     def callback(self, *args, **kwargs):
         console = Console()
 
-        # Overwrite parameters
-        self.params.output = kwargs.get("output", self.params.output)
-        self.params.model = kwargs.get("model", self.params.model)
-        self.params.verbose = kwargs.get("verbose", self.params.verbose)
-        self.params.debug = kwargs.get("debug", self.params.debug)
-        self.params.spinner = kwargs.get("spinner", self.params.spinner)
-        self.params.sync = kwargs.get("sync", self.params.sync)
-        self.params.wait = kwargs.get("wait", self.params.wait)
+        # Overwrite parameters of this run, the saved command stays unchanged
+        params = self.params.model_copy()
+        params.output = kwargs.get("output", params.output)
+        params.model = kwargs.get("model", params.model)
+        params.verbose = kwargs.get("verbose", params.verbose)
+        params.debug = kwargs.get("debug", params.debug)
+        params.spinner = kwargs.get("spinner", params.spinner)
+        params.sync = kwargs.get("sync", params.sync)
+        params.wait = kwargs.get("wait", params.wait)
 
-        if self.params.sync:
+        if params.sync:
             # Get current branch from git
-            current_branch = os.popen("git rev-parse --abbrev-ref HEAD").read().strip()
+            current_branch = get_current_branch()
             if current_branch not in ["master", "main"]:
-                self.params.branch = current_branch
+                params.branch = current_branch
         status_indicator = StatusIndicator(
-            spinner=self.params.spinner,
-            display_log_messages=self.params.verbose,
+            spinner=params.spinner,
+            display_log_messages=params.verbose,
             console=console,
         )
         runner = TaskRunner(status_indicator)
-        runner.run_task(self.params)
+        runner.run_task(params)
         status_indicator.stop()
 
     def to_click_command(self) -> Command:
@@ -132,6 +148,9 @@ def find_pilot_commands_file() -> Optional[str]:
 class CommandIndex:
     """
     A class to manage the index of commands stored in a YAML file.
+
+    Commands are indexed by name. Parsed command files are cached per process and as JSON
+    in ~/.cache/pr-pilot/commands/, both keyed by the file's modification time and size.
     """
 
     def __init__(self, file_path: str = None):
@@ -143,30 +162,100 @@ class CommandIndex:
         self.file_path = file_path
         if not self.file_path:
             self.file_path = find_pilot_commands_file()
-        self.commands = self._load_commands() if self.file_path else []
+        self.commands: Dict[str, PilotCommand] = self._load_commands() if self.file_path else {}
+        self._click_commands: Dict[str, Command] = {}
+        self._transaction_depth = 0
+        self._unsaved_changes = False
+
+    def _command_cache_path(self) -> str:
+        return json_cache_path(COMMAND_CACHE_DIR, self.file_path)
+
+    def _read_command_data(self, signature) -> list:
+        """Read the raw command definitions, from the JSON cache if the file is unchanged."""
+        commands = read_json_cache(self._command_cache_path(), self.file_path, signature)
+        if commands is not None:
+            return commands
+
+        with open(self.file_path, "r") as file:
+            data = yaml.load(file, Loader=YamlLoader) or {}
+        commands = data.get("commands", [])
+        self._write_command_cache(signature, commands)
+        return commands
+
+    def _write_command_cache(self, signature, commands: list) -> None:
+        # Command files of temporary checkouts, e.g. by `pilot grab`, leave stale caches behind
+        write_json_cache(
+            self._command_cache_path(), self.file_path, signature, commands, prune=True
+        )
 
-    def _load_commands(self) -> List[PilotCommand]:
+    def _load_commands(self) -> Dict[str, PilotCommand]:
         """
         Load commands from the YAML file.
 
-        :return: A list of Command instances.
+        :return: Command instances by name.
+
+        :raises ValueError: If several commands in the file have the same name.
         """
-        try:
-            with open(self.file_path, "r") as file:
-                data = yaml.safe_load(file)
-                return [PilotCommand(**cmd) for cmd in data.get("commands", [])]
-        except FileNotFoundError:
-            return []
+        signature = file_signature(self.file_path)
+        if signature is None:
+            return {}
+        path = os.path.abspath(self.file_path)
+        cached = _parsed_indexes.get(path)
+        if cached is None or cached[0] != signature:
+            commands = {}
+            for data in self._read_command_data(signature):
+                command = PilotCommand(**data)
+                if command.name in commands:
+                    # Saving the index would silently drop all but the last of them
+                    raise ValueError(f"Duplicate command name '{command.name}' in {self.file_path}")
+                commands[command.name] = command
+            cached = (signature, commands)
+            _parsed_indexes[path] = cached
+        # Commands are mutable, so every index gets its own copies
+        return {name: command.model_copy(deep=True) for name, command in cached[1].items()}
 
     def save_commands(self) -> None:
         """
         Save the current list of commands to the YAML file.
+
+        The file is replaced atomically. Inside a transaction, saving is deferred until
+        the transaction ends.
         """
-        with open(self.file_path, "w") as file:
-            yaml.dump(
-                {"commands": [cmd.model_dump(exclude_none=True) for cmd in self.commands]},
-                file,
-            )
+        if self._transaction_depth:
+            self._unsaved_changes = True
+            return
+        commands = [cmd.model_dump(exclude_none=True) for cmd in self.commands.values()]
+        tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            yaml.dump({"commands": commands}, file)
+        os.replace(tmp_path, self.file_path)
+        self._unsaved_changes = False
+        signature = file_signature(self.file_path)
+        _parsed_indexes[os.path.abspath(self.file_path)] = (
+            signature,
+            {name: command.model_copy(deep=True) for name, command in self.commands.items()},
+        )
+        self._write_command_cache(signature, commands)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group several changes into a single write of the command file.
+
+        If an exception is raised inside the transaction, its changes are discarded.
+        """
+        snapshot = dict(self.commands)
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.commands = snapshot
+            self._click_commands.clear()
+            raise
+        finally:
+            self._transaction_depth -= 1
+        if not self._transaction_depth and self._unsaved_changes:
+            self.save_commands()
 
     def add_command(self, new_command: PilotCommand) -> None:
         """
@@ -176,14 +265,14 @@ class CommandIndex:
 
         :raises ValueError: If a command with the same name already exists.
         """
-        for cmd in self.commands:
-            if cmd.name == new_command.name:
-                raise ValueError(f"Command with name '{new_command.name}' already exists")
+        if new_command.name in self.commands:
+            raise ValueError(f"Command with name '{new_command.name}' already exists")
         new_command.params.branch = None
         new_command.params.pr_number = None
         if new_command.params.file:
             new_command.params.prompt = None
-        self.commands.append(new_command)
+        self.commands[new_command.name] = new_command
+        self._click_commands.pop(new_command.name, None)
         self.save_commands()
 
     def get_commands(self) -> List[PilotCommand]:
@@ -192,7 +281,7 @@ class CommandIndex:
 
         :return: A list of Command instances.
         """
-        return self.commands
+        return list(self.commands.values())
 
     def get_command(self, command_name) -> Optional[PilotCommand]:
         """
@@ -201,10 +290,21 @@ class CommandIndex:
         :param command_name:
         :return:
         """
-        for cmd in self.commands:
-            if cmd.name == command_name:
-                return cmd
-        return None
+        return self.commands.get(command_name)
+
+    def get_click_command(self, command_name) -> Optional[Command]:
+        """
+        Get the click command of a saved command, built on first use.
+
+        :param command_name:
+        :return:
+        """
+        if command_name not in self._click_commands:
+            pilot_command = self.commands.get(command_name)
+            if pilot_command is None:
+                return None
+            self._click_commands[command_name] = pilot_command.to_click_command()
+        return self._click_commands[command_name]
 
     def remove_command(self, command_name) -> None:
         """
@@ -212,5 +312,6 @@ class CommandIndex:
 
         :param command_name:
         """
-        self.commands = [cmd for cmd in self.commands if cmd.name != command_name]
+        self.commands.pop(command_name, None)
+        self._click_commands.pop(command_name, None)
         self.save_commands()
@@ -0,0 +1,74 @@
+import os
+
+import click
+from rich.console import Console
+
+from cli.batch_runner import (
+    BatchRunner,
+    load_batch,
+    MAX_PARALLEL_TASKS,
+    MAX_ATTEMPTS,
+    STATUS_FAILED,
+)
+from cli.status_indicator import StatusIndicator
+
+
+@click.command()
+@click.option(
+    "--max-parallel",
+    type=click.IntRange(min=1),
+    default=MAX_PARALLEL_TASKS,
+    show_default=True,
+    help="Maximum number of tasks running at the same time.",
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    default=MAX_ATTEMPTS - 1,
+    show_default=True,
+    help="How often to retry creating a task after a temporary error.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(exists=False),
+    help="💾 Output file for the results. Defaults to <file>.results.jsonl",
+)
+@click.argument("file_path", type=click.Path(exists=True))
+@click.pass_context
+def batch(ctx, max_parallel, retries, output, file_path):
+    """📦 Run many tasks from a JSONL file.
+
+    Every line of the file is a JSON object with the parameters of a task,
+    e.g. {"prompt": "Update the README", "repo": "owner/repo"}. The results are
+    written to a JSONL file in the same order.
+
+    Example: pilot batch nightly.jsonl -o results.jsonl
+    """
+    console = Console()
+    if not output:
+        output = os.path.splitext(file_path)[0] + ".results.jsonl"
+    defaults = {
+        "repo": ctx.obj["repo"],
+        "model": ctx.obj["model"],
+        "branch": ctx.obj["branch"],
+    }
+    items = load_batch(file_path, defaults)
+    status_indicator = StatusIndicator(
+        spinner=ctx.obj["spinner"], display_log_messages=ctx.obj["verbose"], console=console
+    )
+    runner = BatchRunner(
+        status_indicator,
+        max_parallel=max_parallel,
+        max_attempts=retries + 1,
+        wait=ctx.obj["wait"],
+    )
+    try:
+        records = runner.run(items, output)
+    finally:
+        status_indicator.stop()
+
+    failed = sum(1 for record in records if record["status"] == STATUS_FAILED)
+    console.print(f"Wrote {len(records)} results to [code]{output}[/code]")
+    if failed:
+        raise click.ClickException(f"{failed} of {len(records)} tasks failed.")
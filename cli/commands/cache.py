@@ -0,0 +1,42 @@
+import click
+import humanize
+from rich.console import Console
+from rich.padding import Padding
+from rich.table import Table
+
+from cli.result_cache import ResultCache
+
+
+@click.group()
+def cache():
+    """🗄️ Inspect or clear the local task result cache.
+
+    Enable the cache with `pilot --cache task ...` or by setting `result_cache: true`
+    in your configuration file.
+    """
+    pass
+
+
+@cache.command()
+def stats():
+    """Show size and hit rate of the result cache."""
+    stats = ResultCache().stats()
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = f"{stats['hits'] / lookups:.0%}" if lookups else "-"
+    table = Table(box=None, show_header=False)
+    table.add_column("Property", justify="left", style="bold yellow", no_wrap=True)
+    table.add_column("Value", justify="left", style="cyan")
+    table.add_row("Entries", str(stats["entries"]))
+    table.add_row("Size", humanize.naturalsize(stats["size"]))
+    table.add_row("Hits", str(stats["hits"]))
+    table.add_row("Misses", str(stats["misses"]))
+    table.add_row("Hit rate", hit_rate)
+    table.add_row("Evictions", str(stats["evictions"]))
+    Console().print(Padding(table, (1, 1)))
+
+
+@cache.command()
+def clear():
+    """Remove all cached results."""
+    ResultCache().clear()
+    Console().print("Result cache cleared.")
@@ -1,67 +1,35 @@
-import json
-import os
-from typing import List, Optional
-
 import click
-from pydantic import BaseModel, Field
 from rich import print
 from rich.console import Console
-from rich.panel import Panel
 from rich.prompt import Confirm
 
+from cli.chat_history import ChatHistory, ChatMessage, DEFAULT_PROMPT_BUDGET, DEFAULT_WINDOW
+from cli.constants import CHARS_PER_TOKEN, CHEAP_MODEL
 from cli.detect_repository import detect_repository
 from cli.models import TaskParameters
 from cli.status_indicator import StatusIndicator
 from cli.task_runner import TaskRunner
-from cli.util import get_branch_if_pushed, markdown_panel
-
-
-class ChatMessage(BaseModel):
-    role: str
-    content: str
-
-    def print(self):
-        """Print the chat message"""
-        if self.role == "user":
-            print(Panel(f"[blue]{self.content}[/blue]", expand=False, title="You"))
-        elif self.role == "assistant":
-            print(markdown_panel(None, self.content, hide_frame=True))
-
-
-class ChatHistory(BaseModel):
-    messages: List[ChatMessage] = Field(default=[])
-    file: Optional[str] = Field(default=None)
-
-    def print(self):
-        """Print the chat history"""
-        for msg in self.messages:
-            msg.print()
-
-    def dump(self):
-        """Dump chat history to JSON file"""
-        json.dump([msg.dict() for msg in self.messages], open(self.file, "w"))
-
-    def append(self, message: ChatMessage):
-        """Append a message to the chat history"""
-        self.messages.append(message)
-
-    def load(self):
-        """Load chat history from JSON file. Create it if it doesn't exist."""
-        if not self.file:
-            raise ValueError("No file path provided.")
-        if not os.path.exists(self.file):
-            with open(self.file, "w") as f:
-                json.dump([], f)
-                return
-        self.messages = [ChatMessage(**msg) for msg in json.load(open(self.file, "r"))]
-
-    def to_prompt(self):
-        """Convert chat history to a prompt"""
-        history = "\n\n---\n\n".join(
-            [f"{msg.role.upper()}: {msg.content}" for msg in self.messages]
-        )
-        prompt = "We're having a conversation. Here's the chat history:\n\n" + history
-        return prompt + "\n\n---\nRespond to the last message above."
+from cli.util import get_branch_if_pushed
+
+
+def summarize(task_runner, repo, text, max_chars):
+    """Summarize earlier messages of the conversation with the cheap model."""
+    params = TaskParameters(
+        wait=True,
+        repo=repo,
+        verbose=False,
+        model=CHEAP_MODEL,
+        prompt=(
+            f"Summarize the following conversation in at most {max_chars} characters. "
+            "Keep all facts, decisions and open questions. Respond only with the summary."
+            f"\n\n---\n\n{text}"
+        ),
+    )
+    task = task_runner.run_task(params, print_result=False, print_task_id=False)
+    if not task or not task.result:
+        # Fall back to the end of the conversation
+        return text[-max_chars:]
+    return task.result[:max_chars]
 
 
 @click.command()
@@ -80,15 +48,34 @@ class ChatHistory(BaseModel):
     required=False,
     default=None,
 )
+@click.option(
+    "--window",
+    type=click.IntRange(min=2),
+    default=DEFAULT_WINDOW,
+    show_default=True,
+    help="Number of recent messages passed word for word, older ones are summarized.",
+)
+@click.option(
+    "--prompt-budget",
+    type=click.IntRange(min=100),
+    default=DEFAULT_PROMPT_BUDGET,
+    show_default=True,
+    help="Maximum size of a chat prompt, in tokens.",
+)
 @click.pass_context
-def chat(ctx, branch, history):
+def chat(ctx, branch, history, window, prompt_budget):
     """💬 Chat with PR Pilot."""
     console = Console()
     status_indicator = StatusIndicator(
         display_log_messages=True, spinner=True, console=console, display_spinner_text=False
     )
     task_runner = TaskRunner(status_indicator)
-    chat_history = ChatHistory(file=history, messages=[])
+    chat_history = ChatHistory(
+        file=history,
+        messages=[],
+        window=window,
+        max_chars=prompt_budget * CHARS_PER_TOKEN,
+    )
 
     if chat_history.file:
         # There is an existing conversation. Load and print it.
@@ -103,6 +90,9 @@ def chat(ctx, branch, history):
     if not ctx.obj["repo"]:
         ctx.obj["repo"] = detect_repository()
 
+    chat_history.summarizer = lambda text, max_chars: summarize(
+        task_runner, ctx.obj["repo"], text, max_chars
+    )
     welcome_message += f" on [code][bold]{ctx.obj['repo']}[/bold][/code]"
     if ctx.obj["sync"]:
         ctx.obj["branch"] = get_branch_if_pushed()
@@ -115,12 +105,11 @@ def chat(ctx, branch, history):
 
     run_chat(branch, chat_history, console, ctx, task_runner)
 
-    # If we have a file, automatically save the chat history
+    # If we have a file, the chat history was saved message by message
     if chat_history.file:
-        chat_history.dump()
         print(f"Chat history saved to [code][yellow]{chat_history.file}[/yellow][/code]")
     # Otherwise, ask the user if they want to save the chat history
-    elif Confirm.ask("Do you want to save the chat history as a JSON file?", default=False):
+    elif Confirm.ask("Do you want to save the chat history as a JSON lines file?", default=False):
         file_path = console.input("Enter the file path to save the chat history: ")
         chat_history.file = file_path
         chat_history.dump()
@@ -133,6 +122,8 @@ def run_chat(branch, chat_history, console, ctx, task_runner):
         if user_input.strip() == "":
             break
         chat_history.append(ChatMessage(role="user", content=user_input))
+        if chat_history.compact():
+            console.print("[dim]Summarized earlier messages of the conversation[/dim]")
         params = TaskParameters(
             verbose=True,
             prompt=chat_history.to_prompt(),
@@ -1,4 +1,3 @@
-import os
 from pathlib import Path
 
 import click
@@ -7,7 +6,7 @@ from rich.console import Console
 from cli.models import TaskParameters
 from cli.status_indicator import StatusIndicator
 from cli.task_runner import TaskRunner
-from cli.util import pull_branch_changes
+from cli.util import pull_branch_changes, get_current_branch
 
 
 @click.command()
@@ -49,7 +48,7 @@ def edit(ctx, snap, file_path, prompt):
     try:
         if ctx.obj["sync"] and not ctx.obj["branch"]:
             # Get current branch from git
-            current_branch = os.popen("git rev-parse --abbrev-ref HEAD").read().strip()
+            current_branch = get_current_branch()
             if current_branch not in ["master", "main"]:
                 ctx.obj["branch"] = current_branch
 
@@ -1,6 +1,7 @@
+import asyncio
 import os
-import subprocess
 import tempfile
+from typing import List
 
 import click
 import inquirer
@@ -11,6 +12,7 @@ from rich.table import Table
 from rich.text import Text
 
 from cli.command_index import COMMAND_FILE_PATH, CommandIndex
+from cli.remote_repository import RemoteRepository, fetch_repositories
 from cli.skill_index import SkillIndex, SKILL_FILE_PATH
 from cli.status_indicator import StatusIndicator
 
@@ -23,83 +25,103 @@ def grab(ctx):
 
 
 @grab.command("commands")
-@click.argument("repo")
+@click.argument("repos", nargs=-1, required=True)
 @click.pass_context
-def grab_commands(ctx, repo):
-    """🤲 Grab commands from a Github repository (owner/repo).
+def grab_commands(ctx, repos):
+    """🤲 Grab commands from Github repositories (owner/repo).
 
     Example: pilot grab commands pr-pilot-ai/pr-pilot-cli
     """
     console = Console()
-    status_indicator = StatusIndicator(
-        spinner=ctx.obj["spinner"], display_log_messages=ctx.obj["verbose"], console=console
-    )
-    status_indicator.start()
-    full_repo_url = f"git@github.com:{repo}.git"
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        clone_repository(status_indicator, full_repo_url, tmp_dir)
-        full_path = os.path.join(tmp_dir, COMMAND_FILE_PATH)
-        if not os.path.exists(full_path):
-            click.ClickException(
-                f"Repository {full_repo_url} does not contain a {COMMAND_FILE_PATH} file."
-            )
-        status_indicator.stop()
-        remote_index = CommandIndex(full_path)
+    repositories = fetch_sources(ctx, console, repos)
+    try:
         local_index = CommandIndex()
-        display_commands(console, repo, local_index, remote_index)
-        answers = prompt_user_for_commands(local_index, remote_index)
-        if not answers:
-            return
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for repository in repositories:
+            source_dir = os.path.join(tmp_dir, os.path.basename(repository.path))
+            if not repository.export([COMMAND_FILE_PATH], source_dir):
+                console.print(
+                    f"Repository {repository.repo} does not contain a {COMMAND_FILE_PATH} file."
+                )
+                continue
+            try:
+                remote_index = CommandIndex(os.path.join(source_dir, COMMAND_FILE_PATH))
+            except ValueError as e:
+                console.print(f"[bold red]{repository.repo}:[/bold red] {e}")
+                continue
+            display_commands(console, repository.repo, local_index, remote_index)
+            answers = prompt_user_for_commands(local_index, remote_index)
+            if not answers:
+                continue
 
-        commands_imported, files_imported = import_commands(
-            answers, remote_index, local_index, tmp_dir
-        )
-        local_index.save_commands()
-        display_imported_commands(console, commands_imported)
+            # Only the templates of the selected commands are needed
+            templates = [
+                remote_index.get_command(name).params.file
+                for name in answers["commands"]
+                if remote_index.get_command(name).params.file
+            ]
+            repository.export(templates, source_dir)
+            commands_imported, files_imported = import_commands(
+                answers, remote_index, local_index, source_dir
+            )
+            display_imported_commands(console, commands_imported)
 
 
 @grab.command("skills")
-@click.argument("repo")
+@click.argument("repos", nargs=-1, required=True)
 @click.pass_context
-def grab_skills(ctx, repo):
-    """🤲 Grab skills from a Github repository (owner/repo).
+def grab_skills(ctx, repos):
+    """🤲 Grab skills from Github repositories (owner/repo).
 
     Example: pilot grab skills pr-pilot-ai/pr-pilot-cli
     """
     console = Console()
+    repositories = fetch_sources(ctx, console, repos)
+    try:
+        local_index = SkillIndex()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for repository in repositories:
+            source_dir = os.path.join(tmp_dir, os.path.basename(repository.path))
+            if not repository.export([SKILL_FILE_PATH], source_dir):
+                console.print(
+                    f"Repository {repository.repo} does not contain a {SKILL_FILE_PATH} file."
+                )
+                continue
+            try:
+                remote_index = SkillIndex(os.path.join(source_dir, SKILL_FILE_PATH))
+            except ValueError as e:
+                console.print(f"[bold red]{repository.repo}:[/bold red] {e}")
+                continue
+            display_skills(console, repository.repo, local_index, remote_index)
+            answers = prompt_user_for_skills(local_index, remote_index)
+            if not answers:
+                continue
+
+            skills_imported = import_skills(answers, remote_index, local_index, source_dir)
+            display_imported_skills(console, skills_imported)
+
+
+def fetch_sources(ctx, console, repos) -> List[RemoteRepository]:
+    """Fetch the cached clones of the given repositories concurrently.
+
+    :return: The repositories that were fetched successfully.
+    """
     status_indicator = StatusIndicator(
         spinner=ctx.obj["spinner"], display_log_messages=ctx.obj["verbose"], console=console
     )
     status_indicator.start()
-    full_repo_url = f"git@github.com:{repo}.git"
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        clone_repository(status_indicator, full_repo_url, tmp_dir)
-        full_path = os.path.join(tmp_dir, SKILL_FILE_PATH)
-        if not os.path.exists(full_path):
-            click.ClickException(
-                f"Repository {full_repo_url} does not contain a {SKILL_FILE_PATH} file."
-            )
-        status_indicator.stop()
-        remote_index = SkillIndex(full_path)
-        local_index = SkillIndex()
-        display_skills(console, repo, local_index, remote_index)
-        answers = prompt_user_for_skills(local_index, remote_index)
-        if not answers:
-            return
-
-        skills_imported = import_skills(answers, remote_index, local_index, tmp_dir)
-        local_index.save_skills()
-        display_imported_skills(console, skills_imported)
-
-
-def clone_repository(status_indicator, full_repo_url, tmp_dir):
-    """Clone the repository to a temporary directory."""
-    status_indicator.update_spinner_message(f"Loading from {full_repo_url}")
-    subprocess.run(
-        ["git", "clone", "--depth", "1", full_repo_url, tmp_dir],
-        check=True,
-        capture_output=True,
-    )
+    repositories = [RemoteRepository(repo) for repo in dict.fromkeys(repos)]
+    status_indicator.update_spinner_message(f"Loading from {', '.join(dict.fromkeys(repos))}")
+    errors = asyncio.run(fetch_repositories(repositories))
+    status_indicator.stop()
+    for repo, error in errors.items():
+        if error:
+            console.print(f"[bold red]{repo}:[/bold red] {error}")
+    return [repository for repository in repositories if not errors[repository.repo]]
 
 
 def display_commands(console, repo, local_index, remote_index):
@@ -182,19 +204,21 @@ def import_commands(answers, remote_index, local_index, tmp_dir):
     """Import the selected commands into the local index."""
     files_imported = []
     commands_imported = []
-    for command_name in answers["commands"]:
-        remote_command = remote_index.get_command(command_name)
-        if local_index.get_command(command_name):
-            overwrite = Confirm.ask(f"Command {command_name} already exists. Overwrite?")
-            if not overwrite:
-                continue
-        local_index.remove_command(command_name)
-        local_index.add_command(remote_command)
-        if remote_command.params.file:
-            full_path = os.path.join(tmp_dir, remote_command.params.file)
-            copy_file_to_local_directory(full_path, remote_command.params.file)
-            files_imported.append(remote_command.params.file)
-        commands_imported.append(remote_command)
+    # Write the command file once, after all commands are imported
+    with local_index.transaction():
+        for command_name in answers["commands"]:
+            remote_command = remote_index.get_command(command_name)
+            if local_index.get_command(command_name):
+                overwrite = Confirm.ask(f"Command {command_name} already exists. Overwrite?")
+                if not overwrite:
+                    continue
+            local_index.remove_command(command_name)
+            local_index.add_command(remote_command)
+            if remote_command.params.file:
+                full_path = os.path.join(tmp_dir, remote_command.params.file)
+                copy_file_to_local_directory(full_path, remote_command.params.file)
+                files_imported.append(remote_command.params.file)
+            commands_imported.append(remote_command)
     return commands_imported, files_imported
 
 
@@ -207,9 +231,9 @@ def import_skills(answers, remote_index, local_index, tmp_dir):
             overwrite = Confirm.ask(f"Skill {skill_name} already exists. Overwrite?")
             if not overwrite:
                 continue
-        local_index.remove_skill(skill_name)
-        local_index.add_skill(remote_skill)
         skills_imported.append(remote_skill)
+    # Write the skill file once, after all skills are selected
+    local_index.add_skills(skills_imported, replace=True)
     return skills_imported
 
 
@@ -1,56 +1,133 @@
-import click
-from arcane.engine import ArcaneEngine
+import sys
+from datetime import datetime
 
+import click
+import urllib3
+from arcane import ApiException
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.padding import Padding
 from rich.table import Table
 
+from cli.api_client import PilotEngine
+from cli.history_store import HistoryStore
 from cli.util import TaskFormatter, markdown_panel
 
 NO_TASKS_MESSAGE = """
 You have no tasks yet. Run a task with `pilot task` to create one.
 """
+DEFAULT_LIMIT = 50
+NO_MATCHING_TASKS_MESSAGE = "No matching tasks."
+
+
+TSV_COLUMNS = ["id", "created", "github_project", "pr_number", "status", "title"]
+
+
+def tsv_value(value) -> str:
+    """Format a value as a TSV field, without tabs or line breaks."""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return " ".join(str(value).split())
+
+
+def write_tsv(tasks) -> None:
+    """Write tasks as tab-separated rows to stdout, one row at a time."""
+    sys.stdout.write("\t".join(TSV_COLUMNS) + "\n")
+    for task in tasks:
+        sys.stdout.write("\t".join(tsv_value(getattr(task, column)) for column in TSV_COLUMNS))
+        sys.stdout.write("\n")
+
+
+def write_json(tasks) -> None:
+    """Write tasks as JSON lines to stdout, one task at a time."""
+    for task in tasks:
+        sys.stdout.write(task.model_dump_json(exclude={"result"}) + "\n")
+
+
+def print_table(console, tasks, first_number, empty_message=NO_TASKS_MESSAGE) -> None:
+    """Print tasks as a table, numbered like the `last` command counts them."""
+    table = Table(box=None)
+
+    table.add_column("#", justify="left", style="bold yellow", no_wrap=True)
+    table.add_column("Timestamp", justify="left", style="cyan", no_wrap=True)
+    table.add_column("Project", justify="left", style="magenta", no_wrap=True)
+    table.add_column("PR")
+    table.add_column("Status")
+    table.add_column("Title", style="blue")
+
+    for task_number, task in enumerate(tasks, start=first_number):
+        task_formatter = TaskFormatter(task)
+        table.add_row(
+            str(task_number),
+            task_formatter.format_created_at(),
+            task_formatter.format_github_project(),
+            task_formatter.format_pr_link(),
+            task_formatter.format_status(),
+            task_formatter.format_title(),
+        )
+    if not table.row_count:
+        console.print(Padding(Markdown(empty_message), (1, 1)))
+        return
+    console.print(Padding(table, (1, 1)))
 
 
 @click.group(invoke_without_command=True)
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    default=DEFAULT_LIMIT,
+    show_default=True,
+    help="Number of tasks per page.",
+)
+@click.option("--page", type=click.IntRange(min=1), default=1, help="Page of tasks to show.")
+@click.option(
+    "--since",
+    type=click.DateTime(formats=["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"]),
+    help="Only tasks created since this date (local time).",
+)
+@click.option("--status", help="Only tasks with this status, e.g. running or failed.")
+@click.option("--repo", "filter_repo", help="Only tasks of this Github repository.")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["table", "tsv", "json"]),
+    default="table",
+    show_default=True,
+    help="Output format. tsv and json (one task per line) are written without formatting.",
+)
 @click.pass_context
-def history(ctx):
+def history(ctx, limit, page, since, status, filter_repo, output_format):
     """📜 Access recent tasks."""
-    engine = ArcaneEngine()
-    tasks = engine.list_tasks()
-    ctx.obj["tasks"] = tasks
+    # Keep stdout clean for machine-readable formats
+    console = Console(stderr=output_format != "table")
+    engine = PilotEngine()
+    store = HistoryStore()
+    if store.is_stale():
+        try:
+            store.sync(engine)
+        except (ApiException, urllib3.exceptions.HTTPError, OSError) as e:
+            if not store.count():
+                raise
+            # Serve the tasks we know about if the API is unreachable
+            console.print(f"[dim]Could not update the task history ({e}), showing local copy.")
+    ctx.obj["engine"] = engine
+    ctx.obj["history"] = store
+    ctx.obj["history_filters"] = dict(since=since, status=status, repo=filter_repo)
 
     if ctx.invoked_subcommand is None:
         # Default behavior when no sub-command is invoked
-        console = Console()
-        if not tasks:
-            console.print(Padding(Markdown(NO_TASKS_MESSAGE), (1, 1)))
-            return
-        task_number = 1
-
-        table = Table(box=None)
-
-        table.add_column("#", justify="left", style="bold yellow", no_wrap=True)
-        table.add_column("Timestamp", justify="left", style="cyan", no_wrap=True)
-        table.add_column("Project", justify="left", style="magenta", no_wrap=True)
-        table.add_column("PR")
-        table.add_column("Status")
-        table.add_column("Title", style="blue")
-
-        for task in tasks:
-            task_formatter = TaskFormatter(task)
-            table.add_row(
-                str(task_number),
-                task_formatter.format_created_at(),
-                task_formatter.format_github_project(),
-                task_formatter.format_pr_link(),
-                task_formatter.format_status(),
-                task_formatter.format_title(),
-            )
-            task_number += 1
-        console.print(Padding(table, (1, 1)))
-        return
+        offset = (page - 1) * limit
+        tasks = store.iter_tasks(limit, offset, **ctx.obj["history_filters"])
+        if output_format == "tsv":
+            write_tsv(tasks)
+        elif output_format == "json":
+            write_json(tasks)
+        else:
+            filtered = page > 1 or any(ctx.obj["history_filters"].values())
+            empty_message = NO_MATCHING_TASKS_MESSAGE if filtered else NO_TASKS_MESSAGE
+            print_table(Console(), tasks, offset + 1, empty_message)
 
 
 @history.group(invoke_without_command=True)
@@ -59,14 +136,16 @@ def history(ctx):
 def last(ctx, task_number):
     """Show the n-th latest task. Default is the last task."""
     console = Console()
-    tasks = ctx.obj["tasks"]
-    if task_number > len(tasks):
+    tasks = []
+    if task_number > 0:
+        tasks = ctx.obj["history"].latest(1, task_number - 1, **ctx.obj["history_filters"])
+    if not tasks:
         console.print(f"[bold red]There are less than {task_number} tasks.[/bold red]")
         raise click.Abort()
-    ctx.obj["selected_task"] = tasks[task_number - 1]
+    ctx.obj["selected_task"] = tasks[0]
     if ctx.invoked_subcommand is None:
         # Pretty print task properties using rich
-        task = tasks[task_number - 1]
+        task = ctx.obj["history"].load_result(tasks[0], ctx.obj["engine"])
         # Print header using table grid
         table = Table(box=None, show_header=False)
         task_formatter = TaskFormatter(task)
@@ -114,7 +193,7 @@ def prompt(ctx, markdown):
 def result(ctx, markdown):
     """Show the n-th latest task's result."""
     console = Console()
-    task = ctx.obj["selected_task"]
+    task = ctx.obj["history"].load_result(ctx.obj["selected_task"], ctx.obj["engine"])
     if markdown:
         console.print(task.result)
     else:
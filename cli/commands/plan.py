@@ -2,14 +2,34 @@ import click
 from rich.console import Console
 
 from cli.plan_executor import PlanExecutor
+from cli.plan_journal import PlanJournal
 from cli.status_indicator import StatusIndicator
-from cli.util import pull_branch_changes, get_branch_if_pushed
+from cli.util import get_branch_if_pushed
 
 
 @click.command()
+@click.option(
+    "--max-parallel",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="⚡ Maximum number of independent steps to run at the same time.",
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    default=False,
+    help="🗓️ Print the step schedule and critical path without running anything.",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="⏯️ Skip the steps that finished in a previous, interrupted run of the plan.",
+)
 @click.argument("file_path", type=click.Path(exists=True))
 @click.pass_context
-def plan(ctx, file_path):
+def plan(ctx, max_parallel, dry_run, resume, file_path):
     """📋 Let PR Pilot execute a plan for you.
 
     Learn more: https://docs.pr-pilot.ai/user_guide.html
@@ -18,16 +38,40 @@ def plan(ctx, file_path):
     status_indicator = StatusIndicator(
         spinner=ctx.obj["spinner"], display_log_messages=ctx.obj["verbose"], console=console
     )
+    try:
+        runner = PlanExecutor(file_path, status_indicator)
+    except ValueError as e:
+        raise click.ClickException(f"Invalid plan: {e}")
+    if dry_run:
+        runner.print_schedule(max_parallel)
+        return
+
     if ctx.obj["sync"]:
         ctx.obj["branch"] = get_branch_if_pushed()
 
-    runner = PlanExecutor(file_path, status_indicator)
-    runner.run(
-        ctx.obj["wait"],
-        ctx.obj["repo"],
-        ctx.obj["verbose"],
-        ctx.obj["model"],
-        ctx.obj["debug"],
-    )
-    if ctx.obj["sync"]:
-        pull_branch_changes(status_indicator, console, ctx.obj["branch"], ctx.obj["debug"])
+    journal = PlanJournal.for_plan(file_path)
+    if resume:
+        finished_steps = runner.resume(journal)
+        console.print(
+            f"Resuming plan: {finished_steps} of {len(runner.tasks)} steps already finished."
+        )
+    else:
+        journal.clear()
+
+    try:
+        runner.run(
+            ctx.obj["wait"],
+            ctx.obj["repo"],
+            ctx.obj["verbose"],
+            ctx.obj["model"],
+            ctx.obj["debug"],
+            max_parallel=max_parallel,
+            journal=journal,
+            sync_branch=ctx.obj["branch"] if ctx.obj["sync"] else None,
+        )
+    except (ValueError, click.ClickException) as e:
+        status_indicator.stop()
+        message = e.message if isinstance(e, click.ClickException) else str(e)
+        raise click.ClickException(
+            f"{message}\nRun `pilot plan --resume {file_path}` to continue where the plan stopped."
+        )
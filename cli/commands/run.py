@@ -2,22 +2,34 @@ import click
 
 from cli.command_index import CommandIndex
 
+RUN_COMMAND_HELP = """
+🚀 Run a saved command.
+
+Create new commands by using the --save-command flag when running a task.
+"""
+
 
 class RunCommand(click.Group):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.command_index = CommandIndex()
+        self._command_index = None
+
+    @property
+    def command_index(self) -> CommandIndex:
+        # Only look for .pilot-commands.yaml once the command list is actually needed
+        if self._command_index is None:
+            self._command_index = CommandIndex()
+        return self._command_index
 
     def list_commands(self, ctx):
-        rv = []
-        for pilot_command in self.command_index.get_commands():
-            rv.append(pilot_command.name)
-        rv.sort()
-        return rv
+        return sorted(self.command_index.commands)
 
     def get_command(self, ctx, name):
-        for pilot_command in self.command_index.get_commands():
-            if pilot_command.name == name:
-                return pilot_command.to_click_command()
-        raise click.UsageError(f"Command '{name}' not found.")
+        command = self.command_index.get_click_command(name)
+        if command is None:
+            raise click.UsageError(f"Command '{name}' not found.")
+        return command
+
+
+run = RunCommand(name="run", help=RUN_COMMAND_HELP)
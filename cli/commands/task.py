@@ -86,6 +86,8 @@ def task(ctx, snap, cheap, code, file, direct, output, save_command, prompt):
             branch=ctx.obj["branch"],
             spinner=ctx.obj["spinner"],
             sync=ctx.obj["sync"],
+            cache=ctx.obj["cache"],
+            markdown=ctx.obj["markdown"],
         )
 
         if save_command:
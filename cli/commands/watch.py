@@ -0,0 +1,65 @@
+import asyncio
+
+import click
+from rich.console import Console
+
+from cli.api_client import PilotEngine
+from cli.status_indicator import StatusIndicator
+from cli.task_event_hub import TaskEventHub, MAX_CONNECTIONS
+from cli.task_handler import TaskHandler, STATUS_COMPLETED, STATUS_FAILED
+from cli.util import render_markdown
+
+
+async def watch_tasks(handlers, hub, print_result):
+    """Follow all tasks from one event loop and return the exceptions of failed ones."""
+    results = await asyncio.gather(
+        *[
+            handler.stream_task_events(handler.task.id, print_result=print_result, hub=hub)
+            for handler in handlers
+        ],
+        return_exceptions=True,
+    )
+    return [result for result in results if isinstance(result, Exception)]
+
+
+@click.command()
+@click.option(
+    "--max-connections",
+    type=int,
+    default=MAX_CONNECTIONS,
+    show_default=True,
+    help="Maximum number of open websocket connections.",
+)
+@click.argument("task_ids", nargs=-1, required=True)
+@click.pass_context
+def watch(ctx, max_connections, task_ids):
+    """👀 Follow one or more running tasks.
+
+    Example: pilot watch <task-id> <task-id> ...
+    """
+    console = Console()
+    # Several tasks log at the same time, so label their messages instead of using a spinner
+    status_indicator = StatusIndicator(
+        spinner=False, display_log_messages=ctx.obj["verbose"], console=console
+    )
+    engine = PilotEngine()
+    handlers = []
+    failed = 0
+    for task_id in task_ids:
+        task = engine.get_task(task_id)
+        if task.status == STATUS_COMPLETED:
+            console.print(f"[bold]{task_id[:8]}[/bold] {task.title}")
+            render_markdown(console, task.result or "", plain=not console.is_terminal)
+        elif task.status == STATUS_FAILED:
+            console.print(f"[bold red]{task_id[:8]} failed:[/bold red] {task.result}")
+            failed += 1
+        else:
+            handlers.append(TaskHandler(task, status_indicator, label=task_id[:8]))
+
+    hub = TaskEventHub(max_connections=max_connections)
+    errors = asyncio.run(watch_tasks(handlers, hub, print_result=True))
+    for error in errors:
+        console.print(f"[bold red]{error}[/bold red]")
+    failed += len(errors)
+    if failed:
+        raise click.ClickException(f"{failed} of {len(task_ids)} tasks failed.")
@@ -10,3 +10,6 @@ CODE_PRIMER = (
     "Do not wrap it in triple backticks."
 )
 DEFAULT_MODEL = "gpt-4o"
+CACHE_DIR = os.path.expanduser("~/.cache/pr-pilot")
+# Rough number of characters per token, used to estimate prompt sizes
+CHARS_PER_TOKEN = 4
@@ -1,34 +1,17 @@
-import subprocess
 import re
 from typing import Optional
 
+from cli.git_context import GitContext
+
 
 def is_git_repo():
     """Check if the current directory is a git repository."""
-    try:
-        subprocess.run(
-            ["git", "rev-parse", "--is-inside-work-tree"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        return True
-    except subprocess.CalledProcessError:
-        return False
+    return GitContext.current().is_repo
 
 
 def get_remote_origin_url():
     """Get the remote origin URL of the git repository."""
-    try:
-        result = subprocess.run(
-            ["git", "config", "--get", "remote.origin.url"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        return result.stdout.decode("utf-8").strip()
-    except subprocess.CalledProcessError:
-        return None
+    return GitContext.current().origin_url
 
 
 def extract_owner_repo(url):
@@ -0,0 +1,253 @@
+import os
+import re
+import subprocess
+import threading
+from typing import Dict, Optional
+
+# Environment variables that change where git looks for the repository
+GIT_LOCATION_ENV_VARS = ["GIT_DIR", "GIT_WORK_TREE", "GIT_COMMON_DIR"]
+SECTION_PATTERN = re.compile(r'^\[\s*([^\s\]"]+)(?:\s+"(.*)")?\s*\]')
+
+# Process-wide git contexts, keyed by working directory
+_contexts = {}
+# Background syncs invalidate the contexts while other threads read them
+_contexts_lock = threading.Lock()
+
+
+class GitContext:
+    """Metadata of the git repository of a directory, gathered once per process.
+
+    HEAD, config and refs are read from the files in `.git` directly. Git itself is only
+    called once to locate the repository if git's location environment variables are set or
+    `.git` can't be found, and to list remote refs of repositories using the reftable format.
+    """
+
+    def __init__(self, root: Optional[str], git_dir: Optional[str], common_dir: Optional[str]):
+        self.root = root
+        self.git_dir = git_dir
+        self.common_dir = common_dir
+        self.branch: Optional[str] = None
+        self.head_sha: Optional[str] = None
+        self.origin_url: Optional[str] = None
+        # Remote branches of origin, by name, with their commit SHAs
+        self.remote_branches: Dict[str, str] = {}
+        self.origin_head_sha: Optional[str] = None
+        # Branches of origin that local branches track, by local branch name
+        self.upstream_branches: Dict[str, str] = {}
+        self._packed_refs = None
+        if self.is_repo:
+            self._load()
+
+    @classmethod
+    def current(cls, cwd: str = None) -> "GitContext":
+        """Return the git context of a directory, defaults to the current directory."""
+        cwd = os.path.abspath(cwd or os.getcwd())
+        with _contexts_lock:
+            if cwd not in _contexts:
+                _contexts[cwd] = cls.from_directory(cwd)
+            return _contexts[cwd]
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Forget all gathered git metadata, e.g. after checking out another branch."""
+        with _contexts_lock:
+            _contexts.clear()
+
+    @classmethod
+    def from_directory(cls, cwd: str) -> "GitContext":
+        if not any(os.getenv(name) for name in GIT_LOCATION_ENV_VARS):
+            path = cwd
+            while True:
+                dot_git = os.path.join(path, ".git")
+                if os.path.isdir(dot_git):
+                    return cls(path, dot_git, cls._read_common_dir(dot_git))
+                if os.path.isfile(dot_git):
+                    # Worktrees and submodules point to their git directory
+                    with open(dot_git) as f:
+                        content = f.read().strip()
+                    if content.startswith("gitdir:"):
+                        git_dir = os.path.join(path, content.removeprefix("gitdir:").strip())
+                        git_dir = os.path.normpath(git_dir)
+                        return cls(path, git_dir, cls._read_common_dir(git_dir))
+                parent = os.path.dirname(path)
+                if parent == path:
+                    break
+                path = parent
+        return cls.from_git(cwd)
+
+    @classmethod
+    def from_git(cls, cwd: str) -> "GitContext":
+        """Locate the repository with a single git call."""
+        try:
+            result = subprocess.run(
+                ["git", "rev-parse", "--show-toplevel", "--absolute-git-dir", "--git-common-dir"],
+                cwd=cwd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+        except OSError:
+            # Git is not installed
+            return cls(None, None, None)
+        lines = result.stdout.splitlines()
+        if result.returncode != 0 or len(lines) != 3:
+            return cls(None, None, None)
+        root, git_dir, common_dir = lines
+        return cls(root, git_dir, os.path.normpath(os.path.join(cwd, common_dir)))
+
+    @staticmethod
+    def _read_common_dir(git_dir: str) -> str:
+        # Linked worktrees share config and refs with the main repository
+        try:
+            with open(os.path.join(git_dir, "commondir")) as f:
+                return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+        except FileNotFoundError:
+            return git_dir
+
+    @property
+    def is_repo(self) -> bool:
+        return self.root is not None
+
+    def _load(self):
+        reftable = self._read_config()
+        try:
+            with open(os.path.join(self.git_dir, "HEAD")) as f:
+                head = f.read().strip()
+        except FileNotFoundError:
+            head = ""
+        if head.startswith("ref:"):
+            ref = head.removeprefix("ref:").strip()
+            self.branch = ref.removeprefix("refs/heads/")
+            self.head_sha = None if reftable else self.resolve_ref(ref)
+        elif head:
+            # Detached HEAD, named like `git rev-parse --abbrev-ref HEAD` does
+            self.branch = "HEAD"
+            self.head_sha = head
+        if reftable:
+            self._load_refs_from_git()
+        else:
+            self._load_remote_branches()
+
+    def _read_config(self) -> bool:
+        """Read the origin URL from the git config. Returns True if refs are stored as reftable."""
+        reftable = False
+        section = None
+        tracking: Dict[str, Dict[str, str]] = {}
+        try:
+            with open(os.path.join(self.common_dir, "config")) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return reftable
+        for line in lines:
+            line = line.strip()
+            if not line or line[0] in "#;":
+                continue
+            match = SECTION_PATTERN.match(line)
+            if match:
+                section = (match.group(1).lower(), match.group(2))
+                continue
+            key, _, value = line.partition("=")
+            key = key.strip().lower()
+            value = value.strip().strip('"')
+            if section == ("remote", "origin") and key == "url":
+                self.origin_url = value
+            elif section == ("extensions", None) and key == "refstorage":
+                reftable = value.lower() == "reftable"
+            elif section and section[0] == "branch" and section[1] and key in ("remote", "merge"):
+                tracking.setdefault(section[1], {})[key] = value
+        for branch, upstream in tracking.items():
+            if upstream.get("remote") == "origin" and "merge" in upstream:
+                self.upstream_branches[branch] = upstream["merge"].removeprefix("refs/heads/")
+        return reftable
+
+    def _read_packed_refs(self) -> Dict[str, str]:
+        if self._packed_refs is None:
+            self._packed_refs = {}
+            try:
+                with open(os.path.join(self.common_dir, "packed-refs")) as f:
+                    for line in f:
+                        if line.startswith(("#", "^")):
+                            continue
+                        sha, _, ref = line.strip().partition(" ")
+                        if ref:
+                            self._packed_refs[ref] = sha
+            except FileNotFoundError:
+                pass
+        return self._packed_refs
+
+    def resolve_ref(self, ref: str) -> Optional[str]:
+        """Resolve a ref like `refs/heads/main` to a commit SHA, following symbolic refs."""
+        for _ in range(10):
+            content = None
+            for directory in (self.git_dir, self.common_dir):
+                try:
+                    with open(os.path.join(directory, ref)) as f:
+                        content = f.read().strip()
+                    break
+                except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+                    continue
+            if content is None:
+                return self._read_packed_refs().get(ref)
+            if not content.startswith("ref:"):
+                return content
+            ref = content.removeprefix("ref:").strip()
+        return None
+
+    def _load_remote_branches(self):
+        prefix = "refs/remotes/origin/"
+        names = {
+            ref.removeprefix(prefix) for ref in self._read_packed_refs() if ref.startswith(prefix)
+        }
+        remote_dir = os.path.join(self.common_dir, prefix)
+        for directory, _, files in os.walk(remote_dir):
+            for file_name in files:
+                if file_name.endswith(".lock"):
+                    continue
+                names.add(os.path.relpath(os.path.join(directory, file_name), remote_dir))
+        self.origin_head_sha = self.resolve_ref(prefix + "HEAD")
+        names.discard("HEAD")
+        for name in names:
+            name = name.replace(os.sep, "/")
+            sha = self.resolve_ref(prefix + name)
+            if sha:
+                self.remote_branches[name] = sha
+
+    def _load_refs_from_git(self):
+        """Read HEAD and remote branches with one git call, for repositories using reftable."""
+        result = subprocess.run(
+            [
+                "git",
+                "for-each-ref",
+                "--format=%(objectname) %(refname) %(HEAD)",
+                "refs/heads",
+                "refs/remotes/origin",
+            ],
+            cwd=self.root,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        prefix = "refs/remotes/origin/"
+        for line in result.stdout.splitlines():
+            sha, ref, current = (line.split(" ") + ["", ""])[:3]
+            if current == "*":
+                self.head_sha = sha
+            if ref == prefix + "HEAD":
+                self.origin_head_sha = sha
+            elif ref.startswith(prefix):
+                self.remote_branches[ref.removeprefix(prefix)] = sha
+
+    def is_branch_pushed(self, branch: str) -> bool:
+        """Check if origin has a branch with the given name, as known to the local clone."""
+        return branch in self.remote_branches
+
+    def remote_sha(self, branch: str = None) -> Optional[str]:
+        """SHA of a remote branch, or of origin's default branch if no branch is given."""
+        if branch:
+            return self.remote_branches.get(branch)
+        return self.origin_head_sha
+
+    def upstream_sha(self) -> Optional[str]:
+        """SHA of the branch of origin the current branch tracks, if any."""
+        upstream = self.upstream_branches.get(self.branch)
+        return self.remote_branches.get(upstream) if upstream else None
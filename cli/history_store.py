@@ -0,0 +1,180 @@
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+from arcane import Task
+
+from cli.constants import CACHE_DIR
+from cli.util import get_api_host
+
+HISTORY_DIR = os.path.join(CACHE_DIR, "history")
+# Seconds before the local history is synced with the API again
+SYNC_INTERVAL = 60
+FINAL_STATUSES = ["completed", "failed"]
+
+
+def history_location() -> str:
+    """Path of the history of the current account, one file per API host and API key."""
+    account = f"{get_api_host()}\n{os.getenv('PR_PILOT_API_KEY', '')}"
+    account_hash = hashlib.sha256(account.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(HISTORY_DIR, f"{account_hash}.sqlite3")
+
+
+def timestamp_key(timestamp: datetime) -> str:
+    """Sortable representation of a point in time. Naive timestamps are local time."""
+    return timestamp.astimezone(timezone.utc).isoformat()
+
+
+def created_key(task: Task) -> str:
+    """Sortable representation of a task's creation time."""
+    return timestamp_key(task.created)
+
+
+class HistoryStore:
+    """Local copy of the task history, so it can be listed without asking the API.
+
+    Tasks are stored in SQLite. Syncing only writes tasks created after the newest synced
+    one and tasks that were still running. Tasks created by this CLI are recorded right away,
+    so they show up without waiting for the next sync. Results are kept in their own column
+    and only read when a single task is shown.
+    """
+
+    def __init__(self, file_path: str = None, sync_interval: int = None):
+        self.file_path = file_path or history_location()
+        self.sync_interval = SYNC_INTERVAL if sync_interval is None else sync_interval
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                "id TEXT PRIMARY KEY, created TEXT NOT NULL, status TEXT NOT NULL, "
+                "task TEXT NOT NULL, result TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS tasks_created ON tasks (created)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+    @contextmanager
+    def _connect(self):
+        # One connection per operation, like the result cache
+        db = sqlite3.connect(self.file_path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _row(task: Task) -> tuple:
+        return (
+            str(task.id),
+            created_key(task),
+            task.status,
+            task.model_dump_json(exclude={"result"}),
+            task.result,
+        )
+
+    def last_sync(self) -> Optional[float]:
+        """Time of the last successful sync, or None if the history was never synced."""
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM meta WHERE name = 'last_sync'").fetchone()
+        return float(row[0]) if row else None
+
+    def is_stale(self) -> bool:
+        last_sync = self.last_sync()
+        return last_sync is None or time.time() - last_sync > self.sync_interval
+
+    def sync(self, engine) -> int:
+        """Fetch the task list and store new or changed tasks.
+
+        :param engine: Engine to list the tasks with.
+        :return: Number of stored tasks.
+        """
+        tasks = engine.list_tasks()
+        with self._connect() as db:
+            # Recorded tasks can be newer than tasks created elsewhere, e.g. on the dashboard,
+            # so the newest task in the table is not the newest synced one
+            row = db.execute("SELECT value FROM meta WHERE name = 'newest_synced'").fetchone()
+            newest = row[0] if row else None
+            pending = {
+                row[0]
+                for row in db.execute(
+                    "SELECT id FROM tasks WHERE status NOT IN (?, ?)", FINAL_STATUSES
+                )
+            }
+            rows = []
+            for task in tasks:
+                if newest is None or created_key(task) > newest or str(task.id) in pending:
+                    rows.append(self._row(task))
+            db.executemany("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?)", rows)
+            db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('last_sync', ?)",
+                (str(time.time()),),
+            )
+            if tasks:
+                db.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('newest_synced', ?)",
+                    (max([newest or ""] + [created_key(task) for task in tasks]),),
+                )
+        return len(rows)
+
+    def record(self, task: Task) -> None:
+        """Store a task created or finished by this CLI."""
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?)", self._row(task))
+
+    def count(self) -> int:
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def iter_tasks(
+        self,
+        limit: int = None,
+        offset: int = 0,
+        since: datetime = None,
+        status: str = None,
+        repo: str = None,
+    ) -> Iterator[Task]:
+        """Yield stored tasks one by one, newest first, without their results.
+
+        :param limit: Maximum number of tasks.
+        :param offset: Number of matching tasks to skip.
+        :param since: Only tasks created at or after this time.
+        :param status: Only tasks with this status.
+        :param repo: Only tasks of this Github repository.
+        """
+        conditions = []
+        params = []
+        if since is not None:
+            conditions.append("created >= ?")
+            params.append(timestamp_key(since))
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if repo:
+            conditions.append("json_extract(task, '$.github_project') = ?")
+            params.append(repo)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        query = f"SELECT task FROM tasks {where}ORDER BY created DESC LIMIT ? OFFSET ?"
+        with self._connect() as db:
+            for row in db.execute(query, (*params, limit if limit is not None else -1, offset)):
+                yield Task.model_validate_json(row[0])
+
+    def latest(self, limit: int = None, offset: int = 0, **filters) -> List[Task]:
+        """Return stored tasks, newest first, without their results. See `iter_tasks`."""
+        return list(self.iter_tasks(limit, offset, **filters))
+
+    def load_result(self, task: Task, engine) -> Task:
+        """Fill in the result of a task, from disk or, if it's missing, from the API."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT result, status FROM tasks WHERE id = ?", (str(task.id),)
+            ).fetchone()
+        if row and row[0] is not None and row[1] in FINAL_STATUSES:
+            task.result = row[0]
+            return task
+        fetched = engine.get_task(str(task.id))
+        self.record(fetched)
+        return fetched
@@ -0,0 +1,64 @@
+import importlib
+from typing import Dict, Tuple
+
+import click
+from click.utils import make_default_short_help
+
+from cli.profiling import span
+
+
+class LazyGroup(click.Group):
+    """Click group that imports its sub-commands only when they are invoked.
+
+    Sub-commands are registered as ``name -> (import_path, help)`` where ``import_path``
+    has the form ``module.path:attribute``. The help text is used to render
+    ``pilot --help`` without importing any of the sub-command modules.
+    """
+
+    def __init__(self, *args, lazy_subcommands: Dict[str, Tuple[str, str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.commands:
+            return self.commands[cmd_name]
+        if cmd_name in self.lazy_subcommands:
+            cmd = self._lazy_load(cmd_name)
+            # Cache the resolved command so the module is only looked up once
+            self.add_command(cmd, cmd_name)
+            return cmd
+        return None
+
+    def _lazy_load(self, cmd_name) -> click.Command:
+        import_path, _ = self.lazy_subcommands[cmd_name]
+        module_name, attribute = import_path.split(":")
+        with span(f"import {module_name}"):
+            module = importlib.import_module(module_name)
+        cmd = getattr(module, attribute)
+        if not isinstance(cmd, click.Command):
+            raise ValueError(f"Lazy loading of {import_path} failed: not a click command")
+        return cmd
+
+    def format_commands(self, ctx, formatter):
+        """List sub-commands without importing the ones that were not loaded yet."""
+        commands = self.list_commands(ctx)
+        if not commands:
+            return
+
+        limit = formatter.width - 6 - max(len(name) for name in commands)
+        rows = []
+        for name in commands:
+            if name in self.commands:
+                cmd = self.commands[name]
+                if cmd.hidden:
+                    continue
+                rows.append((name, cmd.get_short_help_str(limit)))
+            else:
+                _, help_text = self.lazy_subcommands[name]
+                rows.append((name, make_default_short_help(help_text, limit)))
+
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
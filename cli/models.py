@@ -25,3 +25,5 @@ class TaskParameters(BaseModel):
     sync: bool = Field(
         default=False, description="Sync local repository state with PR Pilot changes"
     )
+    cache: bool = Field(default=False, description="Reuse results of identical tasks")
+    markdown: bool = Field(default=False, description="Print results as plain markdown")
@@ -0,0 +1,113 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+from cli.constants import CHARS_PER_TOKEN
+
+SUMMARY_MAX_CHARS = 1000
+TRUNCATION_MARKER = "\n\n[... truncated]"
+CONTEXT_OPTIONS = ["last", "max_chars", "max_tokens", "summarize"]
+
+
+class PlanContext:
+    """Decide which results of previous steps are passed into the prompt of a plan step.
+
+    Configured with the optional `context` section of a plan:
+
+    - `last`: Only pass the results of the last N dependencies
+    - `max_chars` / `max_tokens`: Budget for the results section of each step's prompt.
+      The oldest results are dropped first, the most recent one is truncated if necessary.
+    - `summarize`: Pass summaries instead of full results, except for the most recent one.
+      Every summary is produced once and reused by all later steps.
+
+    Prompts of concurrently running steps can be built at the same time, from their workers.
+    """
+
+    def __init__(self, config: dict = None, summarizer: Callable[[str, int], str] = None):
+        """
+        :param config: The `context` section of the plan
+        :param summarizer: Function that summarizes a text to at most the given number of chars
+        """
+        config = config or {}
+        for option in config:
+            if option not in CONTEXT_OPTIONS:
+                raise ValueError(f"Unknown context option: {option}")
+        self.last = config.get("last")
+        self.max_chars = config.get("max_chars")
+        if config.get("max_tokens"):
+            self.max_chars = config["max_tokens"] * CHARS_PER_TOKEN
+        self.summarize = config.get("summarize", False)
+        self.summarizer = summarizer
+        self.sections: Dict[tuple, str] = {}
+        self.summaries: Dict[int, str] = {}
+        self._summary_locks: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._last_keys = ()
+        self._last_prompt = ""
+
+    def summary(self, index: int, result: Optional[str]) -> str:
+        """Summarize the result of a step. Every result is only summarized once."""
+        with self._lock:
+            summary_lock = self._summary_locks.setdefault(index, threading.Lock())
+        # Steps that need the same summary wait for it, other steps don't
+        with summary_lock:
+            if index not in self.summaries:
+                result = result or ""
+                if len(result) <= SUMMARY_MAX_CHARS or not self.summarizer:
+                    self.summaries[index] = result[:SUMMARY_MAX_CHARS]
+                else:
+                    self.summaries[index] = self.summarizer(result, SUMMARY_MAX_CHARS)
+        return self.summaries[index]
+
+    def section(self, index: int, results: Dict[int, str], summary: bool) -> str:
+        """Format the result of a step once and reuse it for every later prompt."""
+        key = (index, summary)
+        if key not in self.sections:
+            content = self.summary(index, results[index]) if summary else results[index]
+            title = (
+                f"Summary of Sub-task {index + 1}" if summary else f"Result of Sub-task {index + 1}"
+            )
+            self.sections[key] = f"## {title}\n\n{content}\n\n"
+        return self.sections[key]
+
+    def results_prompt(self, dependencies: List[int], results: Dict[int, str]) -> str:
+        """Build the 'results of previous sub-tasks' section for a step.
+
+        :param dependencies: Indices of the steps the current step depends on, in order
+        :param results: Results of finished steps, by step index
+        """
+        first = max(len(dependencies) - self.last, 0) if self.last else 0
+        selected = dependencies[first:]
+        keys = [
+            (index, self.summarize and position < len(selected) - 1)
+            for position, index in enumerate(selected)
+        ]
+
+        if self.max_chars is not None:
+            # Keep the most recent results that fit into the budget
+            budget = self.max_chars
+            kept = []
+            for index, summary in reversed(keys):
+                size = len(self.section(index, results, summary))
+                if size > budget and kept:
+                    break
+                kept.insert(0, (index, summary))
+                budget -= size
+            keys = kept
+
+        keys = tuple(keys)
+        with self._lock:
+            last_keys, last_prompt = self._last_keys, self._last_prompt
+        known = len(last_keys)
+        if known and keys[:known] == last_keys:
+            # Extend the previous prompt instead of joining all sections again
+            prompt = last_prompt + "".join(
+                self.section(index, results, summary) for index, summary in keys[known:]
+            )
+        else:
+            prompt = "".join(self.section(index, results, summary) for index, summary in keys)
+        with self._lock:
+            self._last_keys, self._last_prompt = keys, prompt
+
+        if self.max_chars is not None and len(prompt) > self.max_chars:
+            prompt = prompt[: max(self.max_chars - len(TRUNCATION_MARKER), 0)] + TRUNCATION_MARKER
+        return prompt
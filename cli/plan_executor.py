@@ -1,10 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as futures_wait
+from typing import List
+
 import yaml
 from rich.console import Console
 from rich.markdown import Markdown
+from rich.padding import Padding
+from rich.table import Table
 
+from cli.constants import CHEAP_MODEL, CHARS_PER_TOKEN
+from cli.plan_context import PlanContext
+from cli.plan_journal import PlanJournal
 from cli.status_indicator import StatusIndicator
 from cli.task_runner import TaskRunner
 from cli.models import TaskParameters
+from cli.util import pull_branch_changes
 
 
 class PlanExecutor:
@@ -25,82 +34,368 @@ class PlanExecutor:
         self.tasks = self.plan.get("steps")
         self.status_indicator = status_indicator
         self.pr_number = None
-        self.responses = []
+        self.responses = {}
+        self.prompt_sizes = {}
+        self.context = PlanContext(self.plan.get("context"))
+        self.dependencies = self.resolve_dependencies()
+        # Fail early on dependency cycles
+        self.schedule()
+
+    def resolve_dependencies(self) -> List[List[int]]:
+        """Determine the steps each step depends on, as lists of step indices.
+
+        If no step declares `depends_on`, every step depends on all previous steps and the
+        plan runs strictly in order. Otherwise, steps only depend on the steps they list.
+        """
+        if not any("depends_on" in task for task in self.tasks):
+            return [list(range(i)) for i in range(len(self.tasks))]
+
+        step_index = {}
+        for i, task in enumerate(self.tasks):
+            if task.get("name") in step_index:
+                raise ValueError(f"Duplicate step name: {task.get('name')}")
+            step_index[task.get("name")] = i
+
+        dependencies = []
+        for task in self.tasks:
+            depends_on = task.get("depends_on") or []
+            if isinstance(depends_on, str):
+                depends_on = [depends_on]
+            for name in depends_on:
+                if name not in step_index:
+                    raise ValueError(f"Step '{task.get('name')}' depends on unknown step '{name}'")
+            dependencies.append(sorted(step_index[name] for name in depends_on))
+        return dependencies
+
+    def ready_steps(self, finished, started=()) -> List[int]:
+        """Return the steps that have not been started and whose dependencies are finished."""
+        return [
+            i
+            for i in range(len(self.tasks))
+            if i not in finished
+            and i not in started
+            and all(dependency in finished for dependency in self.dependencies[i])
+        ]
+
+    def schedule(self, max_parallel=1) -> List[List[int]]:
+        """Compute the order in which steps run, assuming every step takes equally long.
+
+        :param max_parallel: Maximum number of steps running at the same time
+        :return: List of waves, each a list of step indices that run concurrently
+        """
+        finished = set()
+        waves = []
+        while len(finished) < len(self.tasks):
+            wave = self.ready_steps(finished)[:max_parallel]
+            if not wave:
+                raise ValueError("Plan steps contain a dependency cycle")
+            waves.append(wave)
+            finished.update(wave)
+        return waves
+
+    def critical_path_length(self) -> int:
+        """Number of steps on the longest dependency chain of the plan."""
+        path_length = {}
+        for wave in self.schedule(max_parallel=len(self.tasks)):
+            for i in wave:
+                path_length[i] = 1 + max(
+                    (path_length[dependency] for dependency in self.dependencies[i]), default=0
+                )
+        return max(path_length.values(), default=0)
 
-    def run(self, wait, repo, verbose, model, debug):
+    def print_schedule(self, max_parallel=1):
+        """Print the computed schedule without running any steps."""
+        console = Console()
+        waves = self.schedule(max_parallel)
+        table = Table(box=None)
+        table.add_column("Wave", justify="left", style="bold yellow", no_wrap=True)
+        table.add_column("Step", style="blue")
+        table.add_column("Depends on", style="dim")
+        for wave_number, wave in enumerate(waves, start=1):
+            for i in wave:
+                table.add_row(
+                    str(wave_number),
+                    self.tasks[i].get("name"),
+                    ", ".join(
+                        self.tasks[dependency].get("name") for dependency in self.dependencies[i]
+                    ),
+                )
+        console.line()
+        console.print(
+            f"Schedule for [bold]{self.name}[/bold] with up to {max_parallel} parallel steps:"
+        )
+        console.print(Padding(table, (1, 1)))
+        console.print(
+            f"{len(self.tasks)} steps in {len(waves)} waves. "
+            f"Critical path: {self.critical_path_length()} steps."
+        )
+
+    def resume(self, journal: PlanJournal) -> int:
+        """Restore the results of steps finished in a previous run.
+
+        :param journal: Journal of the previous run
+        :return: Number of restored steps
+        """
+        for index, entry in journal.load().items():
+            if index >= len(self.tasks) or entry.get("name") != self.tasks[index].get("name"):
+                continue
+            self.responses[index] = entry.get("result")
+            if entry.get("pr_number"):
+                self.pr_number = int(entry["pr_number"])
+        return len(self.responses)
+
+    def needs_local_checkout(self, index) -> bool:
+        """Whether a step reads the local repository, so it needs the changes of earlier steps.
+
+        Steps with a `template` render it from local files. Other steps run entirely on PR Pilot,
+        unless they ask for a sync with `sync: true`.
+        """
+        task = self.tasks[index]
+        return bool(task.get("template") or task.get("sync"))
+
+    def run(
+        self,
+        wait,
+        repo,
+        verbose,
+        model,
+        debug,
+        max_parallel=1,
+        journal=None,
+        sync_branch=None,
+    ):
         """Run all steps in a given plan
 
+        Steps whose dependencies are finished run concurrently, up to `max_parallel` at a time,
+        once the plan has a pull request. Until then, steps run one at a time, so all of them
+        work on the same PR instead of each opening its own.
+        Steps that are already in `self.responses` (e.g. restored by `resume`) are skipped.
+
+        With `sync_branch`, the local repository is synced with the changes of the plan. Steps
+        running on PR Pilot don't wait for that: Changes are only pulled, in the background,
+        before a step that needs the local checkout, and once after the last step.
+
         :param wait: Wait for PR Pilot to finish the plan
         :param repo: Github repository in the format owner/repo
         :param verbose: Display more status messages
         :param model: GPT model to use
         :param debug: Display debug information
+        :param max_parallel: Maximum number of steps running at the same time
+        :param journal: Journal to record finished steps in. It's removed once the plan is done.
+        :param sync_branch: Branch to pull the changes of the plan from, if any
 
         """
         console = Console()
         num_tasks = len(self.tasks)
-        current_task = 0
+        self.context.summarizer = lambda text, max_chars: self.summarize(
+            text, max_chars, repo, verbose, max_parallel
+        )
         if verbose:
             console.line()
             console.print(f"Running [bold]{self.name}[/bold] with {num_tasks} sub-tasks.")
-        for task in self.tasks:
-            if verbose:
-                console.line()
-                console.print(f"( {current_task + 1}/{num_tasks} ) {task.get('name')}")
-            current_task += 1
-            # Collect template_file_path, repo, model, output_file, prompt
-            template_file_path = task.get("template", None)
-            repo = task.get("repo", repo)
-            model = task.get("model", model)
-            output_file = task.get("output_file", None)
-            cheap = task.get("cheap", False)
-            code = task.get("code", False)
-            direct = task.get("direct", False)
-            branch = task.get("branch", None)
-            snap = False
-
-            previous_responses = ""
-            for i, response in enumerate(self.responses):
-                previous_responses += f"## Result of Sub-task {i + 1}\n\n{response}\n\n"
-            wrapped_prompt = (
-                "We are working on a main task that contains a list of sub-tTasks. "
-                f"This is sub-task {current_task} / {num_tasks}\n\n---\n\n"
-                f"# Main Task {self.name}\n\n{self.plan.get('prompt')}\n\n"
-                f"# Results of previous sub-tasks\n\n{previous_responses}\n\n"
-                f"# Current Sub-task: {task.get('name')}\n\n{task.get('prompt')}\n\n---\n\n"
-                f"Follow the instructions of the current sub-task! "
-                f"Respond with a compact bullet list of your actions."
-            )
-            if debug:
-                console.line()
-                console.print(Markdown(wrapped_prompt))
-                console.line()
-
-            params = TaskParameters(
-                wait=wait,
-                repo=repo,
-                snap=snap,
-                verbose=verbose,
-                cheap=cheap,
-                code=code,
-                template_file_path=template_file_path,
-                direct=direct,
-                output_file=output_file,
-                model=model,
-                debug=debug,
-                prompt=wrapped_prompt,
-                branch=branch,
-                pr_number=self.pr_number,
-            )
 
-            task_runner = TaskRunner(self.status_indicator)
-            finished_task = task_runner.run_task(params)
+        running = {}
+        # First error of a step. No new steps are started after it.
+        failure = None
+        # Pull in the background while remote steps keep running
+        sync_executor = ThreadPoolExecutor(max_workers=1)
+        syncing = None
+        # Steps whose changes were pulled, and the ones the running pull includes
+        synced, syncing_steps = set(), set()
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor, sync_executor:
+            while len(self.responses) < num_tasks and failure is None:
+                for i in self.ready_steps(self.responses, running.values()):
+                    if len(running) >= max_parallel:
+                        break
+                    if running and self.pr_number is None:
+                        # Every step could open its own PR, so they run one at a time until
+                        # a step opened the PR of the plan
+                        break
+                    if sync_branch and self.needs_local_checkout(i):
+                        if syncing is None and not set(self.dependencies[i]) <= synced:
+                            if any(map(self.needs_local_checkout, running.values())):
+                                # Don't change the checkout under a running local step
+                                continue
+                            syncing_steps = set(self.responses)
+                            syncing = sync_executor.submit(
+                                self.sync, sync_branch, verbose, debug, background=True
+                            )
+                        if syncing is not None:
+                            # Start the step once its local checkout is up to date
+                            continue
+                    if verbose:
+                        console.line()
+                        console.print(f"( {i + 1}/{num_tasks} ) {self.tasks[i].get('name')}")
+                    # The step builds its prompt in its worker, summaries can take a while
+                    results = {
+                        dependency: self.responses[dependency]
+                        for dependency in self.dependencies[i]
+                    }
+                    future = executor.submit(
+                        self.run_step,
+                        i,
+                        results,
+                        self.pr_number,
+                        wait,
+                        repo,
+                        verbose,
+                        model,
+                        debug,
+                        max_parallel,
+                    )
+                    running[future] = i
+                done, _ = futures_wait(
+                    list(running) + ([syncing] if syncing else []), return_when=FIRST_COMPLETED
+                )
+                if syncing in done:
+                    syncing.result()
+                    synced |= syncing_steps
+                    syncing = None
+                for future in done:
+                    if future not in running:
+                        continue
+                    i = running.pop(future)
+                    error = self.finish_step(i, future, verbose, journal, console)
+                    failure = failure or error
+            if failure is not None:
+                # Keep the results of steps that were already running, so a resumed run
+                # doesn't repeat them
+                for future in futures_wait(running).done:
+                    self.finish_step(running.pop(future), future, verbose, journal, console)
+                raise failure
+        if journal:
+            journal.clear()
+        if sync_branch and not set(self.responses) <= synced:
+            # All remaining changes in one final pull
+            self.sync(sync_branch, verbose, debug)
+
+    def finish_step(self, index, future, verbose, journal, console):
+        """Store and journal the result of a finished step.
+
+        :return: The error of the step if it failed, otherwise None
+        """
+        try:
+            finished_task = future.result()
             if not finished_task:
                 raise ValueError("Task failed")
-            self.responses.append(finished_task.result)
-            if self.pr_number is None and finished_task.pr_number and verbose:
-                console.print(
-                    f"Found new pull request! "
-                    f"All subsequent tasks will run on PR #{finished_task.pr_number}"
-                )
-            self.pr_number = int(finished_task.pr_number) if finished_task.pr_number else None
+        except Exception as e:
+            return e
+        self.responses[index] = finished_task.result
+        if self.pr_number is None and finished_task.pr_number and verbose:
+            console.print(
+                f"Found new pull request! "
+                f"All subsequent tasks will run on PR #{finished_task.pr_number}"
+            )
+        if finished_task.pr_number:
+            self.pr_number = int(finished_task.pr_number)
+        if journal:
+            journal.record(
+                index,
+                self.tasks[index].get("name"),
+                finished_task.id,
+                finished_task.result,
+                self.pr_number,
+            )
+        return None
+
+    def sync(self, branch, verbose, debug, background=False):
+        """Pull the changes of the plan into the local repository."""
+        status_indicator = self.status_indicator
+        if background:
+            # The spinner belongs to the steps, so only print log messages
+            status_indicator = StatusIndicator(spinner=False, display_log_messages=verbose)
+        pull_branch_changes(status_indicator, Console(), branch, debug)
+
+    def summarize(self, text, max_chars, repo, verbose=False, max_parallel=1):
+        """Summarize the result of a step with the cheap model, in the worker of a step."""
+        status_indicator = self.status_indicator
+        if max_parallel > 1:
+            # The spinner can't be shared between threads, so only print log messages
+            status_indicator = StatusIndicator(spinner=False, display_log_messages=verbose)
+        status_indicator.update_spinner_message("Summarizing result ...")
+        params = TaskParameters(
+            wait=True,
+            repo=repo,
+            verbose=False,
+            model=CHEAP_MODEL,
+            prompt=(
+                f"Summarize the following result of a sub-task in at most {max_chars} characters. "
+                f"Keep all facts that later sub-tasks may need. Respond only with the summary."
+                f"\n\n---\n\n{text}"
+            ),
+        )
+        task = TaskRunner(status_indicator).run_task(
+            params, print_result=False, print_task_id=False
+        )
+        if not task or not task.result:
+            # Fall back to the beginning of the result
+            return text[:max_chars]
+        return task.result[:max_chars]
+
+    def run_step(self, index, results, pr_number, wait, repo, verbose, model, debug, max_parallel):
+        """Run a single step of the plan as a PR Pilot task.
+
+        :param index: Index of the step in the plan
+        :param results: Results of the step's dependencies, by step index
+        :param pr_number: Pull request to run the step on, if any
+        """
+        console = Console()
+        previous_responses = self.context.results_prompt(self.dependencies[index], results)
+        num_tasks = len(self.tasks)
+        task = self.tasks[index]
+        # Collect template_file_path, repo, model, output_file, prompt
+        template_file_path = task.get("template", None)
+        repo = task.get("repo", repo)
+        model = task.get("model", model)
+        output_file = task.get("output_file", None)
+        cheap = task.get("cheap", False)
+        code = task.get("code", False)
+        direct = task.get("direct", False)
+        branch = task.get("branch", None)
+        snap = False
+
+        wrapped_prompt = (
+            "We are working on a main task that contains a list of sub-tTasks. "
+            f"This is sub-task {index + 1} / {num_tasks}\n\n---\n\n"
+            f"# Main Task {self.name}\n\n{self.plan.get('prompt')}\n\n"
+            f"# Results of previous sub-tasks\n\n{previous_responses}\n\n"
+            f"# Current Sub-task: {task.get('name')}\n\n{task.get('prompt')}\n\n---\n\n"
+            f"Follow the instructions of the current sub-task! "
+            f"Respond with a compact bullet list of your actions."
+        )
+        self.prompt_sizes[index] = len(wrapped_prompt)
+        if verbose:
+            console.print(
+                f"[dim]Prompt size: {len(wrapped_prompt)} characters "
+                f"(~{len(wrapped_prompt) // CHARS_PER_TOKEN} tokens)[/dim]"
+            )
+        if debug:
+            console.line()
+            console.print(Markdown(wrapped_prompt))
+            console.line()
+
+        params = TaskParameters(
+            wait=wait,
+            repo=repo,
+            snap=snap,
+            verbose=verbose,
+            cheap=cheap,
+            code=code,
+            file=template_file_path,
+            direct=direct,
+            output=output_file,
+            model=model,
+            debug=debug,
+            prompt=wrapped_prompt,
+            branch=branch,
+            pr_number=pr_number,
+        )
+
+        status_indicator = self.status_indicator
+        if max_parallel > 1:
+            # The spinner can't be shared between threads, so only print log messages
+            status_indicator = StatusIndicator(
+                spinner=False, display_log_messages=verbose, console=console
+            )
+        task_runner = TaskRunner(status_indicator)
+        return task_runner.run_task(params)
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+from typing import Dict
+
+from cli.util import is_git_repo, get_git_root
+
+JOURNAL_DIR = os.path.join(".pilot", "runs")
+
+
+class PlanJournal:
+    """Append-only journal of the finished steps of a plan run.
+
+    Every finished step is written as one JSON line and flushed to disk with fsync, so an
+    interrupted run leaves at most an incomplete last line, which is ignored when loading.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    @classmethod
+    def for_plan(cls, plan_file_path: str) -> "PlanJournal":
+        """Return the journal of a plan file, stored in .pilot/runs/<plan-hash>.jsonl.
+
+        The hash covers the content of the plan, so changing the plan starts a new journal.
+        """
+        with open(plan_file_path, "rb") as f:
+            plan_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+        root = get_git_root() if is_git_repo() else None
+        return cls(os.path.join(root or os.getcwd(), JOURNAL_DIR, f"{plan_hash}.jsonl"))
+
+    def load(self) -> Dict[int, dict]:
+        """Load the finished steps, by step index."""
+        entries = {}
+        try:
+            with open(self.file_path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Incomplete line of an interrupted write
+                        continue
+                    entries[entry["index"]] = entry
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def record(self, index: int, name: str, task_id, result, pr_number) -> None:
+        """Append a finished step to the journal and make sure it is on disk."""
+        new_file = not os.path.exists(self.file_path)
+        if new_file:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        entry = {
+            "index": index,
+            "name": name,
+            "task_id": str(task_id) if task_id else None,
+            "result": result,
+            "pr_number": pr_number,
+        }
+        line = json.dumps(entry) + "\n"
+        if not new_file and not self._ends_with_newline():
+            # Don't append to the incomplete line of an interrupted write
+            line = "\n" + line
+        with open(self.file_path, "a") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        if new_file:
+            # Persist the directory entry of the new file as well
+            dir_fd = os.open(os.path.dirname(self.file_path), os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.file_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def clear(self) -> None:
+        """Remove the journal."""
+        try:
+            os.remove(self.file_path)
+        except FileNotFoundError:
+            pass
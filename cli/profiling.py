@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional
+
+# Path of a Chrome trace file to write. Setting it enables profiling without --profile.
+TRACE_ENV_VAR = "PR_PILOT_TRACE"
+
+# Taken when the CLI package is imported, so the import phase can be measured as well
+PROCESS_START = time.perf_counter()
+
+
+class Span:
+    """A named, timed phase of a `pilot` invocation."""
+
+    __slots__ = ("name", "start", "end", "thread_id", "args")
+
+    def __init__(self, name: str, start: float, end: float, thread_id: int, args: dict):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.thread_id = thread_id
+        self.args = args
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Profiler:
+    """Collect span timings of the hot path of a command.
+
+    Recording is off by default and costs a single attribute check per span. It is enabled
+    by the `--profile` option or the PR_PILOT_TRACE environment variable. Spans can be
+    printed as a summary table and written as a Chrome trace (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def record(self, name: str, start: float, end: float = None, **args):
+        """Record a span that was timed by the caller, e.g. across callbacks."""
+        if not self.enabled:
+            return
+        end = time.perf_counter() if end is None else end
+        with self._lock:
+            self.spans.append(Span(name, start, end, threading.get_ident(), args))
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """Time the enclosed block as a span."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, **args)
+
+    def summary(self) -> List[dict]:
+        """Aggregate the spans by name, in order of their first occurrence."""
+        rows: Dict[str, dict] = {}
+        for span in sorted(self.spans, key=lambda s: s.start):
+            row = rows.setdefault(span.name, {"name": span.name, "calls": 0, "total": 0.0})
+            row["calls"] += 1
+            row["total"] += span.duration
+            row["max"] = max(row.get("max", 0.0), span.duration)
+        return list(rows.values())
+
+    def chrome_trace(self, metadata: dict = None) -> dict:
+        """Convert the spans to the Chrome trace event format, in microseconds."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "ph": "X",
+                "ts": round((span.start - PROCESS_START) * 1e6),
+                "dur": round(span.duration * 1e6),
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": span.args,
+            }
+            for span in self.spans
+        ]
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {**(metadata or {}), "summary": self.summary()},
+        }
+
+    def write_trace(self, file_path: str, metadata: dict = None):
+        import json
+
+        with open(file_path, "w") as f:
+            json.dump(self.chrome_trace(metadata), f, default=str)
+
+    def print_summary(self, console):
+        from rich.table import Table
+
+        wall_time = time.perf_counter() - PROCESS_START
+        table = Table(title=f"Profile ({wall_time * 1000:.0f} ms total)", box=None)
+        table.add_column("Span", style="bold")
+        table.add_column("Calls", justify="right")
+        table.add_column("Total ms", justify="right", style="cyan")
+        table.add_column("Max ms", justify="right")
+        table.add_column("% of total", justify="right", style="dim")
+        for row in self.summary():
+            table.add_row(
+                row["name"],
+                str(row["calls"]),
+                f"{row['total'] * 1000:.1f}",
+                f"{row['max'] * 1000:.1f}",
+                f"{row['total'] / wall_time * 100:.0f}%",
+            )
+        console.print(table)
+
+
+profiler = Profiler()
+
+
+def span(name: str, **args):
+    """Time a block with the process-wide profiler."""
+    return profiler.span(name, **args)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator timing every call of a function or coroutine function as a span."""
+
+    def decorator(function):
+        import inspect
+
+        span_name = name or function.__qualname__
+        if inspect.iscoroutinefunction(function):
+
+            @wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with profiler.span(span_name):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with profiler.span(span_name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,18 +1,81 @@
 import os
 import subprocess
+import threading
+from contextvars import ContextVar
+from typing import Dict, List
 
 import click
 import inquirer
 import jinja2
-from arcane.engine import ArcaneEngine
+from arcane import Task
 from rich.console import Console
 from rich.padding import Padding
 from rich.prompt import Prompt
 
+from cli.api_client import PilotEngine
+from cli.background_calls import BackgroundCalls, resolve_value, support_pending_results
+from cli.constants import CACHE_DIR
+from cli.profiling import traced
+from cli.result_cache import ResultCache
+from cli.status_indicator import StatusIndicator
 from cli.task_handler import TaskHandler
 from cli.util import is_git_repo, get_git_root
 
 MAX_RECURSION_LEVEL = 3
+MAX_PARALLEL_SUBTASKS = int(os.getenv("PR_PILOT_MAX_PARALLEL_SUBTASKS", "4"))
+MAX_PARALLEL_SHELL_COMMANDS = int(os.getenv("PR_PILOT_MAX_PARALLEL_SHELL_COMMANDS", "4"))
+# Limits of every `sh()` call in a template, in seconds and bytes per output stream
+SH_TIMEOUT = float(os.getenv("PR_PILOT_SH_TIMEOUT", "300"))
+SH_MAX_OUTPUT = int(os.getenv("PR_PILOT_SH_MAX_OUTPUT", "100000"))
+READ_CHUNK_SIZE = 65536
+JINJA_CACHE_DIR = os.path.join(CACHE_DIR, "jinja")
+
+# Jinja environments by template home, shared by all renders of a process
+_environments: Dict[str, jinja2.Environment] = {}
+_environments_lock = threading.Lock()
+# Implementations of the template functions for the render in progress
+_template_functions: ContextVar[dict] = ContextVar("template_functions")
+TEMPLATE_FUNCTIONS = ("env", "select", "subtask", "sh")
+
+
+def template_function(name: str):
+    """Global of the shared environments that calls the function of the current render."""
+
+    def call(*args, **kwargs):
+        return _template_functions.get()[name](*args, **kwargs)
+
+    call.__name__ = name
+    return call
+
+
+def get_environment(home: str) -> jinja2.Environment:
+    """Return the shared Jinja environment of a template home.
+
+    The environment keeps parsed templates in memory and reloads a template only if its
+    modification time changed. Compiled templates are also written to JINJA_CACHE_DIR, so
+    later `pilot` invocations skip parsing and compiling as long as the source is unchanged.
+
+    Template functions like `sh()` are globals, so imported macros can use them as well.
+    They dispatch to the functions of the render in progress, see `PromptTemplate.render`.
+    """
+    home = os.path.abspath(home)
+    with _environments_lock:
+        env = _environments.get(home)
+        if env is None:
+            try:
+                os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+                bytecode_cache = jinja2.FileSystemBytecodeCache(JINJA_CACHE_DIR)
+            except OSError:
+                bytecode_cache = None
+            env = jinja2.Environment(
+                loader=jinja2.FileSystemLoader(home),
+                bytecode_cache=bytecode_cache,
+                auto_reload=True,
+            )
+            env.globals.update({name: template_function(name) for name in TEMPLATE_FUNCTIONS})
+            support_pending_results(env)
+            _environments[home] = env
+        return env
 
 
 def select(prompt: str, choices: list[str]):
@@ -30,27 +93,136 @@ def select(prompt: str, choices: list[str]):
     return response["choices"]
 
 
-def sh(shell_command, status):
+def run_shell_command(
+    command: List[str], timeout: float = None, max_output: int = None
+) -> subprocess.CompletedProcess:
+    """Run a command, stopping it after `timeout` seconds or once an output stream exceeds
+    `max_output` bytes.
+
+    Output is read while the command runs, so a runaway command can't fill up the memory.
+    A command that timed out is returned with its partial output and returncode None.
+    """
+    timeout = SH_TIMEOUT if timeout is None else timeout
+    max_output = SH_MAX_OUTPUT if max_output is None else max_output
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    outputs = {"stdout": bytearray(), "stderr": bytearray()}
+    truncated = set()
+
+    def read(name):
+        stream = getattr(process, name)
+        output = outputs[name]
+        try:
+            while chunk := stream.read1(READ_CHUNK_SIZE):
+                room = max_output - len(output)
+                if len(chunk) > room:
+                    output += chunk[:room]
+                    truncated.add(name)
+                    process.kill()
+                    return
+                output += chunk
+        finally:
+            stream.close()
+
+    readers = [threading.Thread(target=read, args=(name,), daemon=True) for name in outputs]
+    for reader in readers:
+        reader.start()
+    timed_out = False
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        timed_out = True
+    for reader in readers:
+        # Processes started by the command can keep the pipes open
+        reader.join(timeout=1)
+
+    stdout, stderr = (
+        bytes(outputs[name]).decode(errors="replace")
+        + (f"\n[Output truncated to {max_output} bytes]" if name in truncated else "")
+        for name in outputs
+    )
+    if timed_out:
+        stderr += f"\nCommand timed out after {timeout} seconds"
+    return subprocess.CompletedProcess(
+        command, None if timed_out else process.returncode, stdout, stderr
+    )
+
+
+def report_shell_command(command: List[str], result: subprocess.CompletedProcess, status):
+    """Log the outcome of a shell command, the spinner keeps running."""
+    if result.stderr:
+        status.warning(f"Shell command `{' '.join(command)}` reported errors")
+        status.hide()
+        Console().print(Padding(result.stderr, (1, 1)))
+        status.show()
+    else:
+        status.log_message(f"Run shell command `{' '.join(command)}`")
+
+
+def shell_output(result: subprocess.CompletedProcess) -> str:
+    return (result.stdout + result.stderr).strip()
+
+
+def sh(shell_command, status, timeout=None, max_output=None):
     """Run a shell command and return the output"""
-    status.start()
     if isinstance(shell_command, str):
         shell_command = shell_command.split()
 
     status.update_spinner_message(f"Running shell command: {' '.join(shell_command)}")
-    subprocess_params = dict(
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=os.environ.copy()
-    )
-    result = subprocess.run(shell_command, **subprocess_params)
-    if result.stderr:
-        status.fail()
-        status.stop()
-        console = Console()
-        console.print(Padding(result.stderr, (1, 1)))
-    else:
-        status.stop()
-        status.log_message(f"Run shell command `{' '.join(shell_command)}`")
-    result = (result.stdout + result.stderr).strip()
-    return result
+    result = run_shell_command(shell_command, timeout, max_output)
+    report_shell_command(shell_command, result, status)
+    return shell_output(result)
+
+
+class ShellCommands:
+    """The `sh()` function of one render of a template.
+
+    Identical commands are only run once per render. `sh(command, parallel=True)` starts the
+    command in the background and returns a `PendingResult`, so independent commands run at
+    the same time. Commands are logged when their output is used, on the render thread.
+    """
+
+    def __init__(self, status, max_parallel: int = None):
+        self.status = status
+        self.results = {}
+        self.background = BackgroundCalls(
+            status, max_parallel or MAX_PARALLEL_SHELL_COMMANDS, "shell commands"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.background.__exit__(*args)
+
+    def __call__(self, shell_command, parallel=False, timeout=None, max_output=None):
+        # Commands can be built from the output of earlier background commands
+        shell_command = resolve_value(shell_command)
+        if isinstance(shell_command, str):
+            shell_command = shell_command.split()
+        shell_command = [str(part) for part in shell_command]
+        key = (tuple(shell_command), timeout, max_output)
+        if key not in self.results:
+            if parallel:
+                self.results[key] = self.background.start(
+                    run_shell_command,
+                    shell_command,
+                    timeout,
+                    max_output,
+                    then=lambda result: self.report(shell_command, result),
+                )
+            else:
+                self.results[key] = sh(shell_command, self.status, timeout, max_output)
+        return self.results[key]
+
+    def report(self, shell_command, result: subprocess.CompletedProcess) -> str:
+        report_shell_command(shell_command, result, self.status)
+        return shell_output(result)
+
+    def resolve(self, text: str) -> str:
+        """Fill in the output of background commands printed in a text."""
+        return self.background.resolve(text)
 
 
 def read_env_var(variable, default=None):
@@ -74,7 +246,16 @@ def wrap_function_with_status(func, status):
 class PromptTemplate:
 
     def __init__(
-        self, template_file_path, repo, model, status, recursion_level=0, home=None, **kwargs
+        self,
+        template_file_path,
+        repo,
+        model,
+        status,
+        recursion_level=0,
+        home=None,
+        max_parallel_subtasks=None,
+        result_cache=None,
+        **kwargs,
     ):
         self.template_file_path = template_file_path
         self.repo = repo
@@ -85,6 +266,10 @@ class PromptTemplate:
         self.home = home
         if not self.home:
             self.home = self.determine_template_home()
+        self.max_parallel_subtasks = max_parallel_subtasks
+        if self.max_parallel_subtasks is None:
+            self.max_parallel_subtasks = MAX_PARALLEL_SUBTASKS
+        self.result_cache = result_cache
 
     def determine_template_home(self):
         if is_git_repo():
@@ -107,48 +292,117 @@ class PromptTemplate:
             return os.path.relpath(full_template_path, self.home)
         return self.template_file_path
 
-    def render(self):
+    def subtask(self, prompt, status, **kwargs):
+        """Run a prompt (or a prompt template file) as a PR Pilot task and return the result."""
+        prompt = self.subtask_prompt(prompt, status, **kwargs)
+        if prompt is None:
+            return ""
+        return self.run_subtask(prompt, status)
+
+    def subtask_prompt(self, prompt, status, **kwargs):
+        """Render the prompt of a sub-task if it's a template file.
 
-        def subtask(prompt, status, **kwargs):
-            # Treat prompt as a file path and read the content if the file exists
-            # The file name will be relative to the current jinja template
-            full_template_path = os.path.join(os.getcwd(), self.template_file_path)
-            current_template_path = os.path.dirname(full_template_path)
-            potential_file_path = os.path.join(current_template_path, prompt)
+        :return: The prompt, or None if the maximum recursion level is reached.
+        """
+        # Treat prompt as a file path and read the content if the file exists
+        # The file name will be relative to the current jinja template
+        full_template_path = os.path.join(os.getcwd(), self.template_file_path)
+        current_template_path = os.path.dirname(full_template_path)
+        potential_file_path = os.path.join(current_template_path, prompt)
+        if not os.path.exists(potential_file_path):
+            return prompt
+
+        if self.recursion_level >= MAX_RECURSION_LEVEL:
             status.start()
-            if os.path.exists(potential_file_path):
-
-                if self.recursion_level >= MAX_RECURSION_LEVEL:
-                    status.update_spinner_message(
-                        f"Abort loading {prompt}. Maximum recursion level reached."
-                    )
-                    status.fail()
-                    return ""
-                sub_template = PromptTemplate(
-                    potential_file_path,
-                    self.repo,
-                    self.model,
-                    status,
-                    self.recursion_level - 1,
-                    **kwargs,
-                )
-                prompt = sub_template.render()
+            status.update_spinner_message(
+                f"Abort loading {prompt}. Maximum recursion level reached."
+            )
+            status.fail()
+            return None
+        sub_template = PromptTemplate(
+            potential_file_path,
+            self.repo,
+            self.model,
+            status,
+            self.recursion_level + 1,
+            max_parallel_subtasks=self.max_parallel_subtasks,
+            result_cache=self.result_cache,
+            **kwargs,
+        )
+        return sub_template.render()
 
-            try:
-                status.update_spinner_message("Creating sub-task ...")
-                engine = ArcaneEngine()
-                task = engine.create_task(self.repo, prompt, log=False, gpt_model=self.model)
-                task_handler = TaskHandler(task, status)
-                return task_handler.wait_for_result(log_messages=False, print_result=False)
-            except Exception as e:
-                raise click.ClickException(f"Error creating sub-task: {e}")
-            finally:
+    def run_subtask(self, prompt, status):
+        """Run a prompt as a PR Pilot task and return the result."""
+        status.start()
+        cache_key = None
+        if self.result_cache:
+            cache_key = ResultCache.task_key(prompt, self.repo, None, self.model, False)
+            cached_task = self.result_cache.get(cache_key) if cache_key else None
+            if cached_task:
                 status.stop()
+                return Task.model_validate_json(cached_task).result
+
+        try:
+            status.update_spinner_message("Creating sub-task ...")
+            engine = PilotEngine()
+            task = engine.create_task(self.repo, prompt, log=False, gpt_model=self.model)
+            task_handler = TaskHandler(task, status)
+            result = task_handler.wait_for_result(log_messages=False, print_result=False)
+            if cache_key and result is not None:
+                self.result_cache.put(cache_key, task_handler.task.model_dump_json())
+            return result
+        except Exception as e:
+            raise click.ClickException(f"Error creating sub-task: {e}")
+        finally:
+            status.stop()
+
+    def render_template(self, shell, subtasks):
+        """Render the template with the given `sh()` and background sub-tasks."""
 
-        env = jinja2.Environment(loader=jinja2.FileSystemLoader(self.home))
-        env.globals.update(env=read_env_var)
-        env.globals.update(select=select)
-        env.globals.update(subtask=wrap_function_with_status(subtask, self.status))
-        env.globals.update(sh=wrap_function_with_status(sh, self.status))
-        template = env.get_template(self.get_template_file_path())
-        return template.render(self.variables)
+        def resolve(text):
+            return subtasks.resolve(shell.resolve(str(text)))
+
+        def run_subtask(prompt, status, parallel=False, **kwargs):
+            # Prompts can contain results of background commands and sub-tasks
+            prompt = resolve(prompt)
+            if not parallel:
+                return self.subtask(prompt, status, **kwargs)
+            # Sub-templates are rendered here, so prompts for user input stay on this thread
+            prompt = self.subtask_prompt(prompt, status, **kwargs)
+            if prompt is None:
+                return ""
+            # The spinner is not thread-safe, so sub-tasks run without one
+            quiet_status = StatusIndicator(spinner=False, display_log_messages=False)
+            return subtasks.start(self.run_subtask, prompt, quiet_status)
+
+        functions = dict(
+            env=read_env_var,
+            select=select,
+            subtask=wrap_function_with_status(run_subtask, self.status),
+            sh=shell,
+        )
+        template = get_environment(self.home).get_template(self.get_template_file_path())
+        # The environment is shared, its globals call the functions of this render
+        token = _template_functions.set(functions)
+        calls_token = subtasks.activate()
+        try:
+            output = template.render(self.variables)
+        finally:
+            subtasks.deactivate(calls_token)
+            _template_functions.reset(token)
+        return resolve(output)
+
+    @traced("PromptTemplate.render")
+    def render(self):
+        """Render the template.
+
+        `subtask(prompt)` runs a sub-task and waits for its result. With
+        `subtask(prompt, parallel=True)`, the sub-task runs in the background, on a thread pool of
+        `max_parallel_subtasks` workers, while the template keeps rendering. Only use it for
+        sub-tasks that don't depend on each other's changes. Its result is filled in once it's
+        needed, see `PendingResult`. Sub-tasks are only created for calls the template makes.
+        """
+        with ShellCommands(self.status) as shell, BackgroundCalls(
+            self.status, self.max_parallel_subtasks, "sub-tasks"
+        ) as subtasks:
+            return self.render_template(shell, subtasks)
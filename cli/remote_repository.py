@@ -0,0 +1,103 @@
+import asyncio
+import os
+import subprocess
+from typing import Dict, Iterable, List, Optional
+
+from cli.constants import CACHE_DIR
+from cli.util import run_git_async
+
+GRAB_CACHE_DIR = os.path.join(CACHE_DIR, "grab")
+# Ref the fetched default branch of a repository is stored under
+FETCHED_REF = "refs/heads/pilot-grab"
+MAX_PARALLEL_FETCHES = 8
+
+
+class RemoteRepository:
+    """Bare clone of a Github repository, kept in ~/.cache/pr-pilot/grab/.
+
+    The clone is created once and then updated with a shallow `git fetch`. Files are read
+    from the fetched commit with `git show`, nothing is checked out.
+    """
+
+    def __init__(self, repo: str, url: str = None, cache_dir: str = None):
+        """
+        :param repo: Github repository (owner/repo).
+        :param url: URL to fetch from, defaults to the SSH URL of the Github repository.
+        :param cache_dir: Directory of the cached clones.
+        """
+        self.repo = repo
+        self.url = url or f"git@github.com:{repo}.git"
+        self.path = os.path.join(cache_dir or GRAB_CACHE_DIR, repo.replace("/", "__") + ".git")
+
+    async def fetch(self) -> None:
+        """Create the bare clone if necessary and fetch the latest commit of the default branch.
+
+        :raises RuntimeError: If git fails, e.g. because the repository doesn't exist.
+        """
+        if not os.path.isdir(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            result = await run_git_async("init", "--quiet", "--bare", self.path)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip())
+        result = await run_git_async(
+            "-C",
+            self.path,
+            "fetch",
+            "--quiet",
+            "--depth",
+            "1",
+            "--no-tags",
+            "--force",
+            self.url,
+            f"HEAD:{FETCHED_REF}",
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Could not fetch {self.url}: {result.stderr.strip()}")
+
+    def read_file(self, file_path: str) -> Optional[bytes]:
+        """Read a file of the fetched commit, or None if it doesn't exist."""
+        result = subprocess.run(
+            ["git", "-C", self.path, "show", f"{FETCHED_REF}:{file_path}"],
+            capture_output=True,
+        )
+        if result.returncode != 0:
+            return None
+        return result.stdout
+
+    def export(self, file_paths: Iterable[str], directory: str) -> List[str]:
+        """Write files of the fetched commit into a directory, keeping their relative paths.
+
+        :return: The paths of the exported files. Missing files are skipped.
+        """
+        exported = []
+        for file_path in file_paths:
+            content = self.read_file(file_path)
+            if content is None:
+                continue
+            target = os.path.join(directory, file_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(content)
+            exported.append(target)
+        return exported
+
+
+async def fetch_repositories(
+    repositories: List[RemoteRepository], max_parallel: int = MAX_PARALLEL_FETCHES
+) -> Dict[str, Optional[Exception]]:
+    """Fetch several repositories concurrently.
+
+    :return: The error of every repository by name, None if it was fetched successfully.
+    """
+    slots = asyncio.Semaphore(max_parallel)
+
+    async def fetch(repository: RemoteRepository) -> Optional[Exception]:
+        async with slots:
+            try:
+                await repository.fetch()
+            except (RuntimeError, OSError) as e:
+                return e
+        return None
+
+    errors = await asyncio.gather(*[fetch(repository) for repository in repositories])
+    return {repository.repo: error for repository, error in zip(repositories, errors)}
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from rich.console import Console
+
+from cli.constants import CACHE_DIR
+from cli.detect_repository import detect_repository
+from cli.git_context import GitContext
+
+RESULT_CACHE_LOCATION = os.path.join(CACHE_DIR, "results.sqlite3")
+DEFAULT_MAX_SIZE = 50 * 1024 * 1024  # 50 MB
+DEFAULT_TTL = 7 * 24 * 60 * 60  # 7 days
+
+
+# Whether the user was told that results can't be cached, it's only said once per process
+_reported_unknown_head = False
+
+
+def get_remote_head_sha(branch=None) -> Optional[str]:
+    """Get the SHA of the remote branch a task runs on, as known to the local clone."""
+    context = GitContext.current()
+    sha = context.remote_sha(branch)
+    if sha is None and not branch:
+        # origin/HEAD is missing in clones set up with `git remote add` and in many CI
+        # checkouts, use the branch the current branch tracks instead
+        sha = context.upstream_sha()
+    return sha
+
+
+def report_unknown_head(branch=None) -> None:
+    """Tell the user once that results are not cached because the remote state is unknown."""
+    global _reported_unknown_head
+    if _reported_unknown_head:
+        return
+    _reported_unknown_head = True
+    if branch:
+        reason = f"branch `{branch}` is not known on origin, fetch it first"
+    else:
+        reason = (
+            "origin's default branch is unknown, "
+            "run `git remote set-head origin --auto` or track a branch of origin"
+        )
+    Console(stderr=True).print(f"[yellow]Results are not cached: {reason}.[/yellow]")
+
+
+class ResultCache:
+    """Local cache of task results, keyed by a hash of everything that determines them.
+
+    Entries are stored in SQLite, expire after `ttl` seconds and are evicted in least
+    recently used order once the cache grows beyond `max_size` bytes.
+    """
+
+    def __init__(
+        self,
+        file_path: str = RESULT_CACHE_LOCATION,
+        max_size: int = DEFAULT_MAX_SIZE,
+        ttl: int = DEFAULT_TTL,
+    ):
+        self.file_path = file_path
+        self.max_size = max_size
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, task TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+
+    @contextmanager
+    def _connect(self):
+        # One connection per operation, so the cache can be used from several threads
+        db = sqlite3.connect(self.file_path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def task_key(prompt, repo, branch, model, code) -> Optional[str]:
+        """Compute the cache key of a task.
+
+        :return: The key, or None if the task can't be cached because the state of the
+                 repository is unknown (e.g. it's not the repository of the current directory).
+        """
+        if not repo or repo != detect_repository():
+            return None
+        head_sha = get_remote_head_sha(branch)
+        if not head_sha:
+            report_unknown_head(branch)
+            return None
+        key_data = json.dumps([prompt, repo, head_sha, model, bool(code)])
+        return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+    def _increment(self, db, counter):
+        db.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (counter,),
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached task as JSON, or None on a miss."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+            row = db.execute("SELECT task FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._increment(db, "misses")
+                return None
+            db.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+            self._increment(db, "hits")
+            return row[0]
+
+    def put(self, key: str, task_json: str) -> None:
+        """Store a task as JSON and evict least recently used entries if the cache is full."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO results (key, task, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, task_json, len(task_json), now, now),
+            )
+            total_size = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            rows = db.execute("SELECT key, size FROM results ORDER BY last_used ASC").fetchall()
+            for evicted_key, size in rows:
+                if total_size <= self.max_size:
+                    break
+                db.execute("DELETE FROM results WHERE key = ?", (evicted_key,))
+                self._increment(db, "evictions")
+                total_size -= size
+
+    def stats(self) -> dict:
+        """Return the number and size of entries as well as hit/miss/eviction counters."""
+        with self._connect() as db:
+            entries, size = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+            counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            "entries": entries,
+            "size": size,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+        }
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        with self._connect() as db:
+            db.execute("DELETE FROM results")
+            db.execute("DELETE FROM counters")
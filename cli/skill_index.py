@@ -1,12 +1,22 @@
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 import yaml
 from pydantic import BaseModel, Field
 
-from cli.util import is_git_repo, get_git_root
+from cli.constants import CACHE_DIR
+from cli.user_config import YamlLoader
+from cli.util import (
+    is_git_repo,
+    get_git_root,
+    file_signature,
+    json_cache_path,
+    read_json_cache,
+    write_json_cache,
+)
 
 SKILL_FILE_PATH = ".pilot-skills.yaml"
+SKILL_CATALOG_DIR = os.path.join(CACHE_DIR, "skills")
 
 
 def str_presenter(dumper, data):
@@ -63,6 +73,10 @@ def find_pilot_skills_file() -> Optional[str]:
 class SkillIndex:
     """
     A class to manage the index of skills stored in a YAML file.
+
+    Skills are indexed by title. Validated skills are compiled into a JSON catalog in
+    ~/.cache/pr-pilot/skills/, keyed by the YAML file's modification time and size, so
+    unchanged skill files are neither parsed nor validated again.
     """
 
     def __init__(self, file_path: str = None):
@@ -75,32 +89,59 @@ class SkillIndex:
         if not self.file_path:
             self.file_path = find_pilot_skills_file()
 
-        self.skills = self._load_skills() if self.file_path else []
+        self.skills: Dict[str, AgentSkill] = self._load_skills() if self.file_path else {}
+
+    def _catalog_path(self) -> str:
+        return json_cache_path(SKILL_CATALOG_DIR, self.file_path)
 
-    def _load_skills(self) -> List[AgentSkill]:
+    def _write_catalog(self, signature) -> None:
+        """Store the validated skills, so they can be loaded without validating them again."""
+        skills = [skill.model_dump() for skill in self.skills.values()]
+        # Skill files of temporary checkouts, e.g. by `pilot grab`, leave stale catalogs behind
+        write_json_cache(self._catalog_path(), self.file_path, signature, skills, prune=True)
+
+    def _load_skills(self) -> Dict[str, AgentSkill]:
         """
-        Load skills from the YAML file.
+        Load skills from the compiled catalog, or from the YAML file if it changed.
 
-        :return: A list of AgentSkill objects.
+        :return: AgentSkill objects by title.
+
+        :raises ValueError: If several skills in the file have the same title.
         """
-        try:
-            with open(self.file_path, "r") as file:
-                data = yaml.safe_load(file)
-                return [AgentSkill(**skill) for skill in data]
-        except FileNotFoundError:
-            return []
+        signature = file_signature(self.file_path)
+        if signature is None:
+            return {}
+        skills = read_json_cache(self._catalog_path(), self.file_path, signature)
+        if skills is not None:
+            # The catalog only contains validated skills
+            return {skill["title"]: AgentSkill.model_construct(**skill) for skill in skills}
+
+        with open(self.file_path, "r") as file:
+            data = yaml.load(file, Loader=YamlLoader) or []
+        self.skills = {}
+        for skill_data in data:
+            skill = AgentSkill(**skill_data)
+            if skill.title in self.skills:
+                # Saving the index would silently drop all but the last of them
+                raise ValueError(f"Duplicate skill title '{skill.title}' in {self.file_path}")
+            self.skills[skill.title] = skill
+        self._write_catalog(signature)
+        return self.skills
 
     def save_skills(self) -> None:
         """
         Save the current list of skills to the YAML file.
         """
-        with open(self.file_path, "w") as file:
+        tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
             yaml.dump(
-                [skill.dict() for skill in self.skills],
+                [skill.dict() for skill in self.skills.values()],
                 file,
                 default_flow_style=False,
                 allow_unicode=True,
             )
+        os.replace(tmp_path, self.file_path)
+        self._write_catalog(file_signature(self.file_path))
 
     def add_skill(self, new_skill: AgentSkill) -> None:
         """
@@ -110,10 +151,28 @@ class SkillIndex:
 
         :raises ValueError: If a skill with the same name already exists.
         """
-        for skill in self.skills:
-            if skill.title == new_skill.title:
-                raise ValueError(f"Skill with title '{new_skill.title}' already exists")
-        self.skills.append(new_skill)
+        self.add_skills([new_skill])
+
+    def add_skills(self, new_skills: List[AgentSkill], replace: bool = False) -> None:
+        """
+        Add several skills and save the file once.
+
+        :param new_skills: The AgentSkill objects to add.
+        :param replace: Replace existing skills with the same title instead of failing.
+
+        :raises ValueError: If several new skills have the same title, or a skill with the same
+            title already exists and replace is False.
+        """
+        titles = [new_skill.title for new_skill in new_skills]
+        for title in titles:
+            if titles.count(title) > 1:
+                raise ValueError(f"Duplicate skill title '{title}'")
+        if not replace:
+            for new_skill in new_skills:
+                if new_skill.title in self.skills:
+                    raise ValueError(f"Skill with title '{new_skill.title}' already exists")
+        for new_skill in new_skills:
+            self.skills[new_skill.title] = new_skill
         self.save_skills()
 
     def get_skills(self) -> List[AgentSkill]:
@@ -122,7 +181,7 @@ class SkillIndex:
 
         :return: A list of AgentSkill objects.
         """
-        return self.skills
+        return list(self.skills.values())
 
     def get_skill(self, skill_title: str) -> Optional[AgentSkill]:
         """
@@ -131,10 +190,7 @@ class SkillIndex:
         :param skill_title: The title of the skill.
         :return: The AgentSkill object, or None if not found.
         """
-        for skill in self.skills:
-            if skill.title == skill_title:
-                return skill
-        return None
+        return self.skills.get(skill_title)
 
     def remove_skill(self, skill_title: str) -> None:
         """
@@ -142,5 +198,14 @@ class SkillIndex:
 
         :param skill_title: The title of the skill to remove.
         """
-        self.skills = [skill for skill in self.skills if skill.title != skill_title]
+        self.remove_skills([skill_title])
+
+    def remove_skills(self, skill_titles: List[str]) -> None:
+        """
+        Remove several skills by title and save the file once.
+
+        :param skill_titles: The titles of the skills to remove.
+        """
+        for skill_title in skill_titles:
+            self.skills.pop(skill_title, None)
         self.save_skills()
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+import websockets
+from arcane import Task
+
+from cli.api_client import PilotEngine
+from cli.profiling import profiler
+from cli.user_config import UserConfig
+from cli.util import get_api_host
+
+MAX_CONNECTIONS = 20
+# Reconnect attempts in a row before falling back to polling the REST API
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5  # Seconds
+BACKOFF_MAX = 15  # Seconds
+POLL_INTERVAL = 5  # Seconds
+FINAL_STATUSES = ["completed", "failed"]
+
+# Receives a decoded event message and returns True once the task is finished
+MessageHandler = Callable[[dict], Awaitable[bool]]
+WarningHandler = Callable[[str], None]
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, capped at BACKOFF_MAX seconds."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+class TaskEventHub:
+    """Follow the event streams of many tasks from a single asyncio event loop.
+
+    Every task has its own websocket endpoint, so the hub keeps one connection per
+    followed task. At most `max_connections` of them are open at the same time, the
+    rest wait for a free slot.
+
+    Interrupted connections are re-established with exponential backoff. Events the
+    server sends again after a reconnect are skipped. If the connection can't be
+    re-established, the task status is polled from the REST API instead.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = MAX_CONNECTIONS,
+        api_key: str = None,
+        fetch_task: Callable[[str], Task] = None,
+        max_retries: int = MAX_RETRIES,
+        poll_interval: float = POLL_INTERVAL,
+    ):
+        """
+        :param max_connections: Maximum number of open websocket connections.
+        :param api_key: API key, defaults to the one in the user config.
+        :param fetch_task: Function retrieving a task by ID, used for polling.
+        :param max_retries: Reconnect attempts in a row before polling.
+        :param poll_interval: Seconds between two status requests while polling.
+        """
+        self.max_connections = max_connections
+        self.api_key = api_key
+        self.fetch_task = fetch_task or (lambda task_id: PilotEngine().get_task(task_id))
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+        self._semaphore = None
+        self._loop = None
+
+    @property
+    def headers(self):
+        api_key = self.api_key if self.api_key else UserConfig.shared().api_key
+        return {"X-Api-Key": api_key}
+
+    @staticmethod
+    def websocket_url(task_id) -> str:
+        websocket_host = get_api_host().replace("https://", "wss://").replace("http://", "ws://")
+        return f"{websocket_host}/ws/tasks/{task_id}/events/"
+
+    def _connection_slots(self) -> asyncio.Semaphore:
+        # Semaphores are bound to an event loop, create a new one if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+            self._loop = loop
+        return self._semaphore
+
+    async def stream(
+        self, task_id, on_message: MessageHandler, on_warning: Optional[WarningHandler] = None
+    ) -> bool:
+        """Route the events of a task to a handler until the handler reports completion.
+
+        :param task_id: The ID of the task to follow.
+        :param on_message: Coroutine called with every decoded message. Returns True when done.
+        :param on_warning: Called with a message when the connection is interrupted.
+        :return: True if the handler reported completion, False if the task status could
+                 neither be streamed nor polled.
+        """
+
+        def warn(message):
+            if on_warning:
+                on_warning(message)
+
+        # Fingerprints of all handled messages, in order of arrival
+        handled = []
+        attempt = 0
+        stream_start = time.perf_counter()
+        while attempt <= self.max_retries:
+            if attempt:
+                # Other tasks can use the connection slot while this one backs off
+                await asyncio.sleep(backoff_delay(attempt))
+            # After a reconnect, the server may send the events of the task again
+            replayed = 0
+            replaying = bool(handled)
+            try:
+                async with self._connection_slots():
+                    connect_start = time.perf_counter()
+                    async with websockets.connect(
+                        self.websocket_url(task_id), extra_headers=self.headers
+                    ) as websocket:
+                        profiler.record("websocket connect", connect_start, task_id=str(task_id))
+                        async for raw_message in websocket:
+                            if not handled:
+                                profiler.record(
+                                    "time to first event", stream_start, task_id=str(task_id)
+                                )
+                            fingerprint = hash(raw_message)
+                            if replaying:
+                                if replayed < len(handled) and handled[replayed] == fingerprint:
+                                    replayed += 1
+                                    continue
+                                replaying = False
+                            handled.append(fingerprint)
+                            # The connection works again, start counting retries from scratch
+                            attempt = 0
+                            if await on_message(json.loads(raw_message)):
+                                return True
+                if attempt < self.max_retries:
+                    warn("Connection closed before the task finished, reconnecting...")
+            except (
+                websockets.exceptions.WebSocketException,
+                OSError,
+                asyncio.TimeoutError,
+            ) as e:
+                if attempt < self.max_retries:
+                    warn(
+                        f"Connection error: {e}. "
+                        f"Reconnecting (attempt {attempt + 1} of {self.max_retries})..."
+                    )
+                else:
+                    warn(f"Connection error: {e}.")
+            attempt += 1
+
+        warn("Could not reconnect, polling the task status instead.")
+        return await self.poll(task_id, on_message, warn)
+
+    async def poll(self, task_id, on_message: MessageHandler, warn: WarningHandler) -> bool:
+        """Poll the task via the REST API until it is finished and pass on its final status.
+
+        :return: True if the handler reported completion, False if the API is unreachable.
+        """
+        errors = 0
+        while True:
+            try:
+                task = await asyncio.to_thread(self.fetch_task, str(task_id))
+                errors = 0
+            except Exception as e:
+                errors += 1
+                if errors > self.max_retries:
+                    warn(f"Could not retrieve the task status: {e}")
+                    return False
+                await asyncio.sleep(backoff_delay(errors))
+                continue
+            if task.status in FINAL_STATUSES:
+                if task.title:
+                    await on_message({"type": "title_update", "data": task.title})
+                return await on_message(
+                    {
+                        "type": "status_update",
+                        "data": {"status": task.status, "message": task.result},
+                    }
+                )
+            await asyncio.sleep(self.poll_interval)
@@ -1,15 +1,13 @@
 import asyncio
-import json
 
 import click.exceptions
-import websockets
 from arcane import Task
 from rich.console import Console
-from websockets.frames import CloseCode
 
+from cli.profiling import traced
 from cli.status_indicator import StatusIndicator
-from cli.user_config import UserConfig
-from cli.util import clean_code_block_with_language_specifier, markdown_panel, get_api_host
+from cli.task_event_hub import TaskEventHub
+from cli.util import clean_code_block_with_language_specifier, render_markdown, get_api_host
 
 STATUS_FAILED = "failed"
 STATUS_COMPLETED = "completed"
@@ -21,10 +19,21 @@ IGNORED_EVENT_ACTIONS = ["clone_repo"]
 
 
 class TaskHandler:
-    def __init__(self, task: Task, status_indicator: StatusIndicator):
+    def __init__(
+        self, task: Task, status_indicator: StatusIndicator, label: str = None, plain: bool = None
+    ):
+        """
+        :param task: The task to follow.
+        :param status_indicator: Status indicator
+        :param label: Prefix for messages and results, to tell several tasks apart.
+        :param plain: Print results as raw markdown without rich. Defaults to True if the
+                      output is not a terminal (e.g. piped into another command).
+        """
         self.task = task
+        self.label = label
         self.dashboard_url = f"{get_api_host()}/dashboard/tasks/{task.id}"
         self.console = Console()
+        self.plain = plain if plain is not None else not self.console.is_terminal
         self.status = status_indicator
         self.task_runs_on_pr = self.task.pr_number is not None
         self.action_character_map = {
@@ -43,8 +52,15 @@ class TaskHandler:
             # Add more mappings as needed
         }
 
+    @traced("TaskHandler.stream_task_events")
     async def stream_task_events(
-        self, task_id, output_file=None, log_messages=True, code=False, print_result=True
+        self,
+        task_id,
+        output_file=None,
+        log_messages=True,
+        code=False,
+        print_result=True,
+        hub: TaskEventHub = None,
     ):
         """
         Connect to the websocket and stream task events until the task is completed or failed.
@@ -53,86 +69,106 @@ class TaskHandler:
         :param log_messages: Print status messages.
         :param code: If True, the result will be treated as code
         :param print_result: If True, the result will be printed on the command line.
+        :param hub: Event hub to follow the task with. Defaults to a new hub.
         """
-        max_retries = 3
-        retry_count = 0
         self.status.start()
-        api_key = UserConfig().api_key
-        websocket_host = get_api_host().replace("https://", "wss://").replace("http://", "ws://")
-        websocket_url = f"{websocket_host}/ws/tasks/{task_id}/events/"
-        headers = {"X-Api-Key": api_key}
+        if hub is None:
+            hub = TaskEventHub()
 
-        while retry_count < max_retries:
-            try:
-                async with websockets.connect(websocket_url, extra_headers=headers) as websocket:
-                    async for message in websocket:
-                        json_message = json.loads(message)
-                        msg_type = json_message.get("type")
-                        if msg_type == MSG_TITLE_UPDATE:
-                            title = json_message.get("data")
-                            self.task.title = title
-                            self.status.update_spinner_message(title)
-                        if msg_type == MSG_STATUS_UPDATE:
-                            new_status = json_message.get("data").get("status")
-                            message = json_message.get("data").get("message", "")
-                            self.task.result = message
-                            if new_status == STATUS_COMPLETED:
-                                self.status.hide()
-                                if output_file:
-                                    await self.write_result_to_file(code, message, output_file)
-                                elif print_result:
-                                    self.console.print(
-                                        markdown_panel(None, message, hide_frame=True)
-                                    )
-                                self.status.show()
-                                return message
-                            elif new_status == STATUS_FAILED:
-                                self.status.fail()
-                                raise click.ClickException(f"Task failed: {self.task.result}")
-                        if msg_type == MSG_EVENT:
-                            event = json_message.get("data")
-                            action = event.get("action")
-                            target = event.get("target")
-                            if action not in IGNORED_EVENT_ACTIONS and log_messages:
-                                character = self.action_character_map.get(action, "✔")
-                                if action == "invoke_skill":
-                                    self.status.log_message(
-                                        event.get("message"),
-                                        character=character,
-                                        character_color="dim",
-                                    )
-                                    self.status.indent = 2
-                                elif action == "finish_skill":
-                                    self.status.indent = 0
-                                    self.status.log_message(
-                                        "Skill finished",
-                                        character=character,
-                                        character_color="dim",
-                                        dim_text=True,
-                                    )
-                                elif action == "push_branch" or action == "checkout_branch":
-                                    self.status.log_message(
-                                        event.get("message"), character=character, dim_text=True
-                                    )
-                                else:
-                                    self.status.log_message(
-                                        event.get("message"), character=character
-                                    )
-                            if str(action).replace("_", "-") == "push-branch":
-                                # The agent created a new branch, let's save it to the task object
-                                self.task.branch = target.strip()
-            except websockets.exceptions.ConnectionClosedError as e:
-                if e.code == CloseCode.ABNORMAL_CLOSURE:
-                    retry_count += 1
-                    self.status.warning("Connection was interrupted, reconnecting...")
-                else:
-                    self.status.warning(
-                        f"Unexpected Connection Error: {str(e.code)} - "
-                        f"{str(e)}. Retry {retry_count} of {max_retries}."
+        async def on_message(json_message):
+            return await self.handle_message(
+                json_message, output_file, log_messages, code, print_result
+            )
+
+        if await hub.stream(task_id, on_message, on_warning=self.status.warning):
+            return self.task.result
+        return None
+
+    async def handle_message(
+        self, json_message, output_file=None, log_messages=True, code=False, print_result=True
+    ) -> bool:
+        """
+        Process a single message of the task event stream.
+        :param json_message: The decoded websocket message.
+        :param output_file: Optional file to save the result.
+        :param log_messages: Print status messages.
+        :param code: If True, the result will be treated as code
+        :param print_result: If True, the result will be printed on the command line.
+        :return: True if the task is completed.
+        """
+        msg_type = json_message.get("type")
+        if msg_type == MSG_TITLE_UPDATE:
+            title = json_message.get("data")
+            self.task.title = title
+            self.status.update_spinner_message(title)
+        if msg_type == MSG_STATUS_UPDATE:
+            new_status = json_message.get("data").get("status")
+            message = json_message.get("data").get("message", "")
+            self.task.result = message
+            if new_status == STATUS_COMPLETED:
+                self.output_result(message, output_file, code, print_result)
+                return True
+            elif new_status == STATUS_FAILED:
+                self.status.fail()
+                raise click.ClickException(f"Task failed: {self.task.result}")
+        if msg_type == MSG_EVENT:
+            event = json_message.get("data")
+            action = event.get("action")
+            target = event.get("target")
+            if action not in IGNORED_EVENT_ACTIONS and log_messages:
+                character = self.action_character_map.get(action, "✔")
+                if action == "invoke_skill":
+                    self.status.log_message(
+                        self.labeled(event.get("message")),
+                        character=character,
+                        character_color="dim",
+                    )
+                    self.status.indent = 2
+                elif action == "finish_skill":
+                    self.status.indent = 0
+                    self.status.log_message(
+                        self.labeled("Skill finished"),
+                        character=character,
+                        character_color="dim",
+                        dim_text=True,
+                    )
+                elif action == "push_branch" or action == "checkout_branch":
+                    self.status.log_message(
+                        self.labeled(event.get("message")), character=character, dim_text=True
                     )
-                    await asyncio.sleep(1)
+                else:
+                    self.status.log_message(self.labeled(event.get("message")), character=character)
+            if str(action).replace("_", "-") == "push-branch":
+                # The agent created a new branch, let's save it to the task object
+                self.task.branch = target.strip()
+        return False
+
+    def labeled(self, message):
+        """Prefix a log message with the handler's label, if any."""
+        if self.label:
+            return f"`{self.label}` {message}"
+        return message
+
+    @traced("render result")
+    def output_result(self, message, output_file=None, code=False, print_result=True):
+        """Write the result of the task to a file or print it.
+        :param message: The result of the task
+        :param output_file: Optional file to save the result.
+        :param code: If True, the result will be treated as code
+        :param print_result: If True, the result will be printed on the command line.
+        """
+        self.status.hide()
+        if output_file:
+            self.write_result_to_file(code, message, output_file)
+        elif print_result:
+            if self.label and self.plain:
+                render_markdown(self.console, f"# {self.label} {self.task.title}\n", plain=True)
+            elif self.label:
+                self.console.print(f"[bold]{self.label}[/bold] {self.task.title}")
+            render_markdown(self.console, message, plain=self.plain)
+        self.status.show()
 
-    async def write_result_to_file(self, code, message, output_file):
+    def write_result_to_file(self, code, message, output_file):
         """Write the result to a file.
         :param code: If True, the result will be treated as code
         :param message: The message to write to the file
@@ -154,6 +190,6 @@ class TaskHandler:
         :param code: If True, the result will be treated as code
         :param print_result: If True, the result will be printed on the command line.
         """
-        asyncio.run(
+        return asyncio.run(
             self.stream_task_events(self.task.id, output_file, log_messages, code, print_result)
         )
@@ -1,27 +1,33 @@
+import asyncio
 import os
+import sqlite3
 from pathlib import Path
 from typing import Optional
 
 import click
 from arcane import Task, ApiException
-from arcane.engine import ArcaneEngine
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.padding import Padding
 
+from cli.api_client import PilotEngine
 from cli.constants import CODE_PRIMER, CHEAP_MODEL, CODE_MODEL, CONFIG_LOCATION
 from cli.detect_repository import detect_repository
+from cli.history_store import HistoryStore
 from cli.models import TaskParameters
+from cli.profiling import span, traced
 from cli.prompt_template import PromptTemplate
+from cli.result_cache import ResultCache
 from cli.status_indicator import StatusIndicator
+from cli.task_event_hub import TaskEventHub
 from cli.task_handler import TaskHandler
 from cli.user_config import UserConfig
-from cli.util import pull_branch_changes
+from cli.util import pull_branch_changes_async
 
 
 class TaskRunner:
     def __init__(self, status_indicator: StatusIndicator):
-        self.config = UserConfig()
+        self.config = UserConfig.shared()
         self.status_indicator = status_indicator
 
     def take_screenshot(self):
@@ -29,15 +35,64 @@ class TaskRunner:
         os.system(screenshot_command)
         return Path("/tmp/screenshot.png")
 
+    @staticmethod
+    def apply_task_options(params: TaskParameters) -> None:
+        """Adjust prompt and model of a task according to its --code, --cheap and PR options."""
+        if params.pr_number:
+            params.prompt = (
+                f"We are working on PR #{params.pr_number}. "
+                "Read the PR first before doing anything else.\n\n---\n\n" + params.prompt
+            )
+
+        if params.cheap:
+            params.model = CHEAP_MODEL
+        if params.code:
+            params.prompt += "\n\n" + CODE_PRIMER
+            if not params.model:
+                params.model = CODE_MODEL
+
+    @staticmethod
+    def record_in_history(task: Task) -> None:
+        """Add a task to the local history, so `pilot history` shows it without syncing."""
+        try:
+            HistoryStore().record(task)
+        except (sqlite3.Error, OSError):
+            # The history is only a local copy, it's synced with the API when it's read
+            pass
+
     def run_task(
         self, params: TaskParameters, print_result=True, print_task_id=True, piped_data=None
     ) -> Optional[Task]:
-
+        """Run a task and wait for its result, see `run_task_async`."""
+        return asyncio.run(self.run_task_async(params, print_result, print_task_id, piped_data))
+
+    @traced("TaskRunner.run_task")
+    async def run_task_async(
+        self,
+        params: TaskParameters,
+        print_result=True,
+        print_task_id=True,
+        piped_data=None,
+        hub: TaskEventHub = None,
+    ) -> Optional[Task]:
+        """Run a task without blocking the event loop.
+
+        Screenshots, template rendering and API requests run in worker threads, the local
+        repository is synced with git subprocesses. Several tasks can run in one event loop.
+
+        :param params: Parameters of the task.
+        :param print_result: Print the result on the command line.
+        :param print_task_id: Print the ID of the new task if status messages are hidden.
+        :param piped_data: Data to prepend to the prompt as a code block.
+        :param hub: Event hub to follow the task with, to share connection slots.
+        :return: The finished task, the created task if not waiting, or None.
+        """
         console = Console()
-        screenshot = self.take_screenshot() if params.snap else None
+        screenshot = await asyncio.to_thread(self.take_screenshot) if params.snap else None
 
         if not params.repo:
-            params.repo = detect_repository()
+            with span("detect repository"):
+                params.repo = detect_repository()
         if not params.repo:
             params.repo = self.config.get("default_repo")
         if not params.repo:
@@ -46,27 +101,23 @@ class TaskRunner:
                 f"Use --repo or set 'default_repo' in {CONFIG_LOCATION}."
             )
             return None
+        result_cache = ResultCache() if params.cache else None
         if params.file:
-            renderer = PromptTemplate(params.file, params.repo, params.model, self.status_indicator)
-            params.prompt = renderer.render()
+            renderer = PromptTemplate(
+                params.file,
+                params.repo,
+                params.model,
+                self.status_indicator,
+                result_cache=result_cache,
+            )
+            params.prompt = await asyncio.to_thread(renderer.render)
         if not params.prompt:
             params.prompt = click.edit("", extension=".md")
             if not params.prompt:
                 console.print("No prompt provided.")
                 return None
 
-        if params.pr_number:
-            params.prompt = (
-                f"We are working on PR #{params.pr_number}. "
-                "Read the PR first before doing anything else.\n\n---\n\n" + params.prompt
-            )
-
-        if params.cheap:
-            params.model = CHEAP_MODEL
-        if params.code:
-            params.prompt += "\n\n" + CODE_PRIMER
-            if not params.model:
-                params.model = CODE_MODEL
+        self.apply_task_options(params)
 
         if params.direct:
             if params.output:
@@ -84,6 +135,23 @@ class TaskRunner:
         if piped_data:
             params.prompt = f"```\n{piped_data}\n```\n\n" + params.prompt
 
+        cache_key = None
+        if result_cache and params.wait and not params.pr_number and not screenshot:
+            cache_key = ResultCache.task_key(
+                params.prompt, params.repo, params.branch, params.model, params.code
+            )
+        if cache_key:
+            cached_task = result_cache.get(cache_key)
+            if cached_task:
+                task = Task.model_validate_json(cached_task)
+                self.status_indicator.start()
+                self.status_indicator.log_message(f"Use cached result of task `{task.id}`")
+                TaskHandler(
+                    task, self.status_indicator, plain=params.markdown or None
+                ).output_result(task.result, params.output, params.code, print_result)
+                self.status_indicator.stop()
+                return task
+
         branch_str = f" on branch [code]{params.branch}[/code]" if params.branch else ""
         pr_link = (
             (
@@ -94,16 +162,18 @@ class TaskRunner:
             else ""
         )
         try:
-            engine = ArcaneEngine()
-            task = engine.create_task(
-                params.repo,
-                params.prompt,
-                log=False,
-                gpt_model=params.model,
-                image=screenshot,
-                branch=params.branch,
-                pr_number=params.pr_number,
-            )
+            engine = PilotEngine()
+            with span("create task"):
+                task = await asyncio.to_thread(
+                    engine.create_task,
+                    params.repo,
+                    params.prompt,
+                    log=False,
+                    gpt_model=params.model,
+                    image=screenshot,
+                    branch=params.branch,
+                    pr_number=params.pr_number,
+                )
         except ApiException as e:
             if e.data:
                 console.print(e.data)
@@ -112,6 +182,7 @@ class TaskRunner:
             else:
                 console.print(f"An error occurred: {e}")
             raise click.Abort()
+        await asyncio.to_thread(self.record_in_history, task)
 
         if not params.verbose:
             # Status messages are only visible in verbose mode, so let's print the new task ID
@@ -129,12 +200,20 @@ class TaskRunner:
             console.print(task)
         task_handler = None
         if params.wait:
-            task_handler = TaskHandler(task, self.status_indicator)
-            task_handler.wait_for_result(
-                params.output, params.verbose, code=params.code, print_result=print_result
+            task_handler = TaskHandler(task, self.status_indicator, plain=params.markdown or None)
+            await task_handler.stream_task_events(
+                task.id,
+                params.output,
+                params.verbose,
+                code=params.code,
+                print_result=print_result,
+                hub=hub,
             )
+            await asyncio.to_thread(self.record_in_history, task_handler.task)
+            if cache_key and task_handler.task.result is not None:
+                result_cache.put(cache_key, task_handler.task.model_dump_json())
             if params.sync and task_handler.task.branch:
-                pull_branch_changes(
+                await pull_branch_changes_async(
                     self.status_indicator, console, task_handler.task.branch, params.debug
                 )
 
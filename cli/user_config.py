@@ -9,13 +9,21 @@ import yaml
 from rich.console import Console
 from rich.prompt import Confirm
 
-from cli.constants import CONFIG_LOCATION, CONFIG_API_KEY
-from cli.util import get_api_host
+from cli.constants import CONFIG_LOCATION, CONFIG_API_KEY, CACHE_DIR
+from cli.util import get_api_host, file_signature, read_json_cache, write_json_cache
 
 PORT = 8043
 API_KEY_PARAM = "key"
+# Opt-in JSON side-cache of the parsed config file, see UserConfig.read_config_file
+CONFIG_CACHE_ENV_VAR = "PR_PILOT_CONFIG_CACHE"
+CONFIG_CACHE_LOCATION = os.path.join(CACHE_DIR, "config.json")
+# Use the libyaml C loader when PyYAML was built with it
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 console = Console()
 
+# Process-wide config objects, keyed by config file location
+_shared_configs = {}
+
 
 class AuthHandler(BaseHTTPRequestHandler):
 
@@ -51,14 +59,28 @@ class UserConfig:
     def __init__(self, config_location: str = CONFIG_LOCATION):
         self.config_location = config_location
         self.config = {}
+        self.signature = None
         self.load_config()
 
+    @classmethod
+    def shared(cls, config_location: str = None) -> "UserConfig":
+        """Return the process-wide config object for the given location.
+
+        The config file is only parsed again if its modification time or size changed.
+        """
+        config_location = config_location or CONFIG_LOCATION
+        user_config = _shared_configs.get(config_location)
+        if user_config is None:
+            user_config = cls(config_location)
+            _shared_configs[config_location] = user_config
+        elif user_config.signature != file_signature(config_location):
+            user_config.load_config()
+        return user_config
+
     def set(self, key, value):
         """Set a value in the configuration file."""
         self.config[key] = value
-
-        with open(self.config_location, "w") as f:
-            f.write(yaml.dump(self.config))
+        self.save_config()
         console.print(
             f"Set [code]{key}[/code] to [code]{value}[/code] in [code]{CONFIG_LOCATION}[/code]"
         )
@@ -66,13 +88,42 @@ class UserConfig:
     def get(self, param):
         return self.config.get(param)
 
+    def save_config(self):
+        """Write the configuration to the config file."""
+        with open(self.config_location, "w") as f:
+            f.write(yaml.dump(self.config))
+        self.signature = file_signature(self.config_location)
+
+    def read_config_file(self, signature) -> dict:
+        """Parse the config file.
+
+        If PR_PILOT_CONFIG_CACHE is set, the parsed content is also stored as JSON in
+        ~/.cache/pr-pilot/config.json and read from there while the config file is unchanged.
+        """
+        use_cache = bool(os.getenv(CONFIG_CACHE_ENV_VAR))
+        if use_cache:
+            config = read_json_cache(CONFIG_CACHE_LOCATION, self.config_location, signature)
+            if config is not None:
+                return config
+
+        with open(self.config_location) as f:
+            config = yaml.load(f, Loader=YamlLoader) or {}
+
+        if use_cache:
+            # The config contains the API key, so keep the cache private
+            write_json_cache(
+                CONFIG_CACHE_LOCATION, self.config_location, signature, config, private=True
+            )
+        return config
+
     def load_config(self):
         """Load the configuration from the default location. If it doesn't exist,
         run through the auth process and save config."""
-        if os.path.exists(self.config_location):
+        signature = file_signature(self.config_location)
+        if signature is not None:
             # Config file exists, load it
-            with open(self.config_location) as f:
-                self.config = yaml.safe_load(f)
+            self.config = self.read_config_file(signature)
+            self.signature = signature
             if os.getenv("PR_PILOT_API_KEY"):
                 # Override the config file with the environment variable
                 self.config[CONFIG_API_KEY] = os.getenv("PR_PILOT_API_KEY")
@@ -86,8 +137,7 @@ class UserConfig:
             )
             self.config = {CONFIG_API_KEY: self.authenticate()}
             self.collect_user_preferences()
-            with open(self.config_location, "w") as f:
-                f.write(yaml.dump(self.config))
+            self.save_config()
         else:
             console.print("[dim]Using API key from environment variable PR_PILOT_API_KEY[/dim]")
             self.config = {CONFIG_API_KEY: os.getenv("PR_PILOT_API_KEY")}
@@ -119,6 +169,10 @@ class UserConfig:
     def auto_sync_enabled(self):
         return self.config.get("auto_sync", False)
 
+    @property
+    def result_cache_enabled(self):
+        return self.config.get("result_cache", False)
+
     @property
     def verbose(self):
         return self.config.get("verbose", False)
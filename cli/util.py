@@ -1,13 +1,23 @@
-import functools
+import hashlib
+import json
 import os
 import subprocess
+import sys
+import weakref
 from datetime import datetime, timezone
+from typing import TYPE_CHECKING
 
-import humanize
-from arcane import Task
-from rich import box
-from rich.markdown import Markdown
-from rich.panel import Panel
+from cli.git_context import GitContext
+from cli.profiling import traced
+
+# Results with at least this many lines are rendered block by block
+PROGRESSIVE_RENDER_MIN_LINES = 200
+WRITE_CHUNK_SIZE = 64 * 1024
+
+if TYPE_CHECKING:
+    # Only needed for type hints; importing arcane is slow and this module is on the
+    # startup path of every `pilot` invocation.
+    from arcane import Task
 
 
 def clean_code_block_with_language_specifier(response):
@@ -34,6 +44,73 @@ def clean_code_block_with_language_specifier(response):
     return clean_response
 
 
+# Git commands changing the working tree of the same event loop must not interleave.
+# asyncio is imported where it is used, it is not needed to parse the command line.
+_git_sync_locks = weakref.WeakKeyDictionary()
+
+
+async def run_git_async(*args) -> subprocess.CompletedProcess:
+    """Run a git command as a subprocess without blocking the event loop."""
+    import asyncio
+
+    process = await asyncio.create_subprocess_exec(
+        "git", *args, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    return subprocess.CompletedProcess(
+        ["git", *args],
+        process.returncode,
+        stdout.decode(errors="replace"),
+        stderr.decode(errors="replace"),
+    )
+
+
+@traced("pull_branch_changes")
+async def pull_branch_changes_async(status_indicator, console, branch, debug=False):
+    """
+    Pull the latest changes from the specified branch, without blocking the event loop.
+
+    Args:
+        status_indicator: The status indicator object.
+        console: The console object for printing messages.
+        branch (str): The branch to pull changes from.
+        debug (bool, optional): If True, print debug information. Defaults to False.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    lock = _git_sync_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        status_indicator.start()
+        status_indicator.update_spinner_message(f"Pulling changes from branch: {branch}")
+        error = ""
+        try:
+            # Fetch origin and checkout branch
+            await run_git_async("fetch", "origin")
+            await run_git_async("checkout", branch)
+            # Capture output of git pull
+            result = await run_git_async("pull", "origin", branch)
+            # Branch and refs changed
+            GitContext.invalidate()
+            output = result.stdout
+            error = result.stderr
+            if debug:
+                console.line()
+                console.print(output)
+                console.line()
+            status_indicator.update_spinner_message("")
+            status_indicator.log_message(
+                f"Pull latest changes from `{branch}`", dim_text=True, character="↻"
+            )
+        except Exception as e:
+            status_indicator.fail()
+            console.print(
+                "[bold red]An error occurred:" f"[/bold red] {type(e)} {str(e)}\n\n{error}"
+            )
+        finally:
+            status_indicator.stop()
+
+
 def pull_branch_changes(status_indicator, console, branch, debug=False):
     """
     Pull the latest changes from the specified branch.
@@ -44,31 +121,9 @@ def pull_branch_changes(status_indicator, console, branch, debug=False):
         branch (str): The branch to pull changes from.
         debug (bool, optional): If True, print debug information. Defaults to False.
     """
-    status_indicator.start()
-    status_indicator.update_spinner_message(f"Pulling changes from branch: {branch}")
-    error = ""
-    try:
-        # Fetch origin and checkout branch
-        subprocess_params = dict(stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        subprocess.run(["git", "fetch", "origin"], **subprocess_params)
-        subprocess.run(["git", "checkout", branch], **subprocess_params)
-        # Capture output of git pull
-        result = subprocess.run(["git", "pull", "origin", branch], **subprocess_params)
-        output = result.stdout
-        error = result.stderr
-        if debug:
-            console.line()
-            console.print(output)
-            console.line()
-        status_indicator.update_spinner_message("")
-        status_indicator.log_message(
-            f"Pull latest changes from `{branch}`", dim_text=True, character="↻"
-        )
-    except Exception as e:
-        status_indicator.fail()
-        console.print("[bold red]An error occurred:" f"[/bold red] {type(e)} {str(e)}\n\n{error}")
-    finally:
-        status_indicator.stop()
+    import asyncio
+
+    asyncio.run(pull_branch_changes_async(status_indicator, console, branch, debug))
 
 
 class TaskFormatter:
@@ -79,7 +134,7 @@ class TaskFormatter:
         task (Task): The task object to format.
     """
 
-    def __init__(self, task: Task):
+    def __init__(self, task: "Task"):
         """
         Initialize the TaskFormatter with a task.
 
@@ -106,6 +161,8 @@ class TaskFormatter:
         Returns:
             str: The formatted creation time.
         """
+        import humanize
+
         # If task was created less than 23 hours ago, show relative time
         now = datetime.now(timezone.utc)  # Use timezone-aware datetime
         if (now - self.task.created).days == 0:
@@ -159,6 +216,8 @@ class TaskFormatter:
         Returns:
             str: The formatted branch name.
         """
+        from rich.markdown import Markdown
+
         return Markdown(f"`{self.task.branch}`")
 
 
@@ -169,7 +228,7 @@ def get_current_branch():
     Returns:
         str: The name of the current branch.
     """
-    return os.popen("git rev-parse --abbrev-ref HEAD").read().strip()
+    return GitContext.current().branch or ""
 
 
 def is_branch_pushed(branch):
@@ -182,7 +241,7 @@ def is_branch_pushed(branch):
     Returns:
         bool: True if the branch is pushed, False otherwise.
     """
-    return os.popen(f"git branch -r --list origin/{branch}").read().strip() != ""
+    return GitContext.current().is_branch_pushed(branch)
 
 
 def get_branch_if_pushed():
@@ -210,6 +269,10 @@ def markdown_panel(title, content, hide_frame=False):
     Returns:
         Panel: The created Rich panel.
     """
+    from rich import box
+    from rich.markdown import Markdown
+    from rich.panel import Panel
+
     # Calculate width based on the text content
     max_line_length = max(len(line) for line in content.split("\n"))
     padding = 4  # Adjust padding as necessary
@@ -219,7 +282,72 @@ def markdown_panel(title, content, hide_frame=False):
     )
 
 
-@functools.lru_cache()
+def markdown_blocks(content):
+    """
+    Split markdown into blocks that can be rendered independently.
+
+    Blocks are separated by blank lines. Fenced code blocks are never split.
+
+    Args:
+        content (str): The markdown content.
+
+    Yields:
+        str: The markdown blocks, in order.
+    """
+    block = []
+    fence = None
+    for line in content.splitlines():
+        stripped = line.lstrip()
+        if fence:
+            block.append(line)
+            if stripped.startswith(fence):
+                fence = None
+        elif stripped.startswith(("```", "~~~")):
+            fence = stripped[:3]
+            block.append(line)
+        elif not stripped:
+            if block:
+                yield "\n".join(block)
+                block = []
+        else:
+            block.append(line)
+    if block:
+        yield "\n".join(block)
+
+
+def render_markdown(console, content, plain=False):
+    """
+    Print a (potentially very long) markdown result.
+
+    Short content is rendered as one panel. Long content is rendered block by block, so output
+    starts right away and no rich tree of the whole document is built. In plain mode, the
+    content is written to stdout as is, without rich.
+
+    Args:
+        console: The console object for printing messages.
+        content (str): The markdown content to display.
+        plain (bool, optional): If True, write the raw markdown to stdout. Defaults to False.
+    """
+    if plain:
+        for start in range(0, len(content), WRITE_CHUNK_SIZE):
+            end = start + WRITE_CHUNK_SIZE
+            sys.stdout.write(content[start:end])
+        if not content.endswith("\n"):
+            sys.stdout.write("\n")
+        sys.stdout.flush()
+        return
+
+    if content.count("\n") < PROGRESSIVE_RENDER_MIN_LINES:
+        console.print(markdown_panel(None, content, hide_frame=True))
+        return
+
+    from rich.markdown import Markdown
+    from rich.padding import Padding
+
+    for block in markdown_blocks(content):
+        console.print(Padding(Markdown(block), (0, 1, 1, 1)))
+
+
 def is_git_repo():
     """
     Check if the current directory is part of a Git repository.
@@ -227,19 +355,9 @@ def is_git_repo():
     Returns:
         bool: True if the current directory is part of a Git repository, False otherwise.
     """
-    try:
-        subprocess.run(
-            ["git", "rev-parse", "--is-inside-work-tree"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        return True
-    except subprocess.CalledProcessError:
-        return False
+    return GitContext.current().is_repo
 
 
-@functools.lru_cache()
 def get_git_root():
     """
     Get the root directory of the current Git repository.
@@ -247,16 +365,106 @@ def get_git_root():
     Returns:
         str or None: The root directory of the Git repository, or None if not in a Git repository.
     """
+    return GitContext.current().root
+
+
+def file_signature(path):
+    """
+    Get the modification time and size of a file, to detect changes cheaply.
+
+    Returns:
+        tuple or None: (mtime in nanoseconds, size), or None if the file does not exist.
+    """
     try:
-        result = subprocess.run(
-            ["git", "rev-parse", "--show-toplevel"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        return result.stdout.decode("utf-8").strip()
-    except subprocess.CalledProcessError:
+        stat = os.stat(path)
+    except FileNotFoundError:
         return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def json_cache_path(cache_dir, source_path):
+    """
+    Get the location of the JSON cache of a source file in a cache directory.
+    """
+    path_hash = hashlib.sha256(os.path.abspath(source_path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{path_hash[:16]}.json")
+
+
+def read_json_cache(cache_path, source_path, signature):
+    """
+    Read data cached by `write_json_cache` for a source file.
+
+    Returns:
+        The cached data, or None if the cache is missing, corrupt or the source file changed.
+    """
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached["source"] == os.path.abspath(source_path) and cached["signature"] == list(
+            signature
+        ):
+            return cached["data"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def write_json_cache(cache_path, source_path, signature, data, private=False, prune=False):
+    """
+    Atomically store data parsed from a source file as JSON. Caches are optional, so
+    errors are ignored.
+
+    Args:
+        signature: `file_signature` of the source file the data was parsed from.
+        private: Make the cache only readable by the user, e.g. if it contains the API key.
+        prune: When adding a new cache, remove the caches of deleted source files in the
+            same directory, e.g. of temporary checkouts.
+    """
+    cache_dir = os.path.dirname(cache_path)
+    if prune and not os.path.exists(cache_path):
+        prune_json_caches(cache_dir)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    cached = {
+        "source": os.path.abspath(source_path),
+        "signature": list(signature),
+        "data": data,
+    }
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600 if private else 0o666)
+        with os.fdopen(fd, "w") as f:
+            json.dump(cached, f, default=str)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def prune_json_caches(cache_dir):
+    """
+    Remove the JSON caches in a directory whose source file no longer exists.
+    """
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        cache_path = os.path.join(cache_dir, name)
+        try:
+            with open(cache_path) as f:
+                if os.path.exists(json.load(f)["source"]):
+                    continue
+        except (OSError, ValueError, KeyError, TypeError):
+            # Corrupt or written by an older version, it's recreated when needed
+            pass
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
 
 
 def get_api_host():
@@ -11,9 +11,23 @@ def mock_default_config_location(tmp_path):
         yield path
 
 
+@pytest.fixture(autouse=True)
+def mock_history_location(tmp_path):
+    with patch("cli.history_store.HISTORY_DIR", str(tmp_path / "history")):
+        yield tmp_path / "history"
+
+
+@pytest.fixture(autouse=True)
+def mock_jinja_cache_dir(tmp_path):
+    with patch("cli.prompt_template.JINJA_CACHE_DIR", str(tmp_path / "jinja")), patch(
+        "cli.prompt_template._environments", {}
+    ):
+        yield tmp_path / "jinja"
+
+
 @pytest.fixture(autouse=True)
 def mock_engine():
-    with patch("cli.task_runner.ArcaneEngine") as mock:
+    with patch("cli.task_runner.PilotEngine") as mock:
         mock.return_value = MagicMock()
         yield mock.return_value
 
@@ -23,8 +37,10 @@ def mock_user_config(mock_default_config_location):
     mock_instance = MagicMock(authenticate=MagicMock())
     mock_instance.verbose = False
     mock_instance.auto_sync_enabled = False
+    mock_instance.result_cache_enabled = False
     mock_instance.api_key = "test_api_key"
     mock_class = MagicMock(return_value=mock_instance)
+    mock_class.shared.return_value = mock_instance
     with patch("cli.task_runner.UserConfig", mock_class):
         with patch("cli.cli.UserConfig", mock_class):
             yield mock_class
@@ -32,7 +48,7 @@ def mock_user_config(mock_default_config_location):
 
 @pytest.fixture(autouse=True)
 def mock_engine_in_history_command():
-    with patch("cli.commands.history.ArcaneEngine") as mock:
+    with patch("cli.commands.history.PilotEngine") as mock:
         mock.return_value = MagicMock()
         yield mock.return_value
 
@@ -41,3 +57,10 @@ def mock_engine_in_history_command():
 def mock_console():
     with patch("cli.task_handler.Console") as mock:
         yield mock
+
+
+@pytest.fixture(autouse=True)
+def mock_engine_in_watch_command():
+    with patch("cli.commands.watch.PilotEngine") as mock:
+        mock.return_value = MagicMock()
+        yield mock.return_value
@@ -0,0 +1,78 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from cli import api_client
+from cli.api_client import ConnectionStats, PilotEngine
+
+TASK = {
+    "id": "c3b1f2e4-1b2a-4c5d-8e6f-7a8b9c0d1e2f",
+    "title": "Test task",
+    "status": "completed",
+    "result": "Done",
+    "github_project": "owner/repo",
+    "github_user": "user",
+    "created": "2024-01-01T00:00:00Z",
+    "branch": "main",
+}
+
+
+class TaskHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = json.dumps(TASK).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def api_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TaskHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def shared_client(api_server, monkeypatch):
+    monkeypatch.setenv("PR_PILOT_API_KEY", "test_api_key")
+    with patch("arcane.util.PR_PILOT_HOST", api_server), patch.object(
+        api_client, "_client", None
+    ), patch.object(api_client, "stats", ConnectionStats()):
+        yield
+
+
+def test_engines_share_one_client_and_connection(shared_client):
+    for _ in range(3):
+        task = PilotEngine().get_task(TASK["id"])
+        assert task.result == "Done"
+    assert api_client.stats.requests == 3
+    assert api_client.stats.connections == 1
+    assert api_client.stats.reused_connections == 2
+    assert "3 requests, 2 on reused connections" in api_client.stats.summary()
+
+
+def test_client_is_created_once(shared_client):
+    assert api_client.get_api_client() is api_client.get_api_client()
+
+
+def test_engine_reuses_the_shared_client_configuration(shared_client):
+    client = api_client.get_api_client()
+    with patch("arcane.engine._get_config_from_env") as get_config:
+        engine = PilotEngine()
+    get_config.assert_not_called()
+    assert engine.config is client.configuration
+    assert engine.get_task(TASK["id"]).result == "Done"
+    assert api_client.stats.requests == 1
@@ -0,0 +1,118 @@
+import json
+import time
+import uuid
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import pytest
+from arcane import ApiException, Task
+from click.testing import CliRunner
+
+from cli.batch_runner import BatchRunner, load_batch
+from cli.cli import main
+
+
+def make_task(title="Test task"):
+    return Task(
+        id=str(uuid.uuid4()),
+        title=title,
+        status="running",
+        github_project="owner/repo",
+        github_user="user",
+        created="2024-01-01T00:00:00Z",
+        branch="main",
+    )
+
+
+def write_batch(path, lines):
+    path.write_text("\n".join(json.dumps(line) for line in lines) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def runner():
+    runner = BatchRunner(MagicMock(), max_parallel=4, wait=False, api_client=MagicMock())
+    runner.creation_api = MagicMock()
+    runner.creation_api.tasks_create.side_effect = lambda prompt: make_task(prompt.prompt)
+    return runner
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay():
+    with patch("cli.batch_runner.RETRY_DELAY", 0):
+        yield
+
+
+def test_load_batch_applies_defaults_and_keeps_invalid_lines(tmp_path):
+    path = tmp_path / "batch.jsonl"
+    path.write_text('{"prompt": "a"}\n\n{"prompt": "b", "repo": "owner/other"}\nnot json\n')
+    items = load_batch(str(path), {"repo": "owner/repo", "model": None})
+    assert [line_number for line_number, _ in items] == [1, 3, 4]
+    assert items[0][1].repo == "owner/repo"
+    assert items[1][1].repo == "owner/other"
+    assert isinstance(items[2][1], ValueError)
+
+
+def test_results_are_written_in_input_order(runner, tmp_path):
+    def create_task(prompt):
+        # Later tasks are created faster than earlier ones
+        time.sleep(0.05 * (5 - int(prompt.prompt)))
+        return make_task(prompt.prompt)
+
+    runner.creation_api.tasks_create.side_effect = create_task
+    items = load_batch(
+        write_batch(tmp_path / "batch.jsonl", [{"prompt": str(i), "repo": "a/b"} for i in range(5)])
+    )
+    output = tmp_path / "results.jsonl"
+    runner.run(items, str(output))
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [record["title"] for record in records] == ["0", "1", "2", "3", "4"]
+    assert all(record["status"] == "created" for record in records)
+
+
+def test_failures_do_not_abort_batch(runner, tmp_path):
+    def create_task(prompt):
+        if prompt.prompt == "bad":
+            raise ApiException(status=400, reason="Bad Request")
+        return make_task(prompt.prompt)
+
+    runner.creation_api.tasks_create.side_effect = create_task
+    path = tmp_path / "batch.jsonl"
+    path.write_text('{"prompt": "good", "repo": "a/b"}\n{"prompt": "bad", "repo": "a/b"}\n[]\n')
+    records = runner.run(load_batch(str(path)), str(tmp_path / "results.jsonl"))
+
+    assert [record["status"] for record in records] == ["created", "failed", "failed"]
+    assert runner.creation_api.tasks_create.call_count == 2
+
+
+def test_transient_errors_are_retried(runner, tmp_path):
+    runner.creation_api.tasks_create.side_effect = [
+        ApiException(status=503, reason="Service Unavailable"),
+        make_task("ok"),
+    ]
+    items = load_batch(write_batch(tmp_path / "batch.jsonl", [{"prompt": "x", "repo": "a/b"}]))
+    records = runner.run(items, str(tmp_path / "results.jsonl"))
+    assert records[0]["status"] == "created"
+    assert runner.creation_api.tasks_create.call_count == 2
+
+
+def test_waits_for_results(runner, tmp_path):
+    runner.wait = True
+    with patch("cli.batch_runner.TaskHandler") as mock_handler:
+        mock_handler.return_value.stream_task_events = AsyncMock(return_value="Done")
+        mock_handler.return_value.task.title = "Title"
+        items = load_batch(write_batch(tmp_path / "batch.jsonl", [{"prompt": "x", "repo": "a/b"}]))
+        records = runner.run(items, str(tmp_path / "results.jsonl"))
+    assert records[0]["status"] == "completed"
+    assert records[0]["result"] == "Done"
+
+
+def test_batch_command_reports_failures(tmp_path):
+    path = write_batch(tmp_path / "batch.jsonl", [{"prompt": "x", "repo": "a/b"}, {"snap": True}])
+    with patch("cli.batch_runner.get_api_client"), patch("cli.batch_runner.arcane") as mock_arcane:
+        mock_arcane.TaskCreationApi.return_value.tasks_create.return_value = make_task()
+        result = CliRunner().invoke(main, ["--no-wait", "batch", path])
+    assert result.exit_code == 1
+    assert "1 of 2 tasks failed" in result.output
+    records = (tmp_path / "batch.results.jsonl").read_text().splitlines()
+    assert len(records) == 2
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from cli.chat_history import ChatHistory, ChatMessage, SUMMARY_LABEL
+
+
+def messages(count):
+    return [
+        ChatMessage(role="user" if i % 2 == 0 else "assistant", content=f"Message {i}")
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def history_file(tmp_path):
+    return str(tmp_path / "chat.jsonl")
+
+
+def test_messages_are_appended_to_the_file(history_file):
+    history = ChatHistory(file=history_file)
+    history.load()
+    for message in messages(3):
+        history.append(message)
+    with open(history_file) as f:
+        lines = f.read().splitlines()
+    assert [json.loads(line)["content"] for line in lines] == [
+        "Message 0",
+        "Message 1",
+        "Message 2",
+    ]
+
+    resumed = ChatHistory(file=history_file)
+    resumed.load()
+    assert resumed.messages == history.messages
+
+
+def test_load_converts_json_list_files(history_file):
+    with open(history_file, "w") as f:
+        json.dump([msg.model_dump() for msg in messages(2)], f)
+    history = ChatHistory(file=history_file)
+    history.load()
+    assert len(history.messages) == 2
+    history.append(ChatMessage(role="user", content="New"))
+    with open(history_file) as f:
+        assert len(f.read().splitlines()) == 3
+
+
+def test_load_skips_partially_written_lines(history_file):
+    with open(history_file, "w") as f:
+        f.write(messages(1)[0].model_dump_json() + '\n{"role": "us')
+    history = ChatHistory(file=history_file)
+    history.load()
+    assert len(history.messages) == 1
+
+
+def test_prompt_contains_only_the_window():
+    history = ChatHistory(messages=messages(10), window=4)
+    prompt = history.to_prompt()
+    assert "Message 5" not in prompt
+    assert all(f"Message {i}" in prompt for i in range(6, 10))
+
+
+def test_prompt_respects_budget():
+    history = ChatHistory(messages=messages(10), max_chars=200)
+    prompt = history.to_prompt()
+    assert len(prompt) <= 200
+    assert "Message 9" in prompt
+
+
+def test_compact_summarizes_older_messages_once(history_file):
+    summarized = []
+
+    def summarizer(text, max_chars):
+        summarized.append(text)
+        return "Summary"
+
+    history = ChatHistory(file=history_file, window=4, summarizer=summarizer)
+    history.load()
+    for message in messages(5):
+        history.append(message)
+    assert history.compact() is True
+    assert history.compact() is False
+    assert len(summarized) == 1
+    assert "Message 2" in summarized[0] and "Message 3" not in summarized[0]
+
+    prompt = history.to_prompt()
+    assert SUMMARY_LABEL + "Summary" in prompt
+    assert "Message 2" not in prompt and "Message 3" in prompt
+
+    # The summary is reused when the chat is resumed
+    resumed = ChatHistory(file=history_file, window=4)
+    resumed.load()
+    assert resumed.summary.covers == 3
+    assert resumed.to_prompt() == prompt
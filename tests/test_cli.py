@@ -1,11 +1,14 @@
+import asyncio
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 import pytest
 from click.testing import CliRunner
 
 from cli.cli import main
 from cli.constants import CODE_PRIMER
+from cli.models import TaskParameters
+from cli.task_runner import TaskRunner
 
 
 @pytest.fixture
@@ -19,6 +22,7 @@ def mock_task_handler():
         mock.return_value = MagicMock(
             start_streaming=MagicMock(),
             wait_for_result=MagicMock(),
+            stream_task_events=AsyncMock(),
         )
         yield mock
 
@@ -75,12 +79,12 @@ def test_save_command_param_does_not_run_task(
 
 
 @patch("cli.commands.task.get_branch_if_pushed")
-@patch("cli.task_runner.pull_branch_changes")
+@patch("cli.task_runner.pull_branch_changes_async")
 def test_sync_option_syncs_correctly(
     mock_pull_branch_changes,
     mock_get_branch_if_pushed,
     runner,
-        mock_engine,
+    mock_engine,
 ):
     """The --sync option should set the branch to the current branch"""
     mock_get_branch_if_pushed.return_value = "test-value"
@@ -92,15 +96,42 @@ def test_sync_option_syncs_correctly(
 
 
 @patch("cli.commands.task.get_branch_if_pushed")
-@patch("cli.task_runner.pull_branch_changes")
+@patch("cli.task_runner.pull_branch_changes_async")
 def test_sync_option_syncs_only_pushed_branches(
     mock_pull_branch_changes,
     mock_get_branch_if_pushed,
     runner,
-        mock_engine,
+    mock_engine,
 ):
     mock_get_branch_if_pushed.return_value = None
     result = runner.invoke(main, ["--wait", "--sync", "task", "test-prompt"])
     mock_engine.create_task.assert_called_once()
     assert mock_engine.create_task.call_args[1]["branch"] is None
     assert result.exit_code == 0
+
+
+def test_tasks_run_concurrently_in_one_event_loop(mock_engine, mock_task_handler):
+    running = 0
+    max_running = 0
+
+    async def stream_task_events(*args, **kwargs):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+
+    mock_task_handler.return_value.stream_task_events.side_effect = stream_task_events
+    runner = TaskRunner(MagicMock())
+
+    async def run_all():
+        return await asyncio.gather(
+            *[
+                runner.run_task_async(TaskParameters(wait=True, repo="owner/repo", prompt=prompt))
+                for prompt in ["first", "second"]
+            ]
+        )
+
+    asyncio.run(run_all())
+    assert mock_engine.create_task.call_count == 2
+    assert max_running == 2
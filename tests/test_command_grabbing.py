@@ -4,7 +4,6 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from cli.commands.grab import (
-    clone_repository,
     prompt_user_for_commands,
     import_commands,
     copy_file_to_local_directory,
@@ -26,16 +25,6 @@ def mock_command_index():
     return MagicMock()
 
 
-def test_clone_repository(mock_status_indicator):
-    with patch("subprocess.run") as mock_run:
-        clone_repository(mock_status_indicator, "git@github.com:repo.git", "/tmp/dir")
-        mock_run.assert_called_once_with(
-            ["git", "clone", "--depth", "1", "git@github.com:repo.git", "/tmp/dir"],
-            check=True,
-            capture_output=True,
-        )
-
-
 def test_prompt_user_for_commands(mock_command_index):
     mock_command_index.get_commands.return_value = [
         MagicMock(name="cmd1"),
@@ -1,8 +1,18 @@
+from unittest.mock import patch
+
 import pytest
+import yaml
+from cli import command_index as command_index_module
 from cli.command_index import CommandIndex, PilotCommand
 from cli.models import TaskParameters
 
 
+@pytest.fixture(autouse=True)
+def command_cache_dir(tmp_path):
+    with patch("cli.command_index.COMMAND_CACHE_DIR", str(tmp_path / "cache")):
+        yield
+
+
 @pytest.fixture
 def command_index(tmp_path):
     file_path = tmp_path / ".pilot-commands.yaml"
@@ -83,3 +93,93 @@ def test_load_commands_from_file(command_index):
     assert commands[0].name == "test-command"
     assert commands[0].description == "Test command"
     assert commands[0].params.prompt == "test_prompt"
+
+
+def make_command(name):
+    params = TaskParameters(prompt=f"Prompt of {name}", model="test_model")
+    return PilotCommand(name=name, description=f"Command {name}", params=params)
+
+
+def test_transaction_writes_file_once(command_index):
+    with patch("cli.command_index.yaml.dump", wraps=command_index_module.yaml.dump) as dump:
+        with command_index.transaction():
+            for i in range(5):
+                command_index.add_command(make_command(f"command-{i}"))
+            command_index.remove_command("command-0")
+    assert dump.call_count == 1
+    new_index = CommandIndex(file_path=command_index.file_path)
+    assert [cmd.name for cmd in new_index.get_commands()] == [f"command-{i}" for i in range(1, 5)]
+
+
+def test_transaction_discards_changes_on_error(command_index):
+    command_index.add_command(make_command("kept"))
+    with pytest.raises(RuntimeError):
+        with command_index.transaction():
+            command_index.add_command(make_command("discarded"))
+            raise RuntimeError("Import failed")
+    assert command_index.get_command("discarded") is None
+    new_index = CommandIndex(file_path=command_index.file_path)
+    assert [cmd.name for cmd in new_index.get_commands()] == ["kept"]
+
+
+def test_parsed_index_is_cached_until_file_changes(command_index):
+    command_index.add_command(make_command("first"))
+    with patch("cli.command_index.yaml.load") as mock_load:
+        # Cached in this process
+        assert CommandIndex(file_path=command_index.file_path).get_command("first")
+        # Cached as JSON for other processes
+        command_index_module._parsed_indexes.clear()
+        assert CommandIndex(file_path=command_index.file_path).get_command("first")
+    mock_load.assert_not_called()
+
+    with open(command_index.file_path, "a") as f:
+        f.write("# Edited by hand\n")
+    assert CommandIndex(file_path=command_index.file_path).get_command("first")
+
+
+def test_click_commands_are_cached(command_index):
+    command_index.add_command(make_command("first"))
+    click_command = command_index.get_click_command("first")
+    assert click_command.name == "first"
+    assert command_index.get_click_command("first") is click_command
+    assert command_index.get_click_command("unknown") is None
+
+
+def test_caches_of_deleted_command_files_are_pruned(tmp_path):
+    checkout = tmp_path / "checkout"
+    checkout.mkdir()
+    CommandIndex(file_path=str(checkout / ".pilot-commands.yaml")).add_command(make_command("a"))
+    (checkout / ".pilot-commands.yaml").unlink()
+    checkout.rmdir()
+
+    CommandIndex(file_path=str(tmp_path / ".pilot-commands.yaml")).add_command(make_command("b"))
+    assert len(list((tmp_path / "cache").glob("*.json"))) == 1
+
+
+def test_commands_are_not_shared_between_indexes(command_index):
+    command_index.add_command(make_command("first"))
+    other_index = CommandIndex(file_path=command_index.file_path)
+    other_index.get_command("first").params.branch = "feature"
+    assert (
+        CommandIndex(file_path=command_index.file_path).get_command("first").params.branch is None
+    )
+
+
+@patch("cli.command_index.TaskRunner")
+@patch("cli.command_index.get_current_branch", return_value="feature")
+def test_callback_does_not_change_the_command(mock_get_current_branch, mock_runner):
+    command = make_command("first")
+    command.callback(sync=True, model="other_model")
+    params = mock_runner.return_value.run_task.call_args[0][0]
+    assert (params.branch, params.model) == ("feature", "other_model")
+    assert (command.params.branch, command.params.model) == (None, "test_model")
+
+
+def test_duplicate_command_names_in_file_raise(tmp_path):
+    path = tmp_path / ".pilot-commands.yaml"
+    command = {"name": "cmd", "description": "Command", "params": {"prompt": "First"}}
+    path.write_text(yaml.dump({"commands": [command, dict(command, params={"prompt": "Second"})]}))
+    with pytest.raises(ValueError, match="Duplicate command name 'cmd'"):
+        CommandIndex(file_path=str(path))
+    # The file is left as it is
+    assert "First" in path.read_text()
@@ -0,0 +1,57 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.fake_arcane import FakeArcane
+from benchmarks.run import find_regressions
+from cli import api_client
+from cli.api_client import ConnectionStats, PilotEngine
+from cli.task_event_hub import TaskEventHub
+
+
+@pytest.fixture
+def fake_arcane(monkeypatch):
+    with FakeArcane(events_per_task=3, result_size=100) as server:
+        monkeypatch.setenv("PR_PILOT_HOST", server.url)
+        monkeypatch.setenv("PR_PILOT_API_KEY", "test_api_key")
+        with patch("arcane.util.PR_PILOT_HOST", server.url), patch.object(
+            api_client, "_client", None
+        ), patch.object(api_client, "stats", ConnectionStats()):
+            yield server
+
+
+def test_task_can_be_created_followed_and_listed(fake_arcane):
+    engine = PilotEngine()
+    task = engine.create_task("owner/repo", "Do something")
+    assert task.status == "running"
+
+    messages = []
+
+    async def on_message(message):
+        messages.append(message)
+        return message["type"] == "status_update"
+
+    start = time.monotonic()
+    assert asyncio.run(TaskEventHub(api_key="test_api_key").stream(task.id, on_message))
+    # The connection is closed once the client acknowledged the close frame
+    assert time.monotonic() - start < 0.5
+    assert [message["type"] for message in messages] == ["event"] * 3 + [
+        "title_update",
+        "status_update",
+    ]
+    assert messages[-1]["data"]["message"] == fake_arcane.result_text(task.id)
+    assert len(fake_arcane.result_text(task.id)) == 100
+
+    assert engine.get_task(task.id).status == "completed"
+    assert [t.id for t in engine.list_tasks()] == [task.id]
+    assert fake_arcane.reset_counters() == {"requests": 3, "connections": 2, "websockets": 1}
+
+
+def test_find_regressions():
+    baseline = {"scenarios": {"task": {"median": 1.0}, "plan": {"median": 2.0}}}
+    results = {"scenarios": {"task": {"median": 1.1}, "plan": {"median": 3.0}, "new": {}}}
+    assert find_regressions(results, baseline, tolerance=0.2) == [
+        "plan: 3000 ms (baseline 2000 ms)"
+    ]
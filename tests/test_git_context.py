@@ -0,0 +1,101 @@
+import subprocess
+
+import pytest
+
+from cli.git_context import GitContext
+
+
+def git(cwd, *args):
+    return subprocess.run(
+        ["git", *args], cwd=cwd, check=True, stdout=subprocess.PIPE, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "-q", "-b", "main")
+    git(
+        path,
+        "-c",
+        "user.name=a",
+        "-c",
+        "user.email=a@b",
+        "commit",
+        "-q",
+        "--allow-empty",
+        "-m",
+        "1",
+    )
+    git(path, "remote", "add", "origin", "git@github.com:owner/repo.git")
+    sha = git(path, "rev-parse", "HEAD")
+    # Simulate a fetch: one packed and one loose remote branch, plus origin/HEAD
+    git(path, "update-ref", "refs/remotes/origin/main", sha)
+    git(path, "pack-refs", "--all")
+    git(path, "update-ref", "refs/remotes/origin/feature/x", sha)
+    git(path, "symbolic-ref", "refs/remotes/origin/HEAD", "refs/remotes/origin/main")
+    GitContext.invalidate()
+    yield path
+    GitContext.invalidate()
+
+
+def test_reads_metadata_from_git_directory(repo):
+    context = GitContext.current(str(repo))
+    assert context.root == str(repo)
+    assert context.branch == "main"
+    assert context.head_sha == git(repo, "rev-parse", "HEAD")
+    assert context.origin_url == "git@github.com:owner/repo.git"
+    assert set(context.remote_branches) == {"main", "feature/x"}
+    assert context.remote_sha() == context.head_sha
+    assert context.is_branch_pushed("feature/x")
+    assert not context.is_branch_pushed("other")
+
+
+def test_upstream_of_current_branch_without_origin_head(repo):
+    git(repo, "symbolic-ref", "--delete", "refs/remotes/origin/HEAD")
+    git(repo, "branch", "-q", "--set-upstream-to", "origin/main")
+    context = GitContext.current(str(repo))
+    assert context.remote_sha() is None
+    assert context.upstream_branches == {"main": "main"}
+    assert context.upstream_sha() == context.head_sha
+
+
+def test_subdirectory_and_detached_head(repo):
+    git(repo, "checkout", "-q", "--detach")
+    (repo / "sub").mkdir()
+    context = GitContext.current(str(repo / "sub"))
+    assert context.root == str(repo)
+    assert context.branch == "HEAD"
+    assert context.head_sha == git(repo, "rev-parse", "HEAD")
+
+
+def test_worktree_shares_refs_and_config(repo, tmp_path):
+    git(repo, "worktree", "add", "-q", "-b", "feature", str(tmp_path / "worktree"))
+    context = GitContext.current(str(tmp_path / "worktree"))
+    assert context.root == str(tmp_path / "worktree")
+    assert context.branch == "feature"
+    assert context.origin_url == "git@github.com:owner/repo.git"
+    assert "main" in context.remote_branches
+
+
+def test_context_is_cached_until_invalidated(repo):
+    context = GitContext.current(str(repo))
+    assert GitContext.current(str(repo)) is context
+    GitContext.invalidate()
+    assert GitContext.current(str(repo)) is not context
+
+
+def test_not_a_repository(tmp_path):
+    context = GitContext.current(str(tmp_path))
+    assert not context.is_repo
+    assert context.branch is None
+    assert context.remote_sha() is None
+
+
+def test_falls_back_to_git_when_git_dir_is_set(repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("GIT_DIR", str(repo / ".git"))
+    monkeypatch.setenv("GIT_WORK_TREE", str(repo))
+    context = GitContext.from_directory(str(tmp_path))
+    assert context.root == str(repo)
+    assert context.branch == "main"
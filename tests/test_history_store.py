@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+import urllib3
+from arcane import Task
+from click.testing import CliRunner
+
+from cli.cli import main
+from cli.history_store import HistoryStore, history_location
+from cli.task_runner import TaskRunner
+
+NOW = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def make_task(number, status="completed", result=None):
+    return Task(
+        id=f"task-{number}",
+        title=f"Task {number}",
+        user_request=f"Prompt {number}",
+        status=status,
+        created=NOW + timedelta(minutes=number),
+        github_project="owner/repo",
+        github_user="user",
+        branch="main",
+        result=result if result is not None else f"Result {number}",
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path / "history.sqlite3"))
+
+
+def test_sync_stores_tasks_newest_first(store):
+    engine = MagicMock()
+    engine.list_tasks.return_value = [make_task(2), make_task(1), make_task(3)]
+    assert store.sync(engine) == 3
+    assert [task.id for task in store.latest()] == ["task-3", "task-2", "task-1"]
+    assert [task.id for task in store.latest(limit=1, offset=1)] == ["task-2"]
+    # Results are not loaded for listings
+    assert all(task.result is None for task in store.latest())
+
+
+def test_sync_only_stores_new_and_pending_tasks(store):
+    engine = MagicMock()
+    engine.list_tasks.return_value = [make_task(2, status="running"), make_task(1)]
+    store.sync(engine)
+    engine.list_tasks.return_value = [make_task(3), make_task(2), make_task(1)]
+    assert store.sync(engine) == 2
+    assert [task.status for task in store.latest()] == ["completed", "completed", "completed"]
+
+
+def test_load_result_fetches_missing_results(store):
+    engine = MagicMock()
+    engine.list_tasks.return_value = [make_task(1, status="running", result="")]
+    store.sync(engine)
+    engine.get_task.return_value = make_task(1)
+    task = store.load_result(store.latest()[0], engine)
+    assert task.result == "Result 1"
+    # The fetched result is stored
+    engine.get_task.reset_mock()
+    assert store.load_result(store.latest()[0], engine).result == "Result 1"
+    engine.get_task.assert_not_called()
+
+
+def test_sync_keeps_tasks_created_before_a_recorded_task(store):
+    store.record(make_task(3, status="running"))
+    engine = MagicMock()
+    # Task 2 was created elsewhere, before this CLI created task 3
+    engine.list_tasks.return_value = [make_task(3), make_task(2)]
+    assert store.sync(engine) == 2
+    assert [task.id for task in store.latest()] == ["task-3", "task-2"]
+    assert store.latest()[0].status == "completed"
+
+
+def test_tasks_run_by_the_cli_are_shown_without_syncing(mock_engine_in_history_command):
+    HistoryStore().sync(MagicMock(list_tasks=MagicMock(return_value=[make_task(1)])))
+    TaskRunner.record_in_history(make_task(2))
+    result = CliRunner().invoke(main, ["history", "last", "1", "result", "--markdown"])
+    assert result.exit_code == 0
+    assert "Result 2" in result.output
+    mock_engine_in_history_command.list_tasks.assert_not_called()
+    mock_engine_in_history_command.get_task.assert_not_called()
+
+
+def test_history_location_depends_on_host_and_api_key(monkeypatch):
+    monkeypatch.setenv("PR_PILOT_API_KEY", "key-1")
+    first = history_location()
+    monkeypatch.setenv("PR_PILOT_API_KEY", "key-2")
+    other_account = history_location()
+    monkeypatch.setenv("PR_PILOT_API_KEY", "key-1")
+    monkeypatch.setenv("PR_PILOT_HOST", "http://localhost:8000")
+    other_host = history_location()
+    assert len({first, other_account, other_host}) == 3
+
+
+def test_is_stale_after_sync_interval(store):
+    assert store.is_stale()
+    store.sync(MagicMock(list_tasks=MagicMock(return_value=[])))
+    assert not store.is_stale()
+    store.sync_interval = -1
+    assert store.is_stale()
+
+
+def test_history_last_serves_from_local_copy(mock_engine_in_history_command):
+    mock_engine_in_history_command.list_tasks.return_value = [make_task(1), make_task(2)]
+    result = CliRunner().invoke(main, ["history", "last", "2", "result", "--markdown"])
+    assert result.exit_code == 0
+    assert "Result 1" in result.output
+
+    # Offline, the stored history is still available
+    mock_engine_in_history_command.list_tasks.side_effect = urllib3.exceptions.HTTPError("down")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr("cli.history_store.SYNC_INTERVAL", -1)
+        result = CliRunner().invoke(main, ["history", "last", "1", "prompt", "--markdown"])
+    assert result.exit_code == 0
+    assert "Prompt 2" in result.output
+    assert "Could not update the task history" in result.output
+    mock_engine_in_history_command.get_task.assert_not_called()
+
+
+def test_iter_tasks_filters_in_the_store(store):
+    other_repo = make_task(4)
+    other_repo.github_project = "owner/other"
+    engine = MagicMock()
+    engine.list_tasks.return_value = [
+        make_task(1),
+        make_task(2, status="failed"),
+        make_task(3),
+        other_repo,
+    ]
+    store.sync(engine)
+    assert [t.id for t in store.iter_tasks(status="failed")] == ["task-2"]
+    assert [t.id for t in store.iter_tasks(repo="owner/other")] == ["task-4"]
+    since = NOW + timedelta(minutes=2)
+    assert [t.id for t in store.iter_tasks(since=since, repo="owner/repo")] == ["task-3", "task-2"]
+
+
+@pytest.fixture
+def synced_history(mock_engine_in_history_command):
+    mock_engine_in_history_command.list_tasks.return_value = [
+        make_task(number) for number in range(1, 6)
+    ]
+    return mock_engine_in_history_command
+
+
+def test_history_tsv_format_pages_through_tasks(synced_history):
+    result = CliRunner().invoke(main, ["history", "--limit", "2", "--page", "2", "--format", "tsv"])
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines[0].split("\t") == [
+        "id",
+        "created",
+        "github_project",
+        "pr_number",
+        "status",
+        "title",
+    ]
+    assert [line.split("\t")[0] for line in lines[1:]] == ["task-3", "task-2"]
+
+
+def test_history_json_format_writes_one_task_per_line(synced_history):
+    result = CliRunner().invoke(main, ["history", "--status", "completed", "--format", "json"])
+    assert result.exit_code == 0
+    tasks = [Task.model_validate_json(line) for line in result.output.splitlines()]
+    assert [task.id for task in tasks] == [f"task-{number}" for number in range(5, 0, -1)]
+    assert all(task.result is None for task in tasks)
@@ -0,0 +1,83 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from cli.plan_context import PlanContext, SUMMARY_MAX_CHARS, TRUNCATION_MARKER
+
+RESULTS = {0: "first", 1: "second", 2: "third"}
+
+
+def test_all_results_by_default():
+    context = PlanContext()
+    prompt = context.results_prompt([0, 1, 2], RESULTS)
+    assert prompt == (
+        "## Result of Sub-task 1\n\nfirst\n\n"
+        "## Result of Sub-task 2\n\nsecond\n\n"
+        "## Result of Sub-task 3\n\nthird\n\n"
+    )
+
+
+def test_prompt_is_extended_incrementally():
+    context = PlanContext()
+    context.results_prompt([0], RESULTS)
+    context.sections[(0, False)] = "cached section\n\n"
+    # The previous prompt is reused, so the changed section is not picked up again
+    assert context.results_prompt([0, 1], RESULTS).startswith("## Result of Sub-task 1")
+    assert context.results_prompt([1], RESULTS) == "## Result of Sub-task 2\n\nsecond\n\n"
+
+
+def test_last_k_results():
+    context = PlanContext({"last": 2})
+    prompt = context.results_prompt([0, 1, 2], RESULTS)
+    assert "first" not in prompt
+    assert "second" in prompt and "third" in prompt
+
+
+def test_char_budget_drops_oldest_results():
+    context = PlanContext({"max_chars": 70})
+    prompt = context.results_prompt([0, 1, 2], RESULTS)
+    assert prompt == "## Result of Sub-task 2\n\nsecond\n\n## Result of Sub-task 3\n\nthird\n\n"
+
+
+def test_token_budget_truncates_most_recent_result():
+    context = PlanContext({"max_tokens": 10})
+    prompt = context.results_prompt([0], {0: "x" * 100})
+    assert len(prompt) == 40
+    assert prompt.endswith(TRUNCATION_MARKER)
+
+
+def test_summaries_are_produced_once():
+    summarizer = MagicMock(return_value="short")
+    context = PlanContext({"summarize": True}, summarizer=summarizer)
+    results = {0: "a" * (SUMMARY_MAX_CHARS + 1), 1: "b", 2: "c"}
+
+    prompt = context.results_prompt([0, 1], results)
+    assert prompt == "## Summary of Sub-task 1\n\nshort\n\n## Result of Sub-task 2\n\nb\n\n"
+    context.results_prompt([0, 1, 2], results)
+    summarizer.assert_called_once_with(results[0], SUMMARY_MAX_CHARS)
+
+
+def test_concurrent_prompts_share_one_summary():
+    def summarize(text, max_chars):
+        time.sleep(0.1)
+        return "short"
+
+    summarizer = MagicMock(side_effect=summarize)
+    context = PlanContext({"summarize": True}, summarizer=summarizer)
+    results = {0: "a" * (SUMMARY_MAX_CHARS + 1), 1: "b", 2: "c"}
+    threads = [
+        threading.Thread(target=context.results_prompt, args=([0, last], results))
+        for last in (1, 2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summarizer.assert_called_once()
+
+
+def test_unknown_option():
+    with pytest.raises(ValueError, match="Unknown context option: foo"):
+        PlanContext({"foo": 1})
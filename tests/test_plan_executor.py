@@ -0,0 +1,301 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import yaml
+
+from cli.plan_executor import PlanExecutor
+from cli.plan_journal import PlanJournal
+
+
+def write_plan(tmp_path, steps):
+    path = tmp_path / "plan.yaml"
+    path.write_text(yaml.dump({"name": "Test Plan", "prompt": "Main prompt", "steps": steps}))
+    return str(path)
+
+
+@pytest.fixture
+def mock_task_runner():
+    with patch("cli.plan_executor.TaskRunner") as mock:
+        mock.return_value.run_task.side_effect = lambda params: MagicMock(
+            result=f"result of {params.prompt.split('# Current Sub-task: ')[1].split()[0]}",
+            pr_number=None,
+        )
+        yield mock.return_value
+
+
+def prompts_by_step(mock_task_runner):
+    prompts = {}
+    for call in mock_task_runner.run_task.call_args_list:
+        prompt = call[0][0].prompt
+        prompts[prompt.split("# Current Sub-task: ")[1].split()[0]] = prompt
+    return prompts
+
+
+def test_steps_without_dependencies_run_in_order(tmp_path, mock_task_runner):
+    plan = write_plan(tmp_path, [{"name": n, "prompt": n} for n in ["a", "b", "c"]])
+    executor = PlanExecutor(plan, MagicMock())
+    assert executor.dependencies == [[], [0], [0, 1]]
+    assert executor.schedule(max_parallel=3) == [[0], [1], [2]]
+
+    executor.run(True, "owner/repo", False, "gpt-4o", False)
+    prompts = prompts_by_step(mock_task_runner)
+    assert list(prompts.keys()) == ["a", "b", "c"]
+    assert "result of a" in prompts["c"] and "result of b" in prompts["c"]
+
+
+def test_schedule_and_critical_path(tmp_path):
+    plan = write_plan(
+        tmp_path,
+        [
+            {"name": "a", "prompt": "a"},
+            {"name": "b", "prompt": "b"},
+            {"name": "c", "prompt": "c", "depends_on": ["a"]},
+            {"name": "d", "prompt": "d", "depends_on": ["b", "c"]},
+        ],
+    )
+    executor = PlanExecutor(plan, MagicMock())
+    assert executor.schedule(max_parallel=2) == [[0, 1], [2], [3]]
+    assert executor.schedule(max_parallel=1) == [[0], [1], [2], [3]]
+    assert executor.critical_path_length() == 3
+
+
+def test_step_only_receives_dependency_results(tmp_path, mock_task_runner):
+    plan = write_plan(
+        tmp_path,
+        [
+            {"name": "a", "prompt": "a"},
+            {"name": "b", "prompt": "b"},
+            {"name": "c", "prompt": "c", "depends_on": "b"},
+        ],
+    )
+    PlanExecutor(plan, MagicMock()).run(True, "owner/repo", False, "gpt-4o", False, max_parallel=2)
+    prompts = prompts_by_step(mock_task_runner)
+    assert "result of b" in prompts["c"]
+    assert "result of a" not in prompts["c"]
+
+
+def test_independent_steps_run_concurrently(tmp_path, mock_task_runner):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def run_task(params):
+        barrier.wait()
+        return MagicMock(result="done", pr_number=None)
+
+    mock_task_runner.run_task.side_effect = run_task
+    plan = write_plan(
+        tmp_path,
+        [{"name": "a", "prompt": "a", "depends_on": []}, {"name": "b", "prompt": "b"}],
+    )
+    executor = PlanExecutor(plan, MagicMock())
+    executor.pr_number = 12
+    executor.run(True, "owner/repo", False, "gpt-4o", False, max_parallel=2)
+    assert executor.responses == {0: "done", 1: "done"}
+
+
+def test_steps_run_one_at_a_time_until_the_plan_has_a_pr(tmp_path, mock_task_runner):
+    running = []
+    pr_numbers = {}
+
+    def run_task(params):
+        step = params.prompt.split("# Current Sub-task: ")[1].split()[0]
+        running.append(step)
+        assert len(running) == 1 or params.pr_number
+        pr_numbers[step] = params.pr_number
+        time.sleep(0.05)
+        running.remove(step)
+        return MagicMock(result="done", pr_number=12)
+
+    mock_task_runner.run_task.side_effect = run_task
+    plan = write_plan(
+        tmp_path, [{"name": n, "prompt": n, "depends_on": []} for n in ["a", "b", "c"]]
+    )
+    PlanExecutor(plan, MagicMock()).run(True, "owner/repo", False, "gpt-4o", False, max_parallel=3)
+    assert pr_numbers == {"a": None, "b": 12, "c": 12}
+
+
+def test_failed_step_raises(tmp_path, mock_task_runner):
+    mock_task_runner.run_task.side_effect = None
+    mock_task_runner.run_task.return_value = None
+    plan = write_plan(tmp_path, [{"name": "a", "prompt": "a"}])
+    with pytest.raises(ValueError, match="Task failed"):
+        PlanExecutor(plan, MagicMock()).run(True, "owner/repo", False, "gpt-4o", False)
+
+
+def test_running_steps_are_journaled_when_a_step_fails(tmp_path, mock_task_runner):
+    a_failed = threading.Event()
+
+    def run_task(params):
+        if "# Current Sub-task: a" in params.prompt:
+            a_failed.set()
+            raise ValueError("a failed")
+        a_failed.wait(timeout=5)
+        return MagicMock(result="result of b", pr_number=None, id="task-b")
+
+    mock_task_runner.run_task.side_effect = run_task
+    plan = write_plan(
+        tmp_path,
+        [
+            {"name": "a", "prompt": "a", "depends_on": []},
+            {"name": "b", "prompt": "b", "depends_on": []},
+            {"name": "c", "prompt": "c", "depends_on": ["a", "b"]},
+        ],
+    )
+    journal = PlanJournal(str(tmp_path / "journal.jsonl"))
+    executor = PlanExecutor(plan, MagicMock())
+    executor.pr_number = 12
+    with pytest.raises(ValueError, match="a failed"):
+        executor.run(True, "owner/repo", False, "gpt-4o", False, max_parallel=2, journal=journal)
+    assert {i: entry["result"] for i, entry in journal.load().items()} == {1: "result of b"}
+    assert mock_task_runner.run_task.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "steps, error",
+    [
+        (
+            [
+                {"name": "a", "prompt": "a", "depends_on": "b"},
+                {"name": "b", "prompt": "b", "depends_on": "a"},
+            ],
+            "dependency cycle",
+        ),
+        ([{"name": "a", "prompt": "a", "depends_on": "x"}], "unknown step 'x'"),
+        (
+            [{"name": "a", "prompt": "a"}, {"name": "a", "prompt": "a", "depends_on": []}],
+            "Duplicate step name",
+        ),
+    ],
+)
+def test_invalid_dependencies(tmp_path, steps, error):
+    with pytest.raises(ValueError, match=error):
+        PlanExecutor(write_plan(tmp_path, steps), MagicMock())
+
+
+def test_context_settings_limit_prompt(tmp_path, mock_task_runner):
+    path = tmp_path / "plan.yaml"
+    path.write_text(
+        yaml.dump(
+            {
+                "name": "Test Plan",
+                "prompt": "Main prompt",
+                "context": {"last": 1},
+                "steps": [{"name": n, "prompt": n} for n in ["a", "b", "c"]],
+            }
+        )
+    )
+    executor = PlanExecutor(str(path), MagicMock())
+    executor.run(True, "owner/repo", False, "gpt-4o", False)
+    prompts = prompts_by_step(mock_task_runner)
+    assert "result of b" in prompts["c"]
+    assert "result of a" not in prompts["c"]
+    assert executor.prompt_sizes[2] == len(prompts["c"])
+
+
+def test_summaries_are_created_in_the_step_workers(tmp_path, mock_task_runner):
+    summary_threads = []
+
+    def summarize(text, max_chars, *args):
+        summary_threads.append(threading.current_thread())
+        return "summary"
+
+    path = tmp_path / "plan.yaml"
+    path.write_text(
+        yaml.dump(
+            {
+                "name": "Test Plan",
+                "prompt": "Main prompt",
+                "context": {"summarize": True},
+                "steps": [{"name": n, "prompt": n} for n in ["a", "b", "c"]],
+            }
+        )
+    )
+    mock_task_runner.run_task.side_effect = lambda params: MagicMock(
+        result="x" * 2000, pr_number=None
+    )
+    executor = PlanExecutor(str(path), MagicMock())
+    with patch.object(executor, "summarize", side_effect=summarize):
+        executor.run(True, "owner/repo", False, "gpt-4o", False)
+    assert summary_threads and threading.main_thread() not in summary_threads
+    assert "## Summary of Sub-task 1\n\nsummary" in executor.context.sections[(0, True)]
+
+
+@pytest.fixture
+def mock_pull_branch_changes():
+    with patch("cli.plan_executor.pull_branch_changes") as mock:
+        yield mock
+
+
+def record_events(mock_task_runner, mock_pull_branch_changes):
+    events = []
+    run_task = mock_task_runner.run_task.side_effect
+
+    def record_step(params):
+        events.append(params.prompt.split("# Current Sub-task: ")[1].split()[0])
+        return run_task(params)
+
+    mock_task_runner.run_task.side_effect = record_step
+    mock_pull_branch_changes.side_effect = lambda *args: events.append("pull")
+    return events
+
+
+def test_remote_steps_are_synced_once_at_the_end(
+    tmp_path, mock_task_runner, mock_pull_branch_changes
+):
+    events = record_events(mock_task_runner, mock_pull_branch_changes)
+    plan = write_plan(tmp_path, [{"name": n, "prompt": n} for n in ["a", "b", "c"]])
+    PlanExecutor(plan, MagicMock()).run(
+        True, "owner/repo", False, "gpt-4o", False, sync_branch="feature"
+    )
+    assert events == ["a", "b", "c", "pull"]
+    assert mock_pull_branch_changes.call_args[0][2] == "feature"
+
+
+def test_local_steps_wait_for_sync_while_remote_steps_run(
+    tmp_path, mock_task_runner, mock_pull_branch_changes
+):
+    events = record_events(mock_task_runner, mock_pull_branch_changes)
+    remote_step_started = threading.Event()
+    record_step = mock_task_runner.run_task.side_effect
+
+    def run_task(params):
+        result = record_step(params)
+        if events[-1] == "c":
+            remote_step_started.set()
+        return result
+
+    def pull(*args):
+        # Only finishes if c starts while the sync is running
+        assert remote_step_started.wait(timeout=5)
+        events.append("pull")
+
+    mock_task_runner.run_task.side_effect = run_task
+    mock_pull_branch_changes.side_effect = pull
+    plan = write_plan(
+        tmp_path,
+        [
+            {"name": "a", "prompt": "a", "depends_on": []},
+            {"name": "b", "prompt": "b", "depends_on": ["a"], "template": "b.md.jinja2"},
+            {"name": "c", "prompt": "c", "depends_on": ["a"]},
+        ],
+    )
+    PlanExecutor(plan, MagicMock()).run(
+        True, "owner/repo", False, "gpt-4o", False, max_parallel=2, sync_branch="feature"
+    )
+    assert events == ["a", "c", "pull", "b", "pull"]
+
+
+def test_no_sync_without_branch(tmp_path, mock_task_runner, mock_pull_branch_changes):
+    plan = write_plan(tmp_path, [{"name": "a", "prompt": "a", "template": "a.md.jinja2"}])
+    PlanExecutor(plan, MagicMock()).run(True, "owner/repo", False, "gpt-4o", False)
+    mock_pull_branch_changes.assert_not_called()
+
+
+def test_template_steps_render_the_local_template(tmp_path, monkeypatch, mock_engine):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "step.md.jinja2").write_text("Rendered {{ 1 + 1 }}")
+    plan = write_plan(tmp_path, [{"name": "a", "template": "step.md.jinja2"}])
+    mock_engine.create_task.return_value = MagicMock(result="done", pr_number=None)
+    PlanExecutor(plan, MagicMock()).run(False, "owner/repo", False, "gpt-4o", False)
+    assert mock_engine.create_task.call_args[0][1] == "Rendered 2"
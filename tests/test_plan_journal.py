@@ -0,0 +1,113 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import yaml
+from click.testing import CliRunner
+
+from cli.cli import main
+from cli.plan_executor import PlanExecutor
+from cli.plan_journal import PlanJournal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return PlanJournal(str(tmp_path / ".pilot" / "runs" / "plan.jsonl"))
+
+
+@pytest.fixture
+def plan_file(tmp_path):
+    path = tmp_path / "plan.yaml"
+    path.write_text(
+        yaml.dump(
+            {
+                "name": "Test Plan",
+                "prompt": "Main prompt",
+                "steps": [{"name": n, "prompt": n} for n in ["a", "b", "c"]],
+            }
+        )
+    )
+    return str(path)
+
+
+def test_record_and_load(journal):
+    journal.record(0, "a", "task-1", "result a", None)
+    journal.record(1, "b", "task-2", "result b", 12)
+    entries = journal.load()
+    assert entries[0]["result"] == "result a"
+    assert entries[1] == {
+        "index": 1,
+        "name": "b",
+        "task_id": "task-2",
+        "result": "result b",
+        "pr_number": 12,
+    }
+
+
+def test_load_ignores_incomplete_line(journal):
+    journal.record(0, "a", "task-1", "result a", None)
+    with open(journal.file_path, "a") as f:
+        f.write('{"index": 1, "name": "b", "res')
+    assert list(journal.load().keys()) == [0]
+
+    # New entries are not appended to the incomplete line
+    journal.record(2, "c", "task-3", "result c", None)
+    assert list(journal.load().keys()) == [0, 2]
+
+
+def test_load_missing_journal(journal):
+    assert journal.load() == {}
+    journal.clear()
+
+
+def test_for_plan_depends_on_plan_content(plan_file, tmp_path):
+    with patch("cli.plan_journal.is_git_repo", return_value=True), patch(
+        "cli.plan_journal.get_git_root", return_value=str(tmp_path)
+    ):
+        first = PlanJournal.for_plan(plan_file).file_path
+        with open(plan_file, "a") as f:
+            f.write("# changed\n")
+        second = PlanJournal.for_plan(plan_file).file_path
+    assert first.startswith(str(tmp_path / ".pilot" / "runs"))
+    assert first != second
+
+
+def test_resume_skips_finished_steps(plan_file, journal):
+    journal.record(0, "a", "task-1", "result a", 7)
+    executor = PlanExecutor(plan_file, MagicMock())
+    assert executor.resume(journal) == 1
+    assert executor.pr_number == 7
+
+    with patch("cli.plan_executor.TaskRunner") as mock_runner:
+        mock_runner.return_value.run_task.return_value = MagicMock(result="done", pr_number=7)
+        executor.run(True, "owner/repo", False, "gpt-4o", False, journal=journal)
+        prompts = [call[0][0].prompt for call in mock_runner.return_value.run_task.call_args_list]
+
+    assert len(prompts) == 2
+    assert "result a" in prompts[0]
+    assert all(
+        call[0][0].pr_number == 7 for call in mock_runner.return_value.run_task.call_args_list
+    )
+    # The journal is removed once the plan is done
+    assert journal.load() == {}
+
+
+def test_failed_step_keeps_journal(plan_file, journal):
+    executor = PlanExecutor(plan_file, MagicMock())
+    with patch("cli.plan_executor.TaskRunner") as mock_runner:
+        mock_runner.return_value.run_task.side_effect = [
+            MagicMock(id="task-1", result="result a", pr_number=None),
+            None,
+        ]
+        with pytest.raises(ValueError, match="Task failed"):
+            executor.run(True, "owner/repo", False, "gpt-4o", False, journal=journal)
+    assert list(journal.load().keys()) == [0]
+
+
+def test_plan_command_suggests_resume(plan_file, journal):
+    with patch("cli.commands.plan.PlanJournal.for_plan", return_value=journal), patch(
+        "cli.plan_executor.TaskRunner"
+    ) as mock_runner:
+        mock_runner.return_value.run_task.return_value = None
+        result = CliRunner().invoke(main, ["--no-spinner", "plan", plan_file])
+    assert result.exit_code == 1
+    assert "pilot plan --resume" in result.output
@@ -0,0 +1,73 @@
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+from click.testing import CliRunner
+
+from cli.cli import main
+from cli.profiling import Profiler, profiler, traced
+
+
+@pytest.fixture
+def enabled_profiler():
+    profiler.enable()
+    profiler.spans.clear()
+    yield profiler
+    profiler.enabled = False
+    profiler.spans.clear()
+
+
+def test_disabled_profiler_records_nothing():
+    local_profiler = Profiler()
+    with local_profiler.span("work"):
+        pass
+    assert local_profiler.spans == []
+
+
+def test_summary_aggregates_spans_by_name():
+    local_profiler = Profiler()
+    local_profiler.enable()
+    for _ in range(2):
+        with local_profiler.span("work"):
+            time.sleep(0.001)
+    with local_profiler.span("other"):
+        pass
+    summary = local_profiler.summary()
+    assert [row["name"] for row in summary] == ["work", "other"]
+    assert summary[0]["calls"] == 2
+    assert summary[0]["total"] >= summary[0]["max"] > 0
+
+
+def test_traced_times_sync_and_async_functions(enabled_profiler):
+    import asyncio
+
+    @traced("sync work")
+    def sync_work():
+        return 1
+
+    @traced()
+    async def async_work():
+        return 2
+
+    assert sync_work() == 1
+    assert asyncio.run(async_work()) == 2
+    names = [span.name for span in enabled_profiler.spans]
+    assert names == ["sync work", "test_traced_times_sync_and_async_functions.<locals>.async_work"]
+
+
+def test_trace_env_var_writes_chrome_trace(tmp_path, mock_engine_in_history_command):
+    trace_file = tmp_path / "trace.json"
+    try:
+        with patch.dict("os.environ", {"PR_PILOT_TRACE": str(trace_file)}):
+            result = CliRunner().invoke(main, ["--profile", "history", "--format", "json"])
+    finally:
+        profiler.enabled = False
+        profiler.spans.clear()
+    assert result.exit_code == 0
+    trace = json.loads(trace_file.read_text())
+    names = {event["name"] for event in trace["traceEvents"]}
+    assert {"import", "load config"} <= names
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in trace["traceEvents"])
+    assert trace["otherData"]["argv"]
+    assert "Profile" in result.output
@@ -1,46 +1,52 @@
 import os
 import subprocess
 import tempfile
+import threading
+import time
 from unittest.mock import Mock, patch
 
-from cli.prompt_template import sh, PromptTemplate
+import click
+import jinja2
+import pytest
 
+from cli.prompt_template import sh, PromptTemplate, get_environment, run_shell_command
 
-@patch("subprocess.run")
-def test_shell_command_execution_with_success(mock_subprocess_run):
-    mock_subprocess_run.return_value = subprocess.CompletedProcess(
+
+@patch("cli.prompt_template.run_shell_command")
+def test_shell_command_execution_with_success(mock_run_shell_command):
+    mock_run_shell_command.return_value = subprocess.CompletedProcess(
         args=["echo", "test"], returncode=0, stdout="test", stderr=""
     )
     status = Mock()
     assert sh("echo test", status) == "test"
-    status.start.assert_called_once()
     status.update_spinner_message.assert_called()
-    status.stop.assert_called_once()
+    status.log_message.assert_called_once()
+    # The spinner keeps running while the command runs
+    status.start.assert_not_called()
+    status.stop.assert_not_called()
 
 
-@patch("subprocess.run")
-def test_shell_command_execution_with_failure(mock_subprocess_run):
-    mock_subprocess_run.return_value = subprocess.CompletedProcess(
+@patch("cli.prompt_template.run_shell_command")
+def test_shell_command_execution_with_failure(mock_run_shell_command):
+    mock_run_shell_command.return_value = subprocess.CompletedProcess(
         args=["echo", "test"], returncode=1, stdout="", stderr="error"
     )
     status = Mock()
     assert sh("echo test", status) == "error"
-    status.start.assert_called_once()
     status.update_spinner_message.assert_called()
-    status.fail.assert_called_once()
-    status.stop.assert_called_once()
+    status.warning.assert_called_once()
+    status.start.assert_not_called()
+    status.stop.assert_not_called()
 
 
-@patch("subprocess.run")
-def test_shell_command_execution_with_list_input(mock_subprocess_run):
-    mock_subprocess_run.return_value = subprocess.CompletedProcess(
+@patch("cli.prompt_template.run_shell_command")
+def test_shell_command_execution_with_list_input(mock_run_shell_command):
+    mock_run_shell_command.return_value = subprocess.CompletedProcess(
         args=["echo", "test"], returncode=0, stdout="test", stderr=""
     )
     status = Mock()
     assert sh(["echo", "test"], status) == "test"
-    status.start.assert_called_once()
-    status.update_spinner_message.assert_called()
-    status.stop.assert_called_once()
+    mock_run_shell_command.assert_called_once_with(["echo", "test"], None, None)
 
 
 @patch("cli.prompt_template.is_git_repo")
@@ -174,3 +180,311 @@ def test_get_template_file_path__relative_to_git_dir(
         assert prompt_template.get_template_file_path() == "test_repo/test_model.jinja2"
         mock_is_git_repo.assert_called_once()
         mock_get_git_root.assert_called_once()
+
+
+def write_template(directory, content, name="template.md.jinja2"):
+    with open(os.path.join(directory, name), "w") as f:
+        f.write(content)
+    return name
+
+
+@pytest.fixture
+def mock_subtask_engine():
+    with patch("cli.prompt_template.PilotEngine") as mock_engine:
+        mock_engine.return_value.create_task.side_effect = lambda repo, prompt, **kwargs: Mock(
+            id=prompt
+        )
+        yield mock_engine.return_value
+
+
+@pytest.fixture
+def mock_subtask_handler():
+    with patch("cli.prompt_template.TaskHandler") as mock_handler:
+        yield mock_handler
+
+
+def test_render_runs_subtasks_concurrently(mock_subtask_engine, mock_subtask_handler, tmp_path):
+    barrier = threading.Barrier(3, timeout=5)
+
+    def wait_for_result(task):
+        # Only returns once all three sub-tasks are running at the same time
+        barrier.wait()
+        return Mock(wait_for_result=Mock(return_value=f"result of {task.id}"))
+
+    mock_subtask_handler.side_effect = lambda task, status: wait_for_result(task)
+    template = write_template(
+        tmp_path, "{% for n in [1, 2, 3] %}{{ subtask('task ' ~ n, parallel=True) }};{% endfor %}"
+    )
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path), max_parallel_subtasks=3
+    )
+    with patch("cli.prompt_template.os.getcwd", return_value=str(tmp_path)):
+        result = prompt_template.render()
+    assert result == "result of task 1;result of task 2;result of task 3;"
+    assert mock_subtask_engine.create_task.call_count == 3
+
+
+def test_render_applies_filters_to_subtask_results(
+    mock_subtask_engine, mock_subtask_handler, tmp_path
+):
+    mock_subtask_handler.return_value.wait_for_result.return_value = "line 1\nline 2"
+    template = write_template(tmp_path, "- {{ subtask('prompt') | indent(2) }}")
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    with patch("cli.prompt_template.os.getcwd", return_value=str(tmp_path)):
+        assert prompt_template.render() == "- line 1\n  line 2"
+
+
+@patch("cli.prompt_template.sh")
+def test_render_does_not_repeat_shell_commands(
+    mock_sh, mock_subtask_engine, mock_subtask_handler, tmp_path
+):
+    mock_sh.return_value = "a b"
+    mock_subtask_handler.return_value.wait_for_result.return_value = "done"
+    template = write_template(
+        tmp_path, "{% for f in sh('ls').split() %}{{ subtask(f) }}{% endfor %}"
+    )
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    with patch("cli.prompt_template.os.getcwd", return_value=str(tmp_path)):
+        assert prompt_template.render() == "donedone"
+    mock_sh.assert_called_once()
+
+
+def test_render_only_creates_subtasks_the_template_calls(
+    mock_subtask_engine, mock_subtask_handler, tmp_path
+):
+    mock_subtask_handler.return_value.wait_for_result.return_value = "yes"
+    template = write_template(
+        tmp_path,
+        "{% set ok = subtask('Are tests passing? answer yes/no', parallel=True) %}"
+        "{% if ok == 'yes' %}fine{% else %}{{ subtask('Fix the failing tests') }}{% endif %}",
+    )
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    with patch("cli.prompt_template.os.getcwd", return_value=str(tmp_path)):
+        assert prompt_template.render() == "fine"
+    prompts = [call[0][1] for call in mock_subtask_engine.create_task.call_args_list]
+    assert prompts == ["Are tests passing? answer yes/no"]
+
+
+def test_subtask_prompts_wait_for_earlier_results(mock_subtask_handler, tmp_path):
+    with patch("cli.prompt_template.PilotEngine") as mock_engine:
+        mock_engine.return_value.create_task.side_effect = lambda repo, prompt, **kwargs: Mock(
+            id=prompt
+        )
+        mock_subtask_handler.side_effect = lambda task, status: Mock(
+            wait_for_result=Mock(return_value=f"result of {task.id}")
+        )
+        template = write_template(
+            tmp_path,
+            "{% set a = subtask('a', parallel=True) %}{{ subtask('use ' ~ a, parallel=True) }}",
+        )
+        prompt_template = PromptTemplate(
+            template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+        )
+        with patch("cli.prompt_template.os.getcwd", return_value=str(tmp_path)):
+            assert prompt_template.render() == "result of use result of a"
+
+
+def test_filters_are_applied_to_parallel_subtask_results(
+    mock_subtask_engine, mock_subtask_handler, tmp_path
+):
+    mock_subtask_handler.return_value.wait_for_result.return_value = "line 1\nline 2"
+    template = write_template(
+        tmp_path, "- {{ subtask('prompt', parallel=True) | indent(2) }} {{ 'x' | upper }}"
+    )
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    with patch("cli.prompt_template.os.getcwd", return_value=str(tmp_path)):
+        assert prompt_template.render() == "- line 1\n  line 2 X"
+
+
+@patch("cli.prompt_template.select")
+def test_parallel_sub_templates_prompt_on_the_render_thread(
+    mock_select, mock_subtask_engine, mock_subtask_handler, tmp_path
+):
+    threads = []
+    mock_select.side_effect = lambda prompt, choices: threads.append(threading.current_thread())
+    mock_subtask_handler.return_value.wait_for_result.return_value = "done"
+    write_template(tmp_path, "{{ select('Pick one', ['a']) }}", name="sub.md.jinja2")
+    template = write_template(tmp_path, "{{ subtask('sub.md.jinja2', parallel=True) }}")
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    with patch("cli.prompt_template.os.getcwd", return_value=str(tmp_path)):
+        assert prompt_template.render() == "done"
+    assert threads == [threading.current_thread()]
+
+
+def test_render_raises_failed_parallel_subtask(mock_subtask_engine, mock_subtask_handler, tmp_path):
+    mock_subtask_engine.create_task.side_effect = Exception("API error")
+    template = write_template(tmp_path, "{{ subtask('a', parallel=True) }}")
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    with patch("cli.prompt_template.os.getcwd", return_value=str(tmp_path)):
+        with pytest.raises(click.ClickException, match="API error"):
+            prompt_template.render()
+
+
+def test_render_sequentially(mock_subtask_engine, mock_subtask_handler, tmp_path):
+    mock_subtask_handler.return_value.wait_for_result.side_effect = ["first", "second"]
+    template = write_template(tmp_path, "{{ subtask('a') }} {{ subtask('b') }}")
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path), max_parallel_subtasks=1
+    )
+    with patch("cli.prompt_template.os.getcwd", return_value=str(tmp_path)):
+        assert prompt_template.render() == "first second"
+
+
+def test_render_raises_failed_subtask(mock_subtask_engine, mock_subtask_handler, tmp_path):
+    mock_subtask_engine.create_task.side_effect = Exception("API error")
+    template = write_template(tmp_path, "{{ subtask('a') }}")
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    with patch("cli.prompt_template.os.getcwd", return_value=str(tmp_path)):
+        with pytest.raises(click.ClickException, match="API error"):
+            prompt_template.render()
+
+
+def test_renders_share_one_environment_per_home(tmp_path):
+    template = write_template(tmp_path, "Hello, {{ name }}!")
+    parse_template = jinja2.Environment._parse
+    with patch.object(
+        jinja2.Environment, "_parse", autospec=True, side_effect=parse_template
+    ) as parse:
+        for name in ["World", "again"]:
+            prompt_template = PromptTemplate(
+                template, "test_repo", "test_model", Mock(), home=str(tmp_path), name=name
+            )
+            assert prompt_template.render() == f"Hello, {name}!"
+    assert parse.call_count == 1
+    assert get_environment(str(tmp_path)) is get_environment(str(tmp_path) + "/")
+
+
+def test_compiled_templates_are_cached_on_disk(tmp_path, mock_jinja_cache_dir):
+    template = write_template(tmp_path, "Hello, {{ name }}!")
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path), name="World"
+    )
+    prompt_template.render()
+    assert len(os.listdir(mock_jinja_cache_dir)) == 1
+
+    # A new process starts with an empty environment, but doesn't parse the template again
+    with patch("cli.prompt_template._environments", {}), patch.object(
+        jinja2.Environment, "_parse", side_effect=AssertionError("parsed")
+    ):
+        assert prompt_template.render() == "Hello, World!"
+
+
+def test_changed_template_is_reloaded(tmp_path):
+    template = write_template(tmp_path, "Hello, {{ name }}!")
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path), name="World"
+    )
+    assert prompt_template.render() == "Hello, World!"
+    write_template(tmp_path, "Goodbye, {{ name }}!")
+    modified = os.path.getmtime(tmp_path / template) + 1
+    os.utime(tmp_path / template, (modified, modified))
+    assert prompt_template.render() == "Goodbye, World!"
+
+
+def test_included_templates_can_use_template_functions(tmp_path):
+    write_template(tmp_path, "{{ env('GREETING') }}", name="greeting.md.jinja2")
+    template = write_template(tmp_path, "{% include 'greeting.md.jinja2' %}, {{ name }}!")
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path), name="World"
+    )
+    with patch.dict(os.environ, {"GREETING": "Hi"}):
+        assert prompt_template.render() == "Hi, World!"
+
+
+def test_shell_command_timeout():
+    result = run_shell_command(["sleep", "5"], timeout=0.2)
+    assert result.returncode is None
+    assert "timed out after 0.2 seconds" in result.stderr
+
+
+def test_shell_command_output_is_truncated():
+    result = run_shell_command(["python", "-c", "print('x' * 1000)"], max_output=10)
+    assert result.stdout == "xxxxxxxxxx\n[Output truncated to 10 bytes]"
+
+
+def test_runaway_shell_command_is_stopped_at_the_output_limit():
+    start = time.monotonic()
+    result = run_shell_command(["yes"], timeout=60, max_output=1000)
+    assert time.monotonic() - start < 5
+    assert result.stdout == "y\n" * 500 + "\n[Output truncated to 1000 bytes]"
+
+
+def test_parallel_shell_output_can_be_used_in_logic(tmp_path):
+    template = write_template(
+        tmp_path,
+        "{% set files = sh('echo a b', parallel=True) %}"
+        "{% for f in files.split() %}{{ sh(['echo', f], parallel=True) }};{% endfor %}",
+    )
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    assert prompt_template.render() == "a;b;"
+
+
+def test_render_runs_identical_shell_commands_once(tmp_path):
+    template = write_template(
+        tmp_path, "{% for n in [1, 2, 3] %}{{ sh('echo hello') }};{% endfor %}"
+    )
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    with patch("cli.prompt_template.run_shell_command", wraps=run_shell_command) as run:
+        assert prompt_template.render() == "hello;hello;hello;"
+    run.assert_called_once()
+
+
+def test_render_runs_parallel_shell_commands_at_the_same_time(tmp_path):
+    template = write_template(
+        tmp_path,
+        "{% for n in [1, 2, 3] %}"
+        "{{ sh(['python', '-c', 'import time; time.sleep(0.5); print(' ~ n ~ ')'],"
+        " parallel=True) }}"
+        "{% endfor %}",
+    )
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    start = time.monotonic()
+    assert prompt_template.render() == "123"
+    assert time.monotonic() - start < 1.2
+
+
+def test_subtask_prompts_contain_parallel_shell_output(
+    mock_subtask_engine, mock_subtask_handler, tmp_path
+):
+    mock_subtask_handler.return_value.wait_for_result.return_value = "done"
+    template = write_template(
+        tmp_path, "{{ subtask('Summarize: ' ~ sh('echo hello', parallel=True)) }}"
+    )
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    with patch("cli.prompt_template.os.getcwd", return_value=str(tmp_path)):
+        assert prompt_template.render() == "done"
+    prompt = mock_subtask_engine.create_task.call_args[0][1]
+    assert prompt == "Summarize: hello"
+
+
+def test_imported_macros_can_use_template_functions(tmp_path):
+    write_template(tmp_path, "{% macro run(c) %}{{ sh(c) }}{% endmacro %}", name="macros.jinja2")
+    template = write_template(
+        tmp_path, "{% import 'macros.jinja2' as macros %}out={{ macros.run('echo hi') }}"
+    )
+    prompt_template = PromptTemplate(
+        template, "test_repo", "test_model", Mock(), home=str(tmp_path)
+    )
+    assert prompt_template.render() == "out=hi"
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import subprocess
+
+import pytest
+
+from cli.remote_repository import RemoteRepository, fetch_repositories
+
+
+def git(*args, cwd):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+def make_source(path, files):
+    os.makedirs(path)
+    git("init", "-q", cwd=path)
+    for name, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(path, name)), exist_ok=True)
+        with open(os.path.join(path, name), "w") as f:
+            f.write(content)
+    git("add", ".", cwd=path)
+    git("-c", "user.name=Test", "-c", "user.email=test@example.com", "commit", "-qm", "c", cwd=path)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / "source")
+    make_source(path, {".pilot-commands.yaml": "commands: []\n", "prompts/a.md.jinja2": "A"})
+    return path
+
+
+def test_fetch_and_export_files(tmp_path, source):
+    repository = RemoteRepository("owner/repo", url=source, cache_dir=str(tmp_path / "cache"))
+    asyncio.run(repository.fetch())
+    assert repository.path == str(tmp_path / "cache" / "owner__repo.git")
+
+    exported = repository.export(
+        [".pilot-commands.yaml", "prompts/a.md.jinja2", "missing.yaml"], str(tmp_path / "out")
+    )
+    assert exported == [
+        str(tmp_path / "out" / ".pilot-commands.yaml"),
+        str(tmp_path / "out" / "prompts" / "a.md.jinja2"),
+    ]
+    assert not os.path.exists(os.path.join(repository.path, ".pilot-commands.yaml"))
+
+
+def test_fetch_updates_cached_clone(tmp_path, source):
+    repository = RemoteRepository("owner/repo", url=source, cache_dir=str(tmp_path / "cache"))
+    asyncio.run(repository.fetch())
+    with open(os.path.join(source, ".pilot-commands.yaml"), "w") as f:
+        f.write("commands: [updated]\n")
+    git("-c", "user.name=T", "-c", "user.email=t@e.com", "commit", "-qam", "u", cwd=source)
+    asyncio.run(repository.fetch())
+    assert repository.read_file(".pilot-commands.yaml") == b"commands: [updated]\n"
+
+
+def test_fetch_repositories_reports_errors(tmp_path, source):
+    cache_dir = str(tmp_path / "cache")
+    repositories = [
+        RemoteRepository("owner/repo", url=source, cache_dir=cache_dir),
+        RemoteRepository("owner/missing", url=str(tmp_path / "missing"), cache_dir=cache_dir),
+    ]
+    errors = asyncio.run(fetch_repositories(repositories))
+    assert errors["owner/repo"] is None
+    assert isinstance(errors["owner/missing"], RuntimeError)
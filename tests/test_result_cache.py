@@ -0,0 +1,146 @@
+import time
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import pytest
+from arcane import Task
+from click.testing import CliRunner
+
+from cli.cli import main
+from cli.result_cache import ResultCache, get_remote_head_sha
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "results.sqlite3"))
+
+
+@pytest.fixture
+def mock_head_sha():
+    with patch("cli.result_cache.detect_repository", return_value="owner/repo"):
+        with patch("cli.result_cache.get_remote_head_sha", return_value="abc123") as mock:
+            yield mock
+
+
+def test_task_key_depends_on_inputs(mock_head_sha):
+    key = ResultCache.task_key("prompt", "owner/repo", None, "gpt-4o", False)
+    assert key == ResultCache.task_key("prompt", "owner/repo", None, "gpt-4o", False)
+    assert key != ResultCache.task_key("other prompt", "owner/repo", None, "gpt-4o", False)
+    assert key != ResultCache.task_key("prompt", "owner/repo", None, "other-model", False)
+    assert key != ResultCache.task_key("prompt", "owner/repo", None, "gpt-4o", True)
+    mock_head_sha.return_value = "def456"
+    assert key != ResultCache.task_key("prompt", "owner/repo", None, "gpt-4o", False)
+
+
+def test_task_key_is_none_for_other_repository(mock_head_sha):
+    assert ResultCache.task_key("prompt", "owner/other", None, "gpt-4o", False) is None
+
+
+def test_task_key_is_none_without_remote_head(mock_head_sha):
+    mock_head_sha.return_value = None
+    assert ResultCache.task_key("prompt", "owner/repo", "branch", "gpt-4o", False) is None
+
+
+def test_missing_remote_head_is_reported_once(mock_head_sha, capsys):
+    mock_head_sha.return_value = None
+    with patch("cli.result_cache._reported_unknown_head", False):
+        for _ in range(2):
+            assert ResultCache.task_key("prompt", "owner/repo", None, "gpt-4o", False) is None
+    assert capsys.readouterr().err.count("Results are not cached") == 1
+
+
+def test_remote_head_falls_back_to_upstream():
+    context = MagicMock()
+    context.remote_sha.return_value = None
+    context.upstream_sha.return_value = "abc123"
+    with patch("cli.result_cache.GitContext.current", return_value=context):
+        assert get_remote_head_sha() == "abc123"
+        # A named branch is never replaced by another one
+        assert get_remote_head_sha("feature") is None
+
+
+def test_get_and_put(cache):
+    assert cache.get("key") is None
+    cache.put("key", '{"result": "42"}')
+    assert cache.get("key") == '{"result": "42"}'
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_expired_entries_are_removed(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), ttl=60)
+    cache.put("key", "task")
+    with patch("cli.result_cache.time.time", return_value=time.time() + 61):
+        assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), max_size=10)
+    cache.put("first", "12345")
+    cache.put("second", "12345")
+    # Use the first entry, so the second one is evicted
+    cache.get("first")
+    cache.put("third", "12345")
+    assert cache.get("first") == "12345"
+    assert cache.get("second") is None
+    assert cache.get("third") == "12345"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_clear(cache):
+    cache.put("key", "task")
+    cache.get("key")
+    cache.clear()
+    assert cache.stats() == {"entries": 0, "size": 0, "hits": 0, "misses": 0, "evictions": 0}
+
+
+def cached_task():
+    return Task(
+        id="c3b1f2e4-1b2a-4c5d-8e6f-7a8b9c0d1e2f",
+        title="Cached",
+        status="completed",
+        result="42",
+        github_project="owner/repo",
+        github_user="user",
+        created="2024-01-01T00:00:00Z",
+        branch="main",
+    )
+
+
+@pytest.fixture
+def mock_result_cache(cache):
+    with patch("cli.task_runner.ResultCache") as mock:
+        mock.return_value = cache
+        mock.task_key.return_value = "key"
+        yield cache
+
+
+def test_task_uses_cached_result(mock_result_cache, mock_engine):
+    mock_result_cache.put("key", cached_task().model_dump_json())
+    result = CliRunner().invoke(main, ["--cache", "task", "What is the answer?"])
+    assert result.exit_code == 0
+    mock_engine.create_task.assert_not_called()
+    assert mock_result_cache.stats()["hits"] == 1
+
+
+def test_task_ignores_cache_by_default(mock_result_cache, mock_engine):
+    mock_result_cache.put("key", cached_task().model_dump_json())
+    with patch(
+        "cli.task_runner.TaskHandler", return_value=MagicMock(stream_task_events=AsyncMock())
+    ):
+        result = CliRunner().invoke(main, ["task", "What is the answer?"])
+    assert result.exit_code == 0
+    mock_engine.create_task.assert_called_once()
+
+
+def test_cache_commands(cache):
+    cache.put("key", "task")
+    with patch("cli.commands.cache.ResultCache", return_value=cache):
+        result = CliRunner().invoke(main, ["cache", "stats"])
+        assert result.exit_code == 0
+        assert "Entries" in result.output
+        result = CliRunner().invoke(main, ["cache", "clear"])
+        assert result.exit_code == 0
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+import pytest
+
+from cli import skill_index as skill_index_module
+from cli.skill_index import AgentSkill, SkillIndex
+
+
+@pytest.fixture(autouse=True)
+def skill_catalog_dir(tmp_path):
+    with patch("cli.skill_index.SKILL_CATALOG_DIR", str(tmp_path / "cache")):
+        yield
+
+
+@pytest.fixture
+def skill_index(tmp_path):
+    return SkillIndex(file_path=str(tmp_path / ".pilot-skills.yaml"))
+
+
+def make_skill(title):
+    return AgentSkill(title=title, instructions=f"Instructions for {title}")
+
+
+def test_add_and_get_skill(skill_index):
+    skill_index.add_skill(make_skill("Write tests"))
+    assert skill_index.get_skill("Write tests").instructions == "Instructions for Write tests"
+    assert skill_index.get_skill("Unknown") is None
+    with pytest.raises(ValueError, match="Skill with title 'Write tests' already exists"):
+        skill_index.add_skill(make_skill("Write tests"))
+
+
+def test_bulk_changes_write_file_once(skill_index):
+    with patch("cli.skill_index.yaml.dump", wraps=skill_index_module.yaml.dump) as dump:
+        skill_index.add_skills([make_skill(f"Skill {i}") for i in range(10)])
+        skill_index.remove_skills(["Skill 0", "Skill 1"])
+    assert dump.call_count == 2
+    new_index = SkillIndex(file_path=skill_index.file_path)
+    assert [skill.title for skill in new_index.get_skills()] == [f"Skill {i}" for i in range(2, 10)]
+
+
+def test_add_skills_replaces_existing_skills(skill_index):
+    skill_index.add_skill(make_skill("Skill"))
+    replacement = AgentSkill(title="Skill", instructions="New instructions")
+    skill_index.add_skills([replacement], replace=True)
+    assert skill_index.get_skill("Skill").instructions == "New instructions"
+
+
+def test_unchanged_skill_file_is_loaded_from_catalog(skill_index):
+    skill_index.add_skill(make_skill("Skill"))
+    with patch("cli.skill_index.yaml.load") as mock_load, patch(
+        "cli.skill_index.AgentSkill.__init__"
+    ) as mock_init:
+        new_index = SkillIndex(file_path=skill_index.file_path)
+    mock_load.assert_not_called()
+    mock_init.assert_not_called()
+    assert new_index.get_skill("Skill").instructions == "Instructions for Skill"
+
+
+def test_changed_skill_file_is_parsed_again(skill_index):
+    skill_index.add_skill(make_skill("Skill"))
+    with open(skill_index.file_path, "a") as f:
+        f.write("- title: Edited by hand\n  instructions: Do it\n")
+    new_index = SkillIndex(file_path=skill_index.file_path)
+    assert new_index.get_skill("Edited by hand").instructions == "Do it"
+
+
+def test_duplicate_titles_in_file_raise(tmp_path):
+    path = tmp_path / ".pilot-skills.yaml"
+    path.write_text(
+        "- title: Skill\n  instructions: First\n- title: Skill\n  instructions: Second\n"
+    )
+    with pytest.raises(ValueError, match="Duplicate skill title 'Skill'"):
+        SkillIndex(file_path=str(path))
+    # The file is left as it is
+    assert "First" in path.read_text()
+
+
+def test_add_skills_with_duplicate_titles_raises(skill_index):
+    with pytest.raises(ValueError, match="Duplicate skill title 'Skill'"):
+        skill_index.add_skills([make_skill("Skill"), make_skill("Skill")], replace=True)
+    assert skill_index.get_skills() == []
+
+
+def test_catalogs_of_deleted_skill_files_are_pruned(tmp_path):
+    checkout = tmp_path / "checkout"
+    checkout.mkdir()
+    SkillIndex(file_path=str(checkout / ".pilot-skills.yaml")).add_skill(make_skill("a"))
+    (checkout / ".pilot-skills.yaml").unlink()
+    checkout.rmdir()
+
+    SkillIndex(file_path=str(tmp_path / ".pilot-skills.yaml")).add_skill(make_skill("b"))
+    assert len(list((tmp_path / "cache").glob("*.json"))) == 1
@@ -0,0 +1,64 @@
+import importlib
+import os
+import subprocess
+import sys
+
+import click
+import pytest
+from click.testing import CliRunner
+
+from cli.cli import SUBCOMMANDS, main
+
+# Cold-start budget for `import cli.cli`, in milliseconds. Override on slow machines.
+STARTUP_BUDGET_MS = int(os.getenv("PR_PILOT_STARTUP_BUDGET_MS", "600"))
+
+# Modules that must not be loaded just to parse the command line
+HEAVY_MODULES = ["arcane", "websockets", "jinja2", "inquirer", "yaspin", "rich.markdown"]
+
+
+def measure_import_time():
+    """Import `cli.cli` in a fresh interpreter and return cumulative times in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import cli.cli"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        timings[module.strip()] = int(cumulative.strip())
+    return timings
+
+
+def test_startup_does_not_import_heavy_modules():
+    timings = measure_import_time()
+    for module in HEAVY_MODULES:
+        assert module not in timings, f"{module} is imported on startup"
+
+
+def test_startup_import_time_within_budget():
+    # Take the best of a few runs to smooth out noise
+    best = min(measure_import_time()["cli.cli"] for _ in range(3))
+    assert (
+        best / 1000 < STARTUP_BUDGET_MS
+    ), f"Importing cli.cli took {best / 1000:.0f}ms, budget is {STARTUP_BUDGET_MS}ms"
+
+
+@pytest.mark.parametrize("name", SUBCOMMANDS.keys())
+def test_lazy_subcommand_help_matches_command(name):
+    import_path, help_text = SUBCOMMANDS[name]
+    module_name, attribute = import_path.split(":")
+    cmd = getattr(importlib.import_module(module_name), attribute)
+    assert isinstance(cmd, click.Command)
+    assert cmd.get_short_help_str(limit=200) == help_text
+
+
+def test_help_lists_all_subcommands():
+    result = CliRunner().invoke(main, ["--help"])
+    assert result.exit_code == 0
+    for name in SUBCOMMANDS:
+        assert name in result.output
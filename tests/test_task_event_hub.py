@@ -0,0 +1,219 @@
+import asyncio
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from click.testing import CliRunner
+
+from cli.cli import main
+from cli.task_event_hub import TaskEventHub, backoff_delay, BACKOFF_MAX
+
+
+class FakeWebsocket:
+    """Stand-in for a websocket connection that yields a fixed list of messages."""
+
+    open_connections = 0
+    max_open_connections = 0
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def __aenter__(self):
+        FakeWebsocket.open_connections += 1
+        FakeWebsocket.max_open_connections = max(
+            FakeWebsocket.max_open_connections, FakeWebsocket.open_connections
+        )
+        return self
+
+    async def __aexit__(self, *args):
+        FakeWebsocket.open_connections -= 1
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for message in self.messages:
+            await asyncio.sleep(0.01)
+            if isinstance(message, Exception):
+                raise message
+            yield json.dumps(message)
+
+
+def completed(result):
+    return {"type": "status_update", "data": {"status": "completed", "message": result}}
+
+
+@pytest.fixture
+def mock_connect():
+    FakeWebsocket.open_connections = 0
+    FakeWebsocket.max_open_connections = 0
+    with patch("cli.task_event_hub.websockets.connect") as mock:
+        mock.side_effect = lambda url, extra_headers: FakeWebsocket(
+            [{"type": "event", "data": {"action": "search"}}, completed(url)]
+        )
+        yield mock
+
+
+def test_stream_routes_messages_to_handler(mock_connect):
+    hub = TaskEventHub(api_key="test_api_key")
+    received = []
+
+    async def on_message(message):
+        received.append(message)
+        return message["type"] == "status_update"
+
+    assert asyncio.run(hub.stream("task-1", on_message)) is True
+    assert [message["type"] for message in received] == ["event", "status_update"]
+    assert mock_connect.call_args[0][0].endswith("/ws/tasks/task-1/events/")
+    assert mock_connect.call_args[1]["extra_headers"] == {"X-Api-Key": "test_api_key"}
+
+
+def test_stream_many_tasks_with_bounded_connections(mock_connect):
+    hub = TaskEventHub(max_connections=2, api_key="test_api_key")
+    results = {}
+
+    async def follow(task_id):
+        async def on_message(message):
+            if message["type"] == "status_update":
+                results[task_id] = message["data"]["message"]
+                return True
+            return False
+
+        return await hub.stream(task_id, on_message)
+
+    async def follow_all():
+        return await asyncio.gather(*[follow(f"task-{n}") for n in range(6)])
+
+    assert asyncio.run(follow_all()) == [True] * 6
+    assert len(results) == 6
+    assert FakeWebsocket.max_open_connections == 2
+
+
+@pytest.fixture
+def no_sleep():
+    with patch("cli.task_event_hub.asyncio.sleep") as mock:
+        mock.return_value = None
+        yield mock
+
+
+def test_stream_skips_replayed_events_after_reconnect(mock_connect, no_sleep):
+    search = {"type": "event", "data": {"action": "search"}}
+    edit = {"type": "event", "data": {"action": "edit"}}
+    connections = iter(
+        [
+            FakeWebsocket([search, OSError("Connection reset")]),
+            FakeWebsocket([search, edit, completed("done")]),
+        ]
+    )
+    mock_connect.side_effect = lambda url, extra_headers: next(connections)
+    hub = TaskEventHub(api_key="test_api_key")
+    received = []
+    warnings = []
+
+    async def on_message(message):
+        received.append(message)
+        return message["type"] == "status_update"
+
+    assert asyncio.run(hub.stream("task-1", on_message, warnings.append)) is True
+    assert received == [search, edit, completed("done")]
+    assert mock_connect.call_count == 2
+    assert "Connection reset" in warnings[0]
+
+
+def test_stream_polls_when_reconnecting_fails(mock_connect, no_sleep):
+    mock_connect.side_effect = lambda url, extra_headers: FakeWebsocket([])
+    fetch_task = MagicMock(
+        side_effect=[
+            MagicMock(status="running"),
+            MagicMock(status="completed", title="Polled", result="Polled result"),
+        ]
+    )
+    hub = TaskEventHub(api_key="test_api_key", fetch_task=fetch_task, max_retries=2)
+    received = []
+
+    async def on_message(message):
+        received.append(message)
+        return message["type"] == "status_update"
+
+    assert asyncio.run(hub.stream("task-1", on_message)) is True
+    assert mock_connect.call_count == 3
+    assert fetch_task.call_count == 2
+    assert received == [{"type": "title_update", "data": "Polled"}, completed("Polled result")]
+
+
+def test_stream_returns_false_when_task_is_unreachable(mock_connect, no_sleep):
+    mock_connect.side_effect = lambda url, extra_headers: FakeWebsocket([])
+    fetch_task = MagicMock(side_effect=OSError("Network is unreachable"))
+    hub = TaskEventHub(api_key="test_api_key", fetch_task=fetch_task, max_retries=1)
+
+    async def on_message(message):
+        return True
+
+    assert asyncio.run(hub.stream("task-1", on_message)) is False
+
+
+def test_retry_warnings_count_up_to_max_retries(mock_connect, no_sleep):
+    mock_connect.side_effect = lambda url, extra_headers: FakeWebsocket([OSError("reset")])
+    fetch_task = MagicMock(return_value=MagicMock(status="completed", title="", result="done"))
+    hub = TaskEventHub(api_key="test_api_key", fetch_task=fetch_task, max_retries=2)
+    warnings = []
+
+    async def on_message(message):
+        return True
+
+    assert asyncio.run(hub.stream("task-1", on_message, warnings.append)) is True
+    attempts = [w.split("(")[1] for w in warnings if "attempt" in w]
+    assert attempts == ["attempt 1 of 2)...", "attempt 2 of 2)..."]
+
+
+def test_backoff_does_not_hold_a_connection_slot(mock_connect):
+    connections = iter([FakeWebsocket([OSError("reset")]), FakeWebsocket([completed("a")])])
+    mock_connect.side_effect = lambda url, extra_headers: (
+        next(connections) if url.endswith("/a/events/") else FakeWebsocket([completed("b")])
+    )
+    hub = TaskEventHub(api_key="test_api_key", max_connections=1)
+    finished = []
+
+    async def follow(task_id, delay):
+        async def on_message(message):
+            finished.append(task_id)
+            return True
+
+        await asyncio.sleep(delay)
+        await hub.stream(task_id, on_message)
+
+    async def follow_both():
+        await asyncio.gather(follow("a", 0), follow("b", 0.05))
+
+    with patch("cli.task_event_hub.backoff_delay", return_value=0.3):
+        asyncio.run(follow_both())
+    # b connects while a waits to reconnect
+    assert finished == ["b", "a"]
+
+
+def test_backoff_delay_is_capped():
+    assert 0 <= backoff_delay(1) <= 1
+    assert all(0 <= backoff_delay(20) <= BACKOFF_MAX for _ in range(100))
+
+
+def test_watch_command_follows_all_tasks(mock_connect, mock_engine_in_watch_command, mock_console):
+    mock_engine_in_watch_command.get_task.side_effect = lambda task_id: MagicMock(
+        id=task_id, status="running", title=f"Title of {task_id}"
+    )
+    with patch("cli.task_event_hub.UserConfig") as mock_user_config:
+        mock_user_config.shared.return_value.api_key = "test_api_key"
+        result = CliRunner().invoke(main, ["--no-spinner", "watch", "task-1", "task-2"])
+    assert result.exit_code == 0
+    assert mock_connect.call_count == 2
+    printed = str(mock_console.return_value.print.call_args_list)
+    assert "Title of task-1" in printed
+    assert "Title of task-2" in printed
+
+
+def test_watch_command_fails_if_a_task_failed(mock_connect, mock_engine_in_watch_command):
+    mock_engine_in_watch_command.get_task.return_value = MagicMock(
+        id="task-1", status="failed", result="Boom"
+    )
+    result = CliRunner().invoke(main, ["--no-spinner", "watch", "task-1"])
+    assert result.exit_code == 1
+    assert "1 of 1 tasks failed" in result.output
@@ -0,0 +1,96 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+import yaml
+
+from cli import user_config
+from cli.user_config import UserConfig
+
+
+@pytest.fixture(autouse=True)
+def clear_shared_configs():
+    user_config._shared_configs.clear()
+    yield
+    user_config._shared_configs.clear()
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "pr-pilot.yaml"
+    path.write_text(yaml.dump({"api_key": "file_key", "verbose": True}))
+    return str(path)
+
+
+@pytest.fixture
+def cache_location(tmp_path):
+    location = tmp_path / "cache" / "config.json"
+    with patch("cli.user_config.CACHE_DIR", str(location.parent)):
+        with patch("cli.user_config.CONFIG_CACHE_LOCATION", str(location)):
+            yield location
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_shared_returns_same_instance(config_file):
+    config = UserConfig.shared(config_file)
+    assert UserConfig.shared(config_file) is config
+    assert config.api_key == "file_key"
+    assert config.verbose is True
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_shared_does_not_reparse_unchanged_file(config_file):
+    UserConfig.shared(config_file)
+    with patch("cli.user_config.yaml.load") as mock_load:
+        UserConfig.shared(config_file)
+        mock_load.assert_not_called()
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_shared_reloads_changed_file(config_file):
+    config = UserConfig.shared(config_file)
+    with open(config_file, "w") as f:
+        f.write(yaml.dump({"api_key": "new_key", "verbose": False, "auto_sync": True}))
+    assert UserConfig.shared(config_file) is config
+    assert config.api_key == "new_key"
+    assert config.auto_sync_enabled is True
+
+
+@patch.dict(os.environ, {"PR_PILOT_API_KEY": "env_key"}, clear=True)
+def test_env_var_overrides_api_key(config_file):
+    assert UserConfig.shared(config_file).api_key == "env_key"
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_empty_config_file(tmp_path):
+    path = tmp_path / "empty.yaml"
+    path.touch()
+    assert UserConfig(str(path)).config == {}
+
+
+@patch.dict(os.environ, {"PR_PILOT_CONFIG_CACHE": "1"}, clear=True)
+def test_json_side_cache(config_file, cache_location):
+    UserConfig(config_file)
+    cached = json.loads(cache_location.read_text())
+    assert cached["data"] == {"api_key": "file_key", "verbose": True}
+    assert cache_location.stat().st_mode & 0o777 == 0o600
+
+    # Second load reads from the side-cache instead of parsing YAML
+    with patch("cli.user_config.yaml.load") as mock_load:
+        assert UserConfig(config_file).api_key == "file_key"
+        mock_load.assert_not_called()
+
+
+@patch.dict(os.environ, {"PR_PILOT_CONFIG_CACHE": "1"}, clear=True)
+def test_json_side_cache_ignored_when_config_changes(config_file, cache_location):
+    UserConfig(config_file)
+    with open(config_file, "w") as f:
+        f.write(yaml.dump({"api_key": "changed_key", "extra": "value"}))
+    assert UserConfig(config_file).api_key == "changed_key"
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_json_side_cache_disabled_by_default(config_file, cache_location):
+    UserConfig(config_file)
+    assert not cache_location.exists()
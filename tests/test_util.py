@@ -1,5 +1,6 @@
+import asyncio
 from datetime import timezone, datetime
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 
 import humanize
 import pytest
@@ -9,6 +10,9 @@ from rich.markdown import Markdown
 from cli.util import (
     clean_code_block_with_language_specifier,
     TaskFormatter,
+    markdown_blocks,
+    render_markdown,
+    run_git_async,
 )
 
 
@@ -65,3 +69,39 @@ def test_task_formatter(sample_task):
         == "[link=https://arcane.engineer/dashboard/tasks/1/]Test Task[/link]"
     )
     assert formatter.format_branch().markup == Markdown("`test-branch`").markup
+
+
+def test_markdown_blocks_keep_code_blocks_together():
+    content = "# Title\n\nParagraph\nline 2\n\n```python\na = 1\n\nb = 2\n```\n\n- item"
+    assert list(markdown_blocks(content)) == [
+        "# Title",
+        "Paragraph\nline 2",
+        "```python\na = 1\n\nb = 2\n```",
+        "- item",
+    ]
+
+
+def test_render_markdown_plain_bypasses_rich(capsys):
+    console = MagicMock()
+    render_markdown(console, "# Result\n\n**bold**", plain=True)
+    assert capsys.readouterr().out == "# Result\n\n**bold**\n"
+    console.print.assert_not_called()
+
+
+def test_render_markdown_renders_long_content_block_by_block():
+    console = MagicMock()
+    content = "\n\n".join(f"Paragraph {i}" for i in range(300))
+    render_markdown(console, content)
+    assert console.print.call_count == 300
+
+
+def test_render_markdown_renders_short_content_as_panel():
+    console = MagicMock()
+    render_markdown(console, "Short result")
+    console.print.assert_called_once()
+
+
+def test_run_git_async_captures_output():
+    result = asyncio.run(run_git_async("--version"))
+    assert result.returncode == 0
+    assert result.stdout.startswith("git version")